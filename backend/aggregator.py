@@ -2,38 +2,573 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
+import sys
 import threading
 import time
-from collections import defaultdict
-from typing import DefaultDict, Dict, List, Optional
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from grouping import ClientGrouper, rollup_rows
+from metrics import REGISTRY, Registry
+from netindex import ServerIndex
+from sketch import SpaceSaving
 
 LOGGER = logging.getLogger(__name__)
 
+# Enum fixo de protocolos, em ordem alfabética (a ordem do drilldown); nomes desconhecidos caem em OTHER
+PROTOCOLS: Tuple[str, ...] = ("DNS", "FTP", "HTTP", "HTTPS/TLS", "ICMP", "OTHER", "TCP", "UDP")
+PROTOCOL_IDS: Dict[str, int] = {name: index for index, name in enumerate(PROTOCOLS)}
+OTHER_PROTOCOL_ID = PROTOCOL_IDS["OTHER"]
+
+DIRECTION_IN = 0
+DIRECTION_OUT = 1
+
+# Folga após o fim de uma janela antes de fechá-la pelo relógio (lotes em trânsito)
+CLOSE_GRACE_SECONDS = 1
+
+WindowListener = Callable[[Dict[str, object]], None]
+
+# Métricas dos sketches de top-K, na ordem (in, out, total)
+TOP_METRICS: Tuple[str, ...] = ("in", "out", "total")
+TOP_TOTAL = 2
+# Cliente sintético que recebe o restante quando uma janela guarda só os top clientes
+OTHER_CLIENT = "other"
+
+# Layout de uma linha de contadores: [in, out, proto0_in, proto0_out, proto1_in, ...]
+ROW_WIDTH = 2 + 2 * len(PROTOCOLS)
+_EMPTY_ROW = array("Q", bytes(8 * ROW_WIDTH))
+
+# Validade do cálculo de memória usado pelos gauges (uma varredura por scrape)
+_MEMORY_STATS_SECONDS = 1.0
+
+# Ids internados novos entre varreduras de ids sem janela (no mínimo; ver _sweep_clients)
+_CLIENT_SWEEP_MIN = 4096
+# Tempo que um id liberado espera antes de ser reutilizado, para leitores com snapshots antigos
+_CLIENT_QUARANTINE_SECONDS = 60.0
+
+# Agrupamentos do drilldown por intervalo
+DRILLDOWN_GROUPS: Tuple[str, ...] = ("protocol", "client", "bin")
+
+LOCK_WAIT_SECONDS = REGISTRY.histogram(
+    "traffic_aggregator_lock_wait_seconds",
+    "Time spent waiting for the aggregator ingest lock.",
+    ("operation",),
+)
+_INGEST_LOCK_WAIT = LOCK_WAIT_SECONDS.labels("ingest")
+_SUMMARY_LOCK_WAIT = LOCK_WAIT_SECONDS.labels("summary")
+
+
+def protocol_id(protocol: Optional[str]) -> int:
+    """Map a protocol label to its fixed enum id."""
+
+    if not protocol:
+        return OTHER_PROTOCOL_ID
+    return PROTOCOL_IDS.get(protocol.upper(), OTHER_PROTOCOL_ID)
+
+
+def _as_list(column: Sequence[Any]) -> List[Any]:
+    # Arrays NumPy convertem para escalares Python em uma única chamada C
+    tolist = getattr(column, "tolist", None)
+    return tolist() if tolist is not None else list(column)
+
+
+def _protocol_items(counters: Sequence[int], base: int = 0) -> List[Dict[str, object]]:
+    """Non-zero protocol entries of the counter row starting at ``base``."""
+
+    items = []
+    for proto_id, name in enumerate(PROTOCOLS):
+        in_bytes = counters[base + 2 + 2 * proto_id]
+        out_bytes = counters[base + 3 + 2 * proto_id]
+        if in_bytes or out_bytes:
+            items.append({"protocol": name, "in_bytes": in_bytes, "out_bytes": out_bytes})
+    return items
+
+
+def _add_row(target: List[int], counters: Sequence[int], base: int) -> None:
+    for offset in range(ROW_WIDTH):
+        target[offset] += counters[base + offset]
+
+
+def _group_bin(item: Tuple[Tuple[int, str, int, int], int]) -> int:
+    return item[0][0]
+
+
+class _Window:
+    """Counters of one tumbling window, shaped [client, protocol, direction].
+
+    When ``sketch_capacity`` is set the window also keeps Space-Saving
+    summaries of bytes per client for the in, out and total directions.
+    """
+
+    __slots__ = ("rows", "counters", "sketches", "summary", "grouped", "totals", "revision")
+
+    def __init__(self, sketch_capacity: int = 0) -> None:
+        # client_id -> índice da linha em ``counters``
+        self.rows: Dict[int, int] = {}
+        self.counters = array("Q")
+        self.sketches: Optional[Tuple[SpaceSaving, ...]] = (
+            tuple(SpaceSaving(sketch_capacity) for _ in TOP_METRICS) if sketch_capacity else None
+        )
+        # Linhas de summary já serializadas; só preenchidas em janelas publicadas (imutáveis)
+        self.summary: Optional[List[Dict[str, object]]] = None
+        # Mesmas linhas agregadas por prefixo/grupo, por valor de group_by
+        self.grouped: Optional[Dict[str, List[Dict[str, object]]]] = None
+        # Soma de todas as linhas (mesmo layout), também só em janelas publicadas
+        self.totals: Optional[List[int]] = None
+        # Cresce a cada cópia copy-on-write; identifica o conteúdo de uma janela publicada
+        self.revision = 1
+
+    def __bool__(self) -> bool:
+        return bool(self.rows)
+
+    def copy(self) -> "_Window":
+        clone = _Window()
+        clone.rows = dict(self.rows)
+        clone.counters = array("Q", self.counters)
+        clone.revision = self.revision + 1
+        if self.sketches:
+            clone.sketches = tuple(SpaceSaving.merged(sketch.capacity, (sketch,)) for sketch in self.sketches)
+        return clone
+
+    def add(self, client_id: int, proto_id: int, direction: int, length: int) -> None:
+        row = self.rows.get(client_id)
+        if row is None:
+            row = len(self.rows)
+            self.rows[client_id] = row
+            self.counters.extend(_EMPTY_ROW)
+        base = row * ROW_WIDTH
+        counters = self.counters
+        counters[base + direction] += length
+        counters[base + 2 + 2 * proto_id + direction] += length
+        sketches = self.sketches
+        if sketches:
+            sketches[direction].update(client_id, length)
+            sketches[TOP_TOTAL].update(client_id, length)
+
+    def merge(self, other: "_Window") -> None:
+        """Fold another window's counters into this one."""
+
+        source = other.counters
+        for client_id, source_row in other.rows.items():
+            row = self.rows.get(client_id)
+            if row is None:
+                row = len(self.rows)
+                self.rows[client_id] = row
+                self.counters.extend(_EMPTY_ROW)
+            base = row * ROW_WIDTH
+            source_base = source_row * ROW_WIDTH
+            counters = self.counters
+            for offset in range(ROW_WIDTH):
+                counters[base + offset] += source[source_base + offset]
+        if self.sketches and other.sketches:
+            for sketch, other_sketch in zip(self.sketches, other.sketches):
+                sketch.merge(other_sketch)
+
+    def truncate(self, keep: int, other_client_id: int) -> None:
+        """Keep the ``keep`` heaviest clients exactly and fold the rest into one row."""
+
+        if len(self.rows) <= keep:
+            return
+        source = self.counters
+        ranked = sorted(
+            self.rows.items(),
+            key=lambda item: source[item[1] * ROW_WIDTH] + source[item[1] * ROW_WIDTH + 1],
+            reverse=True,
+        )
+        self.rows = {}
+        self.counters = array("Q")
+        other = array("Q", _EMPTY_ROW)
+        kept = 0
+        for client_id, row in ranked:
+            source_base = row * ROW_WIDTH
+            if kept < keep and client_id != other_client_id:
+                self.rows[client_id] = len(self.rows)
+                self.counters.extend(source[source_base : source_base + ROW_WIDTH])
+                kept += 1
+            else:
+                for offset in range(ROW_WIDTH):
+                    other[offset] += source[source_base + offset]
+        self.rows[other_client_id] = len(self.rows)
+        self.counters.extend(other)
+
+    def row_totals(self) -> List[int]:
+        """Column sums over every client row: window-wide in/out and per-protocol bytes."""
+
+        counters = self.counters
+        return [sum(counters[offset::ROW_WIDTH]) for offset in range(ROW_WIDTH)]
+
+    def protocol_totals(self, row: int) -> List[Tuple[str, int, int]]:
+        base = row * ROW_WIDTH + 2
+        counters = self.counters
+        items = []
+        for proto_id, name in enumerate(PROTOCOLS):
+            in_bytes = counters[base + 2 * proto_id]
+            out_bytes = counters[base + 2 * proto_id + 1]
+            if in_bytes or out_bytes:
+                items.append((name, in_bytes, out_bytes))
+        return items
+
+
+class _WindowRing:
+    """Fixed-size circular store of windows for one resolution.
+
+    The slot of a bin is ``(ts // window_seconds) % n_slots``; slots are tagged
+    with the bin they hold and recycled in O(1) when the head wraps around.
+    A recycled slot gets a new ``_Window`` rather than clearing the old one,
+    since published snapshots may still reference it.
+    """
+
+    def __init__(self, window_seconds: int, retention_seconds: int, sketch_capacity: int = 0) -> None:
+        self.window_seconds = int(window_seconds)
+        self.retention_seconds = int(retention_seconds)
+        self.sketch_capacity = sketch_capacity
+        self.n_slots = self.retention_seconds // self.window_seconds + 2
+        self.slot_ts: List[int] = [-1] * self.n_slots
+        self.windows: List[_Window] = [_Window() for _ in range(self.n_slots)]
+        # ids das janelas criadas desde a última publicação, que nenhum leitor enxerga ainda
+        self.fresh: Set[int] = set()
+        self.head = -1
+        self.first_bin = -1
+
+    def bin_ts(self, packet_ts: float) -> int:
+        return int(packet_ts) - (int(packet_ts) % self.window_seconds)
+
+    def slot_index(self, ts_bin: int) -> int:
+        return (ts_bin // self.window_seconds) % self.n_slots
+
+    def writable(self, ts_bin: int) -> Optional[_Window]:
+        """Return the slot for ``ts_bin``, recycling it if it holds an expired window."""
+
+        if ts_bin > self.head:
+            self.head = ts_bin
+        elif ts_bin < self.head - self.retention_seconds:
+            return None
+        if self.first_bin < 0 or ts_bin < self.first_bin:
+            self.first_bin = ts_bin
+
+        index = self.slot_index(ts_bin)
+        slot_ts = self.slot_ts[index]
+        if slot_ts != ts_bin:
+            if slot_ts > ts_bin:
+                return None
+            window = self.windows[index] = _Window(self.sketch_capacity)
+            self.fresh.add(id(window))
+            self.slot_ts[index] = ts_bin
+        return self.windows[index]
+
+    def owned(self, ts_bin: int) -> Optional[_Window]:
+        """Like ``writable`` but copy-on-write for windows a snapshot may already expose."""
+
+        window = self.writable(ts_bin)
+        if window is None or id(window) in self.fresh:
+            return window
+        window = self.windows[self.slot_index(ts_bin)] = window.copy()
+        self.fresh.add(id(window))
+        return window
+
+    def readable(self, ts_bin: int, cutoff: int) -> Optional[_Window]:
+        if ts_bin < cutoff:
+            return None
+        index = self.slot_index(ts_bin)
+        if self.slot_ts[index] != ts_bin:
+            return None
+        return self.windows[index]
+
+
+class _Snapshot:
+    """Immutable view of every tier's slots, republished whenever a window closes.
+
+    Holds shallow copies of each ring's ``slot_ts`` and ``windows`` lists.
+    Windows up to ``closed_until`` (and all rollup windows) are never mutated
+    after publication, so readers use them without the ingest lock.
+
+    Per tier, the snapshot lazily builds prefix sums of the window totals
+    in bin order, so a range's totals over all clients are one subtraction.
+    """
+
+    __slots__ = ("closed_until", "slot_ts", "windows", "prefix")
+
+    def __init__(self, closed_until: int, tiers: Sequence[_WindowRing]) -> None:
+        self.closed_until = closed_until
+        self.slot_ts = tuple(list(tier.slot_ts) for tier in tiers)
+        self.windows = tuple(list(tier.windows) for tier in tiers)
+        # índice do tier -> (bins em ordem, somas acumuladas); montado na primeira consulta
+        self.prefix: Dict[int, Tuple[List[int], List[List[int]]]] = {}
+
+    def readable(self, index: int, tier: _WindowRing, ts_bin: int, cutoff: int) -> Optional[_Window]:
+        if ts_bin < cutoff:
+            return None
+        slot = tier.slot_index(ts_bin)
+        if self.slot_ts[index][slot] != ts_bin:
+            return None
+        return self.windows[index][slot]
+
+    def range_totals(self, index: int, first: int, last: int) -> List[int]:
+        """Summed window totals of tier ``index`` for bins in ``[first, last]``."""
+
+        prefix = self.prefix.get(index)
+        if prefix is None:
+            limit = self.closed_until if index == 0 else None
+            published = sorted(
+                (ts, window)
+                for ts, window in zip(self.slot_ts[index], self.windows[index])
+                if ts >= 0 and window and (limit is None or ts <= limit)
+            )
+            running = [0] * ROW_WIDTH
+            sums = [list(running)]
+            for _, window in published:
+                totals = window.totals
+                if totals is None:
+                    totals = window.totals = window.row_totals()
+                running = [value + added for value, added in zip(running, totals)]
+                sums.append(running)
+            # Leitores concorrentes podem montar o mesmo índice; o último a gravar vence
+            prefix = self.prefix[index] = ([ts for ts, _ in published], sums)
+        bins, sums = prefix
+        start, stop = bisect_left(bins, first), bisect_right(bins, last)
+        return [high - low for high, low in zip(sums[stop], sums[start])]
+
+
+def parse_rollup_tiers(raw: str) -> List[Tuple[int, int]]:
+    """Parse ``"window:retention,..."`` (seconds) into rollup tier definitions."""
+
+    tiers: List[Tuple[int, int]] = []
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        window, _, retention = item.partition(":")
+        try:
+            tiers.append((int(window), int(retention)))
+        except ValueError:
+            raise ValueError(f"Invalid rollup tier: {item!r}") from None
+    return tiers
+
 
 class TrafficAggregator:
-    """Aggregate captured traffic into tumbling windows."""
+    """Aggregate captured traffic into tumbling windows.
 
-    def __init__(self, server_ip: str, window_seconds: int, retention_seconds: int) -> None:
+    ``server_ip`` is a comma-separated list of IPv4/IPv6 addresses and CIDR
+    prefixes; packets to or from any of them count, keyed by the other end.
+    ``client_key`` (``ip``, ``prefix`` or ``group``) sets the granularity
+    clients are stored at; coarser keys bound memory when there are many
+    addresses. Prefixes and groups come from ``group_prefixes`` and the
+    optional ``client_groups`` CSV.
+
+    Windows of ``window_seconds`` are kept for ``retention_seconds``. Optional
+    ``rollup_tiers`` add coarser resolutions (``(window, retention)`` pairs);
+    each base window is folded into them once it closes, and late packets
+    for closed windows are added to every tier.
+
+    Packets stamped more than one window ahead of the wall clock (a clock
+    jump or a malformed frame) are dropped and counted in
+    ``future_packets`` instead of moving the ring head past every real
+    packet; ``accept_future`` turns the check off for traces replayed
+    faster than real time.
+
+    ``topk_capacity`` enables per-window Space-Saving sketches used by
+    ``get_top``; ``max_clients_per_window`` caps closed windows to their
+    heaviest clients plus an ``"other"`` row, and ``rollup_max_clients``
+    applies a (usually tighter) cap to rollup windows only, which otherwise
+    hold a row for every client seen in their span. Client addresses are
+    interned as integer ids; ids no retained window references any more are
+    reclaimed, so the table follows the live clients rather than every
+    address ever seen.
+
+    Closed windows are read from an immutable ``_Snapshot`` swapped in under
+    the lock whenever windows close (and, after late packets, on the next
+    read); queries take the lock only for bins of the base tier that are
+    still open.
+    """
+
+    def __init__(
+        self,
+        server_ip: str,
+        window_seconds: int,
+        retention_seconds: int,
+        rollup_tiers: Sequence[Tuple[int, int]] = (),
+        topk_capacity: int = 0,
+        max_clients_per_window: int = 0,
+        rollup_max_clients: int = 0,
+        client_key: str = "ip",
+        client_groups: Optional[str] = None,
+        group_prefixes: Tuple[int, int] = (24, 64),
+        accept_future: bool = False,
+    ) -> None:
         self.server_ip = server_ip
+        # Endereços e prefixos do servidor (lista separada por vírgulas, IPv4 e IPv6)
+        self.servers = ServerIndex(server_ip)
         self.window_seconds = window_seconds
         self.retention_seconds = retention_seconds
+        self.topk_capacity = topk_capacity
+        self.max_clients_per_window = max_clients_per_window
+        caps = [cap for cap in (max_clients_per_window, rollup_max_clients) if cap > 0]
+        # Limite efetivo das janelas de rollup (0 = sem limite)
+        self.rollup_max_clients = min(caps) if caps else 0
+        self.grouper = ClientGrouper(client_groups, v4_prefix=group_prefixes[0], v6_prefix=group_prefixes[1])
+        self.client_key = client_key
+        # None = clientes guardados por IP, sem custo extra na ingestão
+        self._ingest_key = self.grouper.key_function(client_key) if client_key != "ip" else None
         self._lock = threading.Lock()
-        self._data: Dict[int, Dict[str, Dict[str, object]]] = {}
+        self._base = _WindowRing(window_seconds, retention_seconds, topk_capacity)
+        self._tiers: List[_WindowRing] = [self._base]
+        for tier_window, tier_retention in sorted(rollup_tiers):
+            coarser = self._tiers[-1]
+            if tier_window <= coarser.window_seconds or tier_window % coarser.window_seconds:
+                raise ValueError(f"Rollup window {tier_window}s must be a multiple of {coarser.window_seconds}s")
+            self._tiers.append(_WindowRing(tier_window, tier_retention, topk_capacity))
+        self.accept_future = accept_future
+        self.future_packets = 0
+        self._version = 0
+        self._closed_until = -1
+        self._listeners: List[WindowListener] = []
+        # Payloads de janelas fechadas, enfileirados com o lock de ingestão na ordem de fechamento;
+        # quem segura _notify_lock entrega a fila inteira, então os listeners nunca veem ts fora de ordem
+        self._pending_windows: Deque[Dict[str, object]] = deque()
+        self._notify_lock = threading.Lock()
+        # IPs de clientes internados como ids inteiros
+        self._client_ids: Dict[str, int] = {}
+        self._client_names: List[str] = []
+        # Ids reutilizáveis e ids liberados na última varredura, ainda em quarentena
+        self._free_client_ids: List[int] = []
+        self._quarantined_ids: List[int] = []
+        self._quarantined_at = 0.0
+        self._interned_since_sweep = 0
+        self._sweep_after = _CLIENT_SWEEP_MIN
+        self._other_client_id = self._intern_client(OTHER_CLIENT)
+        self._snapshot = _Snapshot(self._closed_until, self._tiers)
+        # Escritas tardias em janelas fechadas ainda não publicadas
+        self._dirty = False
+
+    @property
+    def resolutions(self) -> List[int]:
+        """Window sizes (seconds) of the available tiers, finest first."""
+
+        return [tier.window_seconds for tier in self._tiers]
 
     def _bin_ts(self, packet_ts: float) -> int:
-        window = int(self.window_seconds)
-        return int(packet_ts) - (int(packet_ts) % window)
+        return self._base.bin_ts(packet_ts)
+
+    def _intern_client(self, client_ip: str) -> int:
+        client_id = self._client_ids.get(client_ip)
+        if client_id is None:
+            if not self._free_client_ids and self._interned_since_sweep >= self._sweep_after:
+                self._sweep_clients()
+            if self._free_client_ids:
+                client_id = self._free_client_ids.pop()
+                self._client_names[client_id] = client_ip
+            else:
+                client_id = len(self._client_names)
+                self._client_names.append(client_ip)
+            self._client_ids[client_ip] = client_id
+            self._interned_since_sweep += 1
+        return client_id
+
+    def _sweep_clients(self) -> None:
+        """Release the ids of clients no retained window references (lock held).
+
+        Runs once as many new clients were interned as were live at the
+        previous sweep, so its scan of every slot is amortized over them.
+        Released ids leave ``_client_ids`` at once but keep their name for
+        ``_CLIENT_QUARANTINE_SECONDS`` before reuse: a reader may still hold
+        a snapshot whose windows reference them.
+        """
 
-    def _prune(self, reference_ts: float) -> None:
-        cutoff = int(reference_ts) - self.retention_seconds
-        removable: List[int] = []
-        for ts in self._data.keys():
-            if ts < cutoff:
-                removable.append(ts)
+        live = {self._other_client_id}
+        for tier in self._tiers:
+            for window in tier.windows:
+                live.update(window.rows)
+                if window.sketches:
+                    for sketch in window.sketches:
+                        live.update(sketch.counts)
 
-        for ts in removable:
-            self._data.pop(ts, None)
+        now = time.monotonic()
+        if self._quarantined_ids and now - self._quarantined_at >= _CLIENT_QUARANTINE_SECONDS:
+            self._free_client_ids.extend(self._quarantined_ids)
+            self._quarantined_ids = []
+        if not self._quarantined_ids:
+            dead = [(name, client_id) for name, client_id in self._client_ids.items() if client_id not in live]
+            for name, _ in dead:
+                del self._client_ids[name]
+            self._quarantined_ids = [client_id for _, client_id in dead]
+            self._quarantined_at = now
+        self._interned_since_sweep = 0
+        self._sweep_after = max(_CLIENT_SWEEP_MIN, len(live))
+
+    def _resolve_direction(self, src_ip: str, dst_ip: str) -> Optional[Tuple[str, int]]:
+        # Capturar tráfego para o servidor principal (backend)
+        if self.servers.contains(dst_ip):  # Backend
+            return src_ip, DIRECTION_IN
+        if self.servers.contains(src_ip):  # Backend
+            return dst_ip, DIRECTION_OUT
+        return None
+
+    def _merge(self, ts_bin: int, client_ip: str, proto_id: int, direction: int, length: int) -> bool:
+        """Add to the base window of ``ts_bin``; returns True if it was already closed (lock held).
+
+        A closed base window was already folded into the rollup tiers, so a
+        late write is applied to their windows too.
+        """
+
+        client_id = self._intern_client(client_ip)
+        if ts_bin > self._closed_until:
+            window = self._base.writable(ts_bin)
+            if window is not None:
+                window.add(client_id, proto_id, direction, length)
+            return False
+
+        changed = False
+        for tier in self._tiers:
+            window = tier.owned(tier.bin_ts(ts_bin))
+            if window is not None:
+                cap = self.max_clients_per_window if tier is self._base else self.rollup_max_clients
+                window.add(self._late_client(window, client_id, cap), proto_id, direction, length)
+                changed = True
+        return changed
+
+    def _late_client(self, window: _Window, client_id: int, cap: int) -> int:
+        # Janela fechada já truncada aos maiores clientes: um cliente novo vai para "other"
+        if cap and client_id not in window.rows and len(window.rows) > cap:
+            return self._other_client_id
+        return client_id
+
+    def _horizon(self) -> int:
+        """Newest bin accepted from the current wall clock."""
+
+        if self.accept_future:
+            return sys.maxsize
+        return self._bin_ts(time.time()) + self.window_seconds
+
+    def _reject_future(self, count: int, timestamp: float) -> None:
+        if not self.future_packets:
+            LOGGER.warning("Dropping packets timestamped ahead of the clock (first at %.0f)", timestamp)
+        self.future_packets += count
+
+    def _publish(self) -> None:
+        """Swap in a snapshot of the current slots and seal the windows it exposes (lock held)."""
+
+        for tier in self._tiers:
+            tier.fresh.clear()
+        self._snapshot = _Snapshot(self._closed_until, self._tiers)
+        self._dirty = False
+
+    def _current_snapshot(self) -> _Snapshot:
+        """The published snapshot, republished first if late packets changed closed windows.
+
+        Late writes only mark the snapshot dirty, so a burst of late batches
+        costs one republish at the next read or window close instead of one
+        per batch.
+        """
+
+        if self._dirty:
+            with self._lock:
+                if self._dirty:
+                    self._publish()
+        return self._snapshot
 
     def add_packet(
         self,
@@ -49,98 +584,709 @@ class TrafficAggregator:
         if length <= 0:
             return
 
-        direction: Optional[str]
-        client_ip: Optional[str]
-
-        LOGGER.info("Aggregator: src_ip=%s, dst_ip=%s, server_ip=%s", src_ip, dst_ip, self.server_ip)
-
-        # Capturar tráfego para o servidor principal (backend)
-        if dst_ip == self.server_ip:  # Backend
-            direction = "in"
-            client_ip = src_ip
-            LOGGER.info("Aggregator: Direction IN, client_ip=%s", client_ip)
-        elif src_ip == self.server_ip:  # Backend
-            direction = "out"
-            client_ip = dst_ip
-            LOGGER.info("Aggregator: Direction OUT, client_ip=%s", client_ip)
-        else:
-            LOGGER.info("Aggregator: SKIPPING packet - no match with server_ip")
+        resolved = self._resolve_direction(src_ip, dst_ip)
+        if resolved is None:
             return
+        client_ip, direction = resolved
+        if self._ingest_key is not None:
+            client_ip = self._ingest_key(client_ip)
 
         ts_bin = self._bin_ts(timestamp)
-        protocol_key = protocol.upper() if protocol else "OTHER"
+        if ts_bin > self._horizon():
+            self._reject_future(1, timestamp)
+            return
 
         with self._lock:
-            bucket = self._data.setdefault(ts_bin, {})
-            client_bucket = bucket.setdefault(
-                client_ip,
+            if ts_bin > self._base.head:
+                self._collect_closed(ts_bin)
+            if self._merge(ts_bin, client_ip, protocol_id(protocol), direction, length):
+                self._dirty = True
+            self._version += 1
+
+        self._notify()
+
+    def add_packets(
+        self,
+        timestamps: Sequence[float],
+        src_ips: Sequence[str],
+        dst_ips: Sequence[str],
+        lengths: Sequence[int],
+        protocols: Sequence[str],
+    ) -> int:
+        """Add a micro-batch of packets given as parallel columns.
+
+        Packets are reduced per (bin, client, protocol, direction) before the
+        lock is taken, so the whole batch is merged under a single acquisition.
+        Columns may be lists or NumPy arrays. Returns the number of packets
+        that matched the server address.
+        """
+
+        columns = [_as_list(column) for column in (timestamps, src_ips, dst_ips, lengths, protocols)]
+        if len({len(column) for column in columns}) > 1:
+            raise ValueError("add_packets columns must have the same length")
+
+        window = int(self.window_seconds)
+        is_server = self.servers.contains
+        grouped: Dict[Tuple[int, str, int, int], int] = defaultdict(int)
+        accepted = 0
+        horizon = self._horizon()
+        future = 0
+        future_ts = 0.0
+
+        for timestamp, src_ip, dst_ip, length, protocol in zip(*columns):
+            if length <= 0:
+                continue
+            if is_server(dst_ip):
+                key_client, direction = src_ip, DIRECTION_IN
+            elif is_server(src_ip):
+                key_client, direction = dst_ip, DIRECTION_OUT
+            else:
+                continue
+
+            second = int(timestamp)
+            ts_bin = second - second % window
+            if ts_bin > horizon:
+                future += 1
+                future_ts = timestamp
+                continue
+            grouped[(ts_bin, key_client, protocol_id(protocol), direction)] += int(length)
+            accepted += 1
+
+        if future:
+            self._reject_future(future, future_ts)
+        if not grouped:
+            return 0
+        if self._ingest_key is not None:
+            # Mapeia por entrada já reduzida do lote, não por pacote
+            key_of = self._ingest_key
+            regrouped: Dict[Tuple[int, str, int, int], int] = defaultdict(int)
+            for (ts_bin, client, proto_id, direction), length in grouped.items():
+                regrouped[(ts_bin, key_of(client), proto_id, direction)] += length
+            grouped = regrouped
+
+        late = False
+        waited = time.perf_counter()
+        with self._lock:
+            _INGEST_LOCK_WAIT.observe(time.perf_counter() - waited)
+            # Bins em ordem crescente: cada janela é fechada só depois de receber sua parte do lote
+            for (ts_bin, client_ip, proto_id, direction), length in sorted(grouped.items(), key=_group_bin):
+                if ts_bin > self._base.head:
+                    self._collect_closed(ts_bin)
+                late |= self._merge(ts_bin, client_ip, proto_id, direction, length)
+            if late:
+                self._dirty = True
+            self._version += 1
+
+        self._notify()
+        return accepted
+
+    def restore_rows(self, rows: Iterable[Tuple[int, str, str, int, int]]) -> int:
+        """Load already-closed ``(ts, client_ip, protocol, in, out)`` rows.
+
+        Rows go straight into every tier (older than a tier's retention are
+        ignored) and are not reported to window listeners again. Returns the
+        number of rows read.
+        """
+
+        count = 0
+        with self._lock:
+            newest = -1
+            for ts, client_ip, protocol, in_bytes, out_bytes in rows:
+                client_id = self._intern_client(client_ip)
+                proto_id = protocol_id(protocol)
+                for tier in self._tiers:
+                    window = tier.owned(tier.bin_ts(ts))
+                    if window is None:
+                        continue
+                    if in_bytes:
+                        window.add(client_id, proto_id, DIRECTION_IN, in_bytes)
+                    if out_bytes:
+                        window.add(client_id, proto_id, DIRECTION_OUT, out_bytes)
+                newest = max(newest, ts)
+                count += 1
+            if count:
+                self._closed_until = max(self._closed_until, self._base.bin_ts(newest))
+                self._version += 1
+                self._publish()
+        return count
+
+    def retained_since(self, resolution: Optional[int] = None) -> Optional[int]:
+        """Oldest bin timestamp still held in memory for a tier, or None if empty."""
+
+        tier = self._tier_for(resolution, None)
+        if tier.first_bin < 0:
+            return None
+        newest = max(tier.head, int(time.time()))
+        return max(tier.first_bin, tier.bin_ts(newest - tier.retention_seconds) + tier.window_seconds)
+
+    def add_window_listener(self, listener: WindowListener) -> None:
+        """Register a callback invoked once per window when it closes.
+
+        Listeners run on the thread that closed the window (the ingest thread
+        or whoever calls ``close_windows``) and must not block. Windows are
+        delivered one at a time in closing order, even when several threads
+        close windows concurrently.
+        """
+
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_window_listener(self, listener: WindowListener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def close_windows(self, now: Optional[float] = None) -> int:
+        """Close windows whose end has passed on the wall clock; returns how many closed."""
+
+        now = time.time() if now is None else now
+        limit = self._bin_ts(now - CLOSE_GRACE_SECONDS)
+        with self._lock:
+            closed = self._collect_closed(limit)
+
+        self._notify()
+        return len(closed)
+
+    def _collect_closed(self, limit_bin: int) -> List[Dict[str, object]]:
+        """Close base windows before ``limit_bin``: fold them into the rollup
+        tiers and queue listener payloads for ``_notify`` (lock held)."""
+
+        base = self._base
+        window = base.window_seconds
+        if limit_bin - window <= self._closed_until:
+            return []
+
+        # Chamado antes do head avançar, enquanto os slots ainda não foram reciclados
+        cutoff = base.head - base.retention_seconds
+        start = base.bin_ts(max(self._closed_until + window, cutoff))
+        stop = min(limit_bin, base.head + window)
+        self._closed_until = limit_bin - window
+        if len(self._tiers) == 1 and not self._listeners and not self.max_clients_per_window:
+            self._publish()
+            return []
+
+        payloads: List[Dict[str, object]] = []
+        for ts in range(start, stop, window):
+            bucket = base.readable(ts, cutoff)
+            if not bucket:
+                continue
+            if self.max_clients_per_window:
+                # Ainda aberta para os leitores (acima do closed_until publicado), pode mudar no lugar
+                bucket.truncate(self.max_clients_per_window, self._other_client_id)
+            for tier in self._tiers[1:]:
+                target = tier.owned(tier.bin_ts(ts))
+                if target is not None:
+                    target.merge(bucket)
+                    if self.rollup_max_clients:
+                        target.truncate(self.rollup_max_clients, self._other_client_id)
+                    self._version += 1
+            if self._listeners:
+                payloads.append(self._window_payload(ts, bucket))
+        self._pending_windows.extend(payloads)
+        self._publish()
+        return payloads
+
+    def _window_payload(self, ts: int, bucket: _Window) -> Dict[str, object]:
+        names = self._client_names
+        counters = bucket.counters
+        clients = []
+        for client_id, row in bucket.rows.items():
+            base = row * ROW_WIDTH
+            clients.append(
                 {
-                    "in": 0,
-                    "out": 0,
-                    "proto": defaultdict(lambda: {"in": 0, "out": 0}),
-                },
+                    "client_ip": names[client_id],
+                    "in_bytes": counters[base],
+                    "out_bytes": counters[base + 1],
+                    "protocols": {
+                        protocol: {"in_bytes": in_bytes, "out_bytes": out_bytes}
+                        for protocol, in_bytes, out_bytes in bucket.protocol_totals(row)
+                    },
+                }
             )
+        return {"ts": ts, "clients": clients}
+
+    def _notify(self) -> None:
+        """Deliver queued window payloads in order (ingest lock released)."""
+
+        pending = self._pending_windows
+        if not pending:
+            return
+        with self._notify_lock:
+            listeners = list(self._listeners)
+            while pending:
+                payload = pending.popleft()
+                for listener in listeners:
+                    try:
+                        listener(payload)
+                    except Exception as exc:  # noqa: BLE001
+                        LOGGER.exception("Window listener failed: %s", exc)
+
+    def _tier_index(self, resolution: Optional[int], reference_ts: Optional[int]) -> int:
+        """Pick the tier for an explicit ``resolution`` or, when omitted, the
+        finest tier whose retention still covers ``reference_ts``."""
 
-            client_bucket[direction] = int(client_bucket[direction]) + length
-            proto_map: DefaultDict[str, Dict[str, int]] = client_bucket["proto"]
-            proto_totals = proto_map[protocol_key]
-            proto_totals[direction] = proto_totals.get(direction, 0) + length
+        if resolution is not None:
+            for index, tier in enumerate(self._tiers):
+                if tier.window_seconds == resolution:
+                    return index
+            raise ValueError(f"Unknown resolution {resolution}s; available: {self.resolutions}")
 
-            self._prune(reference_ts=timestamp)
+        if reference_ts is None:
+            return 0
+        newest = max(self._base.head, int(time.time()))
+        for index, tier in enumerate(self._tiers):
+            if reference_ts >= newest - tier.retention_seconds:
+                return index
+        return len(self._tiers) - 1
 
-    def get_summary(self, *, from_ts: Optional[int] = None, to_ts: Optional[int] = None) -> List[Dict[str, object]]:
-        """Return a flattened view of aggregated bins within the time range."""
+    def _tier_for(self, resolution: Optional[int], reference_ts: Optional[int]) -> _WindowRing:
+        return self._tiers[self._tier_index(resolution, reference_ts)]
+
+    def select_resolution(self, *, from_ts: Optional[int] = None, resolution: Optional[int] = None) -> int:
+        """Return the window size ``get_summary`` would use for this query."""
+
+        return self._tier_for(resolution, from_ts).window_seconds
+
+    def _summary_bins(
+        self,
+        tier: _WindowRing,
+        from_ts: Optional[int],
+        to_ts: Optional[int],
+        since: Optional[int],
+    ) -> Tuple[range, int]:
+        """Return the bin timestamps to scan and the retention cutoff."""
 
         now = int(time.time())
-        lower = from_ts if from_ts is not None else now - self.retention_seconds
+        lower = from_ts if from_ts is not None else now - tier.retention_seconds
         upper = to_ts if to_ts is not None else now
+        if since is not None:
+            lower = max(lower, since)
+        window = tier.window_seconds
 
-        with self._lock:
-            self._prune(reference_ts=upper)
-            payload: List[Dict[str, object]] = []
+        cutoff = max(tier.head, upper) - tier.retention_seconds
+        first_bin = tier.bin_ts(max(lower, cutoff))
+        if first_bin < lower:
+            first_bin += window
+        return range(first_bin, min(upper, tier.head) + 1, window), cutoff
 
-            for ts in sorted(self._data.keys()):
-                if ts < lower or ts > upper:
-                    continue
-                for client_ip, data in self._data[ts].items():
-                    payload.append(
-                        {
-                            "ts": ts,
-                            "client_ip": client_ip,
-                            "in_bytes": int(data["in"]),
-                            "out_bytes": int(data["out"]),
-                        }
-                    )
+    def _split_bins(self, index: int, bins: range) -> Tuple[_Snapshot, range, range]:
+        """Split ``bins`` into the part served by the snapshot and the still-open part."""
 
-        return payload
+        snapshot = self._current_snapshot()
+        if index or not bins:
+            return snapshot, bins, bins[len(bins):]
+        # Bins do tier base acima do closed_until publicado ainda recebem escrita
+        closed = len(range(bins.start, min(bins.stop, snapshot.closed_until + 1), bins.step))
+        return snapshot, bins[:closed], bins[closed:]
 
-    def get_drilldown(self, *, ts: int, client_ip: str) -> Optional[Dict[str, object]]:
-        """Return protocol-level details for a specific bin/client."""
+    def _window_rows(self, ts: int, bucket: _Window) -> List[Dict[str, object]]:
+        names = self._client_names
+        counters = bucket.counters
+        rows: List[Dict[str, object]] = []
+        for client_id, row in bucket.rows.items():
+            base = row * ROW_WIDTH
+            rows.append(
+                {
+                    "ts": ts,
+                    "client_ip": names[client_id],
+                    "in_bytes": counters[base],
+                    "out_bytes": counters[base + 1],
+                }
+            )
+        return rows
 
-        with self._lock:
-            bucket = self._data.get(ts)
+    def get_summary(
+        self,
+        *,
+        from_ts: Optional[int] = None,
+        to_ts: Optional[int] = None,
+        since: Optional[int] = None,
+        resolution: Optional[int] = None,
+        group_by: str = "ip",
+    ) -> List[Dict[str, object]]:
+        """Return a flattened view of aggregated bins within the time range.
+
+        ``since`` restricts the result to bins with ``ts >= since`` so pollers
+        can fetch only the bins that may have changed since their last call.
+        Rows of closed windows come from the published snapshot and are
+        built once per window. The tier is chosen from ``from_ts`` unless
+        ``resolution`` is given. With ``group_by`` set to ``prefix`` or
+        ``group``, ``client_ip`` holds the prefix or group name and rows are
+        summed per window; closed windows keep each rollup once built.
+        """
+
+        key_of = self.grouper.key_function(group_by) if group_by != "ip" else None
+        index = self._tier_index(resolution, from_ts)
+        tier = self._tiers[index]
+        bins, cutoff = self._summary_bins(tier, from_ts, to_ts, since)
+        snapshot, closed_bins, open_bins = self._split_bins(index, bins)
+        payload: List[Dict[str, object]] = []
+
+        for ts in closed_bins:
+            bucket = snapshot.readable(index, tier, ts, cutoff)
             if not bucket:
-                return None
+                continue
+            rows = bucket.summary
+            if rows is None:
+                rows = bucket.summary = self._window_rows(ts, bucket)
+            if key_of is not None:
+                grouped = bucket.grouped
+                if grouped is None:
+                    grouped = bucket.grouped = {}
+                rolled = grouped.get(group_by)
+                if rolled is None:
+                    rolled = grouped[group_by] = rollup_rows(rows, key_of)
+                rows = rolled
+            payload.extend(rows)
 
-            client_bucket = bucket.get(client_ip)
-            if not client_bucket:
-                return None
+        if open_bins:
+            waited = time.perf_counter()
+            with self._lock:
+                _SUMMARY_LOCK_WAIT.observe(time.perf_counter() - waited)
+                open_rows = []
+                for ts in open_bins:
+                    bucket = tier.readable(ts, cutoff)
+                    if bucket:
+                        open_rows.append(self._window_rows(ts, bucket))
+            # O rollup das janelas abertas roda fora do lock
+            for rows in open_rows:
+                payload.extend(rollup_rows(rows, key_of) if key_of is not None else rows)
 
-            proto_map: DefaultDict[str, Dict[str, int]] = client_bucket["proto"]
-            items = []
-            for protocol, totals in sorted(proto_map.items()):
-                items.append(
-                    {
-                        "protocol": protocol,
-                        "in_bytes": int(totals.get("in", 0)),
-                        "out_bytes": int(totals.get("out", 0)),
-                    }
+        return payload
+
+    def summary_etag(
+        self,
+        *,
+        from_ts: Optional[int] = None,
+        to_ts: Optional[int] = None,
+        since: Optional[int] = None,
+        resolution: Optional[int] = None,
+    ) -> str:
+        """Return a validator that changes whenever ``get_summary`` would change.
+
+        Closed bins contribute the revisions of their published windows, which
+        change only when a late packet or a rollup fold copies the window; the
+        ingest version is included only when the range reaches open bins.
+        """
+
+        index = self._tier_index(resolution, from_ts)
+        tier = self._tiers[index]
+        bins, cutoff = self._summary_bins(tier, from_ts, to_ts, since)
+        snapshot, closed_bins, open_bins = self._split_bins(index, bins)
+        revisions = array("Q")
+        for ts in closed_bins:
+            bucket = snapshot.readable(index, tier, ts, cutoff)
+            revisions.append(bucket.revision if bucket else 0)
+        digest = hashlib.blake2b(revisions.tobytes(), digest_size=8).hexdigest()
+        etag = f"{tier.window_seconds}-{bins.start}-{bins.stop}-{len(closed_bins)}-{digest}"
+        if open_bins:
+            etag += f"-{self._version}"
+        return f'W/"{etag}"'
+
+    def get_top(
+        self,
+        *,
+        k: int,
+        from_ts: Optional[int] = None,
+        to_ts: Optional[int] = None,
+        by: str = "total",
+        resolution: Optional[int] = None,
+    ) -> List[Dict[str, object]]:
+        """Return the ``k`` heaviest clients in the range from the window sketches.
+
+        ``bytes`` is an upper bound on the client's traffic and ``error`` the
+        maximum overestimate.
+        """
+
+        if not self.topk_capacity:
+            raise ValueError("Top-K sketches are disabled (topk_capacity=0)")
+        if by not in TOP_METRICS:
+            raise ValueError(f"Unknown metric {by!r}; expected one of {', '.join(TOP_METRICS)}")
+        metric = TOP_METRICS.index(by)
+
+        index = self._tier_index(resolution, from_ts)
+        tier = self._tiers[index]
+        bins, cutoff = self._summary_bins(tier, from_ts, to_ts, None)
+        snapshot, closed_bins, open_bins = self._split_bins(index, bins)
+        sketches = []
+        for ts in closed_bins:
+            bucket = snapshot.readable(index, tier, ts, cutoff)
+            if bucket and bucket.sketches:
+                sketches.append(bucket.sketches[metric])
+        if open_bins:
+            with self._lock:
+                live = [tier.readable(ts, cutoff) for ts in open_bins]
+                sketches.append(
+                    SpaceSaving.merged(
+                        self.topk_capacity, [bucket.sketches[metric] for bucket in live if bucket and bucket.sketches]
+                    )
                 )
 
+        merged = SpaceSaving.merged(self.topk_capacity, sketches)
+        names = self._client_names
+        return [
+            {"client_ip": names[client_id], "bytes": count, "error": error}
+            for client_id, count, error in merged.top(k)
+        ]
+
+    def get_series(
+        self,
+        *,
+        client_ips: Sequence[str],
+        from_ts: Optional[int] = None,
+        to_ts: Optional[int] = None,
+        resolution: Optional[int] = None,
+        protocols: bool = False,
+    ) -> Dict[str, object]:
+        """Return dense per-client arrays aligned on the bins of the range.
+
+        ``ts`` lists every bin of the tier in the range and each client gets
+        ``in_bytes``/``out_bytes`` (and per-protocol arrays when
+        ``protocols`` is set) with zeros where it had no traffic. Each bin
+        costs one lookup per requested client in the window's client→row
+        index, so the work follows the requested points, not the number of
+        clients in the range.
+        """
+
+        index = self._tier_index(resolution, from_ts)
+        tier = self._tiers[index]
+        bins, cutoff = self._summary_bins(tier, from_ts, to_ts, None)
+        snapshot, closed_bins, open_bins = self._split_bins(index, bins)
+        key_of = self._ingest_key or str
+        client_ids = [self._client_ids.get(key_of(client_ip)) for client_ip in client_ips]
+        width = ROW_WIDTH if protocols else 2
+        columns = [[[0] * len(bins) for _ in range(width)] for _ in client_ids]
+
+        def fill(position: int, bucket: Optional[_Window]) -> None:
+            if not bucket:
+                return
+            rows = bucket.rows
+            counters = bucket.counters
+            for client_columns, client_id in zip(columns, client_ids):
+                row = rows.get(client_id) if client_id is not None else None
+                if row is None:
+                    continue
+                base = row * ROW_WIDTH
+                for offset in range(width):
+                    client_columns[offset][position] = counters[base + offset]
+
+        for position, ts in enumerate(closed_bins):
+            fill(position, snapshot.readable(index, tier, ts, cutoff))
+        if open_bins:
+            with self._lock:
+                for position, ts in enumerate(open_bins, start=len(closed_bins)):
+                    fill(position, tier.readable(ts, cutoff))
+
+        series = []
+        for client_ip, client_columns in zip(client_ips, columns):
+            entry: Dict[str, object] = {
+                "client_ip": client_ip,
+                "in_bytes": client_columns[0],
+                "out_bytes": client_columns[1],
+            }
+            if protocols:
+                entry["protocols"] = {
+                    name: {"in_bytes": client_columns[2 + 2 * proto_id], "out_bytes": client_columns[3 + 2 * proto_id]}
+                    for proto_id, name in enumerate(PROTOCOLS)
+                    if any(client_columns[2 + 2 * proto_id]) or any(client_columns[3 + 2 * proto_id])
+                }
+            series.append(entry)
+        return {"resolution": tier.window_seconds, "ts": list(bins), "series": series}
+
+    def get_drilldown(
+        self,
+        *,
+        ts: int,
+        client_ip: str,
+        resolution: Optional[int] = None,
+    ) -> Optional[Dict[str, object]]:
+        """Return protocol-level details for a specific bin/client.
+
+        ``client_ip`` may be an address or an already-reduced key; with
+        ``client_key`` set to ``prefix``/``group`` it is mapped the same way
+        packets were at ingest.
+        """
+
+        index = self._tier_index(resolution, ts)
+        tier = self._tiers[index]
+        cutoff = tier.head - tier.retention_seconds
+        key_of = self._ingest_key or str
+        client_id = self._client_ids.get(key_of(client_ip))
+        if client_id is None:
+            return None
+
+        snapshot = self._current_snapshot()
+        if index or ts <= snapshot.closed_until:
+            bucket = snapshot.readable(index, tier, ts, cutoff)
+            row = bucket.rows.get(client_id) if bucket else None
+            totals = bucket.protocol_totals(row) if row is not None else None
+        else:
+            with self._lock:
+                bucket = tier.readable(ts, cutoff)
+                row = bucket.rows.get(client_id) if bucket else None
+                totals = bucket.protocol_totals(row) if row is not None else None
+        if totals is None:
+            return None
+
         return {
             "ts": ts,
             "client_ip": client_ip,
-            "items": items,
+            "items": [
+                {"protocol": protocol, "in_bytes": in_bytes, "out_bytes": out_bytes}
+                for protocol, in_bytes, out_bytes in totals
+            ],
         }
 
+    def get_range_drilldown(
+        self,
+        *,
+        from_ts: Optional[int] = None,
+        to_ts: Optional[int] = None,
+        client_ips: Optional[Sequence[str]] = None,
+        group_by: str = "protocol",
+        resolution: Optional[int] = None,
+    ) -> Dict[str, object]:
+        """Protocol mix over a time range for ``client_ips`` (``None`` = every client).
+
+        ``group_by`` adds one entry per ``client`` or per non-empty ``bin``
+        to the overall mix (``protocol`` returns the mix alone). Across all
+        clients, closed windows contribute their cached column totals, and a
+        ``protocol`` query reads the closed part of the range from the
+        snapshot's prefix sums in one subtraction. Listed clients cost one
+        row lookup per client and bin.
+        """
+
+        if group_by not in DRILLDOWN_GROUPS:
+            raise ValueError(f"group_by must be one of {', '.join(DRILLDOWN_GROUPS)}")
+        index = self._tier_index(resolution, from_ts)
+        tier = self._tiers[index]
+        bins, cutoff = self._summary_bins(tier, from_ts, to_ts, None)
+        snapshot, closed_bins, open_bins = self._split_bins(index, bins)
+        client_ids: Optional[List[int]] = None
+        if client_ips is not None:
+            key_of = self._ingest_key or str
+            known = (self._client_ids.get(key_of(client_ip)) for client_ip in client_ips)
+            client_ids = list(dict.fromkeys(client_id for client_id in known if client_id is not None))
+
+        overall = [0] * ROW_WIDTH
+        groups: Dict[int, List[int]] = {}
+
+        def collect(ts: int, bucket: Optional[_Window], sealed: bool) -> None:
+            if not bucket:
+                return
+            rows = bucket.rows
+            counters = bucket.counters
+            if group_by == "client":
+                selected = rows.items() if client_ids is None else ((cid, rows.get(cid)) for cid in client_ids)
+                for client_id, row in selected:
+                    if row is not None:
+                        entry = groups.get(client_id)
+                        if entry is None:
+                            entry = groups[client_id] = [0] * ROW_WIDTH
+                        _add_row(entry, counters, row * ROW_WIDTH)
+                return
+            if client_ids is None:
+                totals = bucket.totals if sealed else None
+                if totals is None:
+                    totals = bucket.row_totals()
+                    if sealed:
+                        bucket.totals = totals
+            else:
+                totals = [0] * ROW_WIDTH
+                for client_id in client_ids:
+                    row = rows.get(client_id)
+                    if row is not None:
+                        _add_row(totals, counters, row * ROW_WIDTH)
+            if group_by == "bin":
+                if any(totals[:2]):
+                    groups[ts] = totals
+            else:
+                _add_row(overall, totals, 0)
+
+        if closed_bins and client_ids is None and group_by == "protocol":
+            _add_row(overall, snapshot.range_totals(index, closed_bins[0], closed_bins[-1]), 0)
+        else:
+            for ts in closed_bins:
+                collect(ts, snapshot.readable(index, tier, ts, cutoff), True)
+        if open_bins:
+            with self._lock:
+                for ts in open_bins:
+                    collect(ts, tier.readable(ts, cutoff), False)
+
+        for totals in groups.values():
+            _add_row(overall, totals, 0)
+        if group_by == "client":
+            names = self._client_names
+            ranked = sorted(groups.items(), key=lambda item: item[1][0] + item[1][1], reverse=True)
+            keyed: List[Tuple[object, List[int]]] = [(names[client_id], totals) for client_id, totals in ranked]
+        else:
+            keyed = list(groups.items())
+        return {
+            "from_ts": bins.start,
+            "to_ts": bins[-1] if bins else bins.start,
+            "resolution": tier.window_seconds,
+            "group_by": group_by,
+            "in_bytes": overall[0],
+            "out_bytes": overall[1],
+            "items": _protocol_items(overall),
+            "groups": [
+                {"key": key, "in_bytes": totals[0], "out_bytes": totals[1], "items": _protocol_items(totals)}
+                for key, totals in keyed
+            ],
+        }
+
+    def memory_stats(self) -> Dict[int, Tuple[int, int, int]]:
+        """Per resolution: ``(non-empty windows, client rows, approximate bytes)``.
+
+        Bytes count the counter arrays and row-index dicts of retained
+        windows; sketches and cached summary rows are not included. The slot
+        lists are read without the ingest lock (ingestion only replaces their
+        items), so a slot recycled mid-scan may be counted in either state.
+        """
+
+        stats: Dict[int, Tuple[int, int, int]] = {}
+        for tier in self._tiers:
+            count = rows = size = 0
+            for ts, window in zip(list(tier.slot_ts), list(tier.windows)):
+                if ts < 0 or not window:
+                    continue
+                count += 1
+                rows += len(window.rows)
+                size += window.counters.buffer_info()[1] * window.counters.itemsize + sys.getsizeof(window.rows)
+            stats[tier.window_seconds] = (count, rows, size)
+        return stats
+
+    def register_metrics(self, registry: Registry = REGISTRY) -> None:
+        """Expose window, row and memory gauges, computed when ``registry`` is rendered."""
+
+        # Os três gauges de um scrape compartilham uma única varredura dos slots
+        cached: List[Any] = [float("-inf"), {}]
+
+        def stats() -> Dict[int, Tuple[int, int, int]]:
+            now = time.monotonic()
+            if now - cached[0] >= _MEMORY_STATS_SECONDS:
+                cached[:] = [now, self.memory_stats()]
+            return cached[1]
+
+        def gauge(position: int) -> Callable[[], Dict[Tuple[str, ...], float]]:
+            return lambda: {(str(resolution),): values[position] for resolution, values in stats().items()}
 
+        registry.callback(
+            "traffic_aggregator_windows", "Retained non-empty windows per resolution.", gauge(0), ("resolution",)
+        )
+        registry.callback(
+            "traffic_aggregator_window_rows", "Client rows across retained windows.", gauge(1), ("resolution",)
+        )
+        registry.callback(
+            "traffic_aggregator_memory_bytes",
+            "Approximate bytes held by retained window counters.",
+            gauge(2),
+            ("resolution",),
+        )
+        registry.callback(
+            "traffic_aggregator_future_packets_total",
+            "Packets dropped for timestamps ahead of the wall clock.",
+            lambda: self.future_packets,
+            kind="counter",
+        )
+        registry.callback("traffic_aggregator_clients", "Interned client addresses.", lambda: len(self._client_ids))
@@ -2,33 +2,121 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
 import threading
 import time
-from typing import Optional
+from typing import AsyncIterator, List, Optional, Tuple, Union
 
 import uvicorn
-from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
 
-from aggregator import TrafficAggregator
+from aggregator import TrafficAggregator, parse_rollup_tiers
 from capture import CaptureService
-from models import DrilldownResponse, HealthResponse, JsonDataRequest, JsonDataResponse, SummaryResponse
+from grouping import GROUP_BY, rollup_rows
+from history import HistoryStore
+from jsonstore import JsonDataStore, parse_json_records
+from metrics import CONTENT_TYPE, REGISTRY
+from models import (
+    ColumnarSummaryResponse,
+    DrilldownResponse,
+    FlowsResponse,
+    HealthResponse,
+    JsonDataBatchResponse,
+    JsonDataListResponse,
+    JsonDataRequest,
+    JsonDataResponse,
+    RangeDrilldownResponse,
+    SeriesResponse,
+    SummaryResponse,
+    TopResponse,
+)
+from netindex import resolve_server_ips
+from serialization import FORMATS, dumps, encode_summary
 from settings import Settings, get_settings
+from sharding import ShardedAggregator, ShardUnavailable
+from stream import WindowBroadcaster, parse_filter
+from tracing import PacketTracer
 
 
 LOGGER = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+SSE_KEEPALIVE_SECONDS = 15.0
+# Clientes por chamada de /api/series
+MAX_SERIES_CLIENTS = 100
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "traffic_api_request_seconds", "HTTP request latency by route.", ("route", "method", "status")
+)
+
 
 def create_app(settings: Optional[Settings] = None) -> FastAPI:
     settings = settings or get_settings()
-    aggregator = TrafficAggregator(
-        server_ip=settings.server_ip,
+    logging.getLogger().setLevel(settings.log_level.upper())
+    aggregator_kwargs = dict(
+        server_ip=resolve_server_ips(settings.server_ip, settings.iface),
         window_seconds=settings.window_seconds,
         retention_seconds=settings.retention_seconds,
+        rollup_tiers=parse_rollup_tiers(settings.rollup_tiers),
+        topk_capacity=settings.topk_capacity,
+        max_clients_per_window=settings.max_clients_per_window,
+        rollup_max_clients=settings.rollup_max_clients,
+        client_key=settings.client_key,
+        client_groups=settings.client_groups_file,
+        group_prefixes=(settings.client_group_v4_prefix, settings.client_group_v6_prefix),
+        # Reprodução mais rápida que o tempo gravado gera timestamps à frente do relógio
+        accept_future=settings.capture_source != "iface" and not 0 < settings.replay_speed <= 1,
+    )
+    capture_kwargs = dict(
+        iface=settings.iface,
+        backend=settings.capture_backend,
+        source=settings.capture_source,
+        replay_speed=settings.replay_speed,
+        batch_size=settings.capture_batch_size,
+        batch_interval_ms=settings.capture_batch_ms,
+        queue_size=settings.capture_queue_size,
+        queue_policy=settings.capture_queue_policy,
+        port_map=settings.protocol_ports,
+        capture_filter=settings.capture_filter,
+        snaplen=settings.capture_snaplen,
+        flow_cache_size=settings.flow_cache_size,
+        flow_table_size=settings.flow_table_size,
+        flow_idle_timeout=settings.flow_idle_timeout,
+        flow_active_timeout=settings.flow_active_timeout,
+        tracer=PacketTracer(
+            sample_every=settings.trace_sample_every,
+            client_ip=settings.trace_client_ip,
+            max_lines_per_second=settings.trace_max_lines_per_second,
+            summary_seconds=settings.capture_stats_seconds,
+        ),
+    )
+    aggregator = TrafficAggregator(**aggregator_kwargs)
+    capture_service = CaptureService(aggregator=aggregator, **capture_kwargs)
+    sharded = (
+        ShardedAggregator(shards=settings.shards, aggregator_kwargs=aggregator_kwargs, capture_kwargs=capture_kwargs)
+        if settings.shards > 1
+        else None
+    )
+    broadcaster = WindowBroadcaster(aggregator, max_queue=settings.stream_queue_size)
+    history = (
+        HistoryStore(settings.history_dir, flush_seconds=settings.history_flush_seconds)
+        if settings.history_dir and sharded is None
+        else None
+    )
+    json_store = (
+        JsonDataStore(
+            settings.json_store_path,
+            queue_size=settings.json_queue_size,
+            flush_seconds=settings.json_flush_ms / 1000.0,
+        )
+        if settings.json_store_path
+        else None
     )
-    capture_service = CaptureService(aggregator=aggregator, iface=settings.iface)
 
     app = FastAPI(title="Realtime Traffic Dashboard", version="1.0.0")
 
@@ -39,66 +127,346 @@ def create_app(settings: Optional[Settings] = None) -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],  # Allow all methods
         allow_headers=["*"],  # Allow all headers
+        expose_headers=["ETag"],
     )
 
+    if sharded is None:
+        # Com shards a captura roda em outros processos; só a latência da API fica visível aqui
+        aggregator.register_metrics()
+        capture_service.register_metrics()
+    if json_store is not None:
+        json_store.register_metrics()
+
+    @app.exception_handler(ShardUnavailable)
+    async def _shard_unavailable(request: Request, exc: ShardUnavailable) -> JSONResponse:
+        # Sem o shard, a resposta omitiria parte do tráfego em silêncio
+        return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+    @app.middleware("http")
+    async def _observe_latency(request: Request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        # Rota como template (/api/summary), não a URL, para limitar a cardinalidade
+        route = request.scope.get("route")
+        REQUEST_SECONDS.labels(getattr(route, "path", "unmatched"), request.method, str(response.status_code)).observe(
+            time.perf_counter() - started
+        )
+        return response
+
     @app.on_event("startup")
     def _startup() -> None:
+        if json_store is not None:
+            json_store.open()
+        if sharded is not None:
+            # Cada shard captura e agrega no próprio processo; o agregador local fica ocioso
+            LOGGER.warning("Running %d capture shards; streaming and history are disabled", settings.shards)
+            sharded.start()
+            return
+        if history is not None:
+            history.open()
+            restored = aggregator.restore_rows(history.load_latest_segment())
+            LOGGER.info("Warm-loaded %d history rows from %s", restored, settings.history_dir)
+            aggregator.add_window_listener(history.append_window)
         LOGGER.info("Starting capture thread")
         capture_service.start()
 
+    @app.on_event("startup")
+    async def _start_stream() -> None:
+        await broadcaster.start()
+
     @app.on_event("shutdown")
     def _shutdown() -> None:
+        if json_store is not None:
+            json_store.close()
+        if sharded is not None:
+            sharded.stop()
+            return
         LOGGER.info("Stopping capture thread")
         capture_service.stop()
+        if history is not None:
+            history.close()
+
+    @app.on_event("shutdown")
+    async def _stop_stream() -> None:
+        await broadcaster.stop()
 
     def get_aggregator() -> TrafficAggregator:
-        return aggregator
+        return sharded if sharded is not None else aggregator  # type: ignore[return-value]
 
     @app.get("/api/health", response_model=HealthResponse)
     def health() -> HealthResponse:
         return HealthResponse(ok=True, now=int(time.time()))
 
-    @app.get("/api/summary", response_model=SummaryResponse)
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics() -> PlainTextResponse:
+        return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+    @app.get("/api/summary", response_model=Union[SummaryResponse, ColumnarSummaryResponse])
     def summary(
         from_ts: Optional[int] = Query(default=None),
         to_ts: Optional[int] = Query(default=None),
+        since: Optional[int] = Query(default=None),
+        resolution: Optional[int] = Query(default=None),
+        group_by: str = Query(default="ip"),
+        layout: str = Query(default="rows", alias="format"),
+        if_none_match: Optional[str] = Header(default=None),
         aggregator: TrafficAggregator = Depends(get_aggregator),
-    ) -> SummaryResponse:
-        bins = aggregator.get_summary(from_ts=from_ts, to_ts=to_ts)
-        return SummaryResponse(bins=bins)
+    ) -> Response:
+        """Traffic bins; ``format=columnar`` returns ``{"columns": {"ts": [...], ...}}`` instead of ``bins``."""
+        if group_by not in GROUP_BY:
+            raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUP_BY)}")
+        if layout not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+        try:
+            resolution = aggregator.select_resolution(from_ts=from_ts, resolution=resolution)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+        stored_range: Optional[Tuple[int, int]] = None
+        if history is not None and from_ts is not None:
+            # A parte do intervalo que não está mais em memória vem dos segmentos em disco
+            retained = aggregator.retained_since(resolution)
+            lower = max(from_ts, since) if since is not None else from_ts
+            upper = to_ts if to_ts is not None else int(time.time())
+            if retained is not None:
+                upper = min(upper, retained - 1)
+            if lower <= upper:
+                stored_range = (lower, upper)
+
+        etag = aggregator.summary_etag(from_ts=from_ts, to_ts=to_ts, since=since, resolution=resolution)
+        if stored_range is not None:
+            etag = f'{etag[:-1]}-h{history.rows_written}"'
+        if group_by != "ip" or layout != "rows":
+            etag = f'{etag[:-1]}-{group_by}-{layout}"'
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
 
-    @app.get("/api/drilldown", response_model=DrilldownResponse)
+        bins = aggregator.get_summary(
+            from_ts=from_ts, to_ts=to_ts, since=since, resolution=resolution, group_by=group_by
+        )
+        if stored_range is not None:
+            stored = history.get_summary(from_ts=stored_range[0], to_ts=stored_range[1], resolution=resolution)
+            if group_by != "ip":
+                stored = rollup_rows(stored, aggregator.grouper.key_function(group_by))
+            bins = stored + bins
+        # As linhas já têm o formato do SummaryResponse; pular a validação por linha é o ganho aqui
+        return Response(
+            content=encode_summary(bins, resolution, layout), media_type="application/json", headers={"ETag": etag}
+        )
+
+    @app.get("/api/drilldown", response_model=Union[DrilldownResponse, RangeDrilldownResponse])
     def drilldown(
+        ts: Optional[int] = Query(default=None),
+        client_ip: Optional[str] = Query(default=None),
+        from_ts: Optional[int] = Query(default=None),
+        to_ts: Optional[int] = Query(default=None),
+        clients: Optional[str] = Query(default=None, description="Comma-separated addresses or * for all"),
+        group_by: str = Query(default="protocol"),
+        resolution: Optional[int] = Query(default=None),
+        aggregator: TrafficAggregator = Depends(get_aggregator),
+    ) -> Response:
+        """One bin of one client (``ts`` + ``client_ip``) or a range over several clients."""
+        if ts is not None:
+            if client_ip is None:
+                raise HTTPException(status_code=400, detail="client_ip is required with ts")
+            try:
+                result = aggregator.get_drilldown(ts=ts, client_ip=client_ip, resolution=resolution)
+                if not result and history is not None:
+                    span = aggregator.select_resolution(from_ts=ts, resolution=resolution)
+                    result = history.get_drilldown(ts=ts, client_ip=client_ip, resolution=span)
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=str(exc)) from exc
+            if not result:
+                raise HTTPException(status_code=404, detail="Bin not found")
+            return Response(content=dumps(result), media_type="application/json")
+
+        client_ips: Optional[List[str]] = None
+        if clients is not None and clients.strip() != "*":
+            client_ips = [client.strip() for client in clients.split(",") if client.strip()]
+        elif client_ip is not None:
+            client_ips = [client_ip]
+        try:
+            result = aggregator.get_range_drilldown(
+                from_ts=from_ts, to_ts=to_ts, client_ips=client_ips, group_by=group_by, resolution=resolution
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        return Response(content=dumps(result), media_type="application/json")
+
+    def series_response(
+        aggregator: TrafficAggregator,
+        client_ips: List[str],
+        from_ts: Optional[int],
+        to_ts: Optional[int],
+        resolution: Optional[int],
+        protocols: bool,
+        if_none_match: Optional[str],
+    ) -> Response:
+        try:
+            resolution = aggregator.select_resolution(from_ts=from_ts, resolution=resolution)
+            # Mesmo validador do summary: a série só muda quando os bins do intervalo mudam
+            etag = aggregator.summary_etag(from_ts=from_ts, to_ts=to_ts, resolution=resolution)
+            etag = f'{etag[:-1]}-series{"-p" if protocols else ""}"'
+            if if_none_match == etag:
+                return Response(status_code=304, headers={"ETag": etag})
+            result = aggregator.get_series(
+                client_ips=client_ips, from_ts=from_ts, to_ts=to_ts, resolution=resolution, protocols=protocols
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        return Response(content=dumps(result), media_type="application/json", headers={"ETag": etag})
+
+    @app.get("/api/clients/{client_ip}/series", response_model=SeriesResponse)
+    def client_series(
+        client_ip: str,
+        from_ts: Optional[int] = Query(default=None),
+        to_ts: Optional[int] = Query(default=None),
+        resolution: Optional[int] = Query(default=None),
+        protocols: bool = Query(default=False),
+        if_none_match: Optional[str] = Header(default=None),
+        aggregator: TrafficAggregator = Depends(get_aggregator),
+    ) -> Response:
+        """Dense ``ts``/``in_bytes``/``out_bytes`` arrays of one client, zero-filled."""
+        return series_response(aggregator, [client_ip], from_ts, to_ts, resolution, protocols, if_none_match)
+
+    @app.get("/api/series", response_model=SeriesResponse)
+    def series(
+        clients: str = Query(..., description="Comma-separated client addresses"),
+        from_ts: Optional[int] = Query(default=None),
+        to_ts: Optional[int] = Query(default=None),
+        resolution: Optional[int] = Query(default=None),
+        protocols: bool = Query(default=False),
+        if_none_match: Optional[str] = Header(default=None),
+        aggregator: TrafficAggregator = Depends(get_aggregator),
+    ) -> Response:
+        """Same as the per-client series for several clients sharing one ``ts`` axis."""
+        client_ips = list(dict.fromkeys(client.strip() for client in clients.split(",") if client.strip()))
+        if not client_ips or len(client_ips) > MAX_SERIES_CLIENTS:
+            raise HTTPException(status_code=400, detail=f"clients must list 1 to {MAX_SERIES_CLIENTS} addresses")
+        return series_response(aggregator, client_ips, from_ts, to_ts, resolution, protocols, if_none_match)
+
+    @app.get("/api/flows", response_model=FlowsResponse)
+    def flows(
         ts: int = Query(...),
         client_ip: str = Query(...),
+        resolution: Optional[int] = Query(default=None),
+        limit: int = Query(default=100, ge=1, le=1000),
         aggregator: TrafficAggregator = Depends(get_aggregator),
-    ) -> DrilldownResponse:
-        result = aggregator.get_drilldown(ts=ts, client_ip=client_ip)
-        if not result:
-            raise HTTPException(status_code=404, detail="Bin not found")
-        return DrilldownResponse(**result)
-
-    @app.post("/api/json-data", response_model=JsonDataResponse)
-    def receive_json_data(
-        request: JsonDataRequest,
+    ) -> FlowsResponse:
+        try:
+            span = aggregator.select_resolution(from_ts=ts, resolution=resolution)
+            if sharded is not None:
+                items = sharded.get_flows(client_ip=client_ip, from_ts=ts, to_ts=ts + span, limit=limit)
+            elif capture_service.flows is not None:
+                items = capture_service.flows.get_flows(client_ip=client_ip, from_ts=ts, to_ts=ts + span, limit=limit)
+            else:
+                raise HTTPException(status_code=404, detail="Flow table is disabled (FLOW_TABLE_SIZE=0)")
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        return FlowsResponse(ts=ts, client_ip=client_ip, resolution=span, flows=items)
+
+    @app.get("/api/top", response_model=TopResponse)
+    def top(
+        k: int = Query(default=20, ge=1, le=1000),
+        from_ts: Optional[int] = Query(default=None),
+        to_ts: Optional[int] = Query(default=None),
+        by: str = Query(default="total"),
+        resolution: Optional[int] = Query(default=None),
         aggregator: TrafficAggregator = Depends(get_aggregator),
-    ) -> JsonDataResponse:
-        """Receive and process JSON data sent via FTP."""
-        LOGGER.info("📄 JSON DATA RECEIVED: client_id=%s, type=%s, size=%d bytes", 
-                   request.client_id, request.data_type, request.file_size)
-        
-        # Log the payload for debugging
-        LOGGER.info("📄 JSON PAYLOAD: %s", request.payload)
-        
-        # Process the JSON data (you can add business logic here)
+    ) -> TopResponse:
+        try:
+            items = aggregator.get_top(k=k, from_ts=from_ts, to_ts=to_ts, by=by, resolution=resolution)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        return TopResponse(by=by, items=items)
+
+    @app.websocket("/api/stream")
+    async def stream(
+        websocket: WebSocket,
+        clients: Optional[str] = Query(default=None),
+        protocols: Optional[str] = Query(default=None),
+    ) -> None:
+        """Push each closed window's per-client totals as it closes."""
+        await websocket.accept()
+        subscription = broadcaster.subscribe(clients=parse_filter(clients), protocols=parse_filter(protocols, upper=True))
+        try:
+            while True:
+                await websocket.send_json(await subscription.next())
+        except WebSocketDisconnect:
+            pass
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    @app.get("/api/stream/sse")
+    async def stream_sse(
+        request: Request,
+        clients: Optional[str] = Query(default=None),
+        protocols: Optional[str] = Query(default=None),
+    ) -> StreamingResponse:
+        """Server-Sent Events fallback for ``/api/stream``."""
+        subscription = broadcaster.subscribe(clients=parse_filter(clients), protocols=parse_filter(protocols, upper=True))
+
+        async def events() -> AsyncIterator[str]:
+            try:
+                while not await request.is_disconnected():
+                    try:
+                        frame = await asyncio.wait_for(subscription.next(), timeout=SSE_KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                        continue
+                    yield f"event: window\ndata: {json.dumps(frame)}\n\n"
+            finally:
+                broadcaster.unsubscribe(subscription)
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    @app.post("/api/json-data", response_model=Union[JsonDataResponse, JsonDataBatchResponse])
+    async def receive_json_data(request: Request) -> Union[JsonDataResponse, JsonDataBatchResponse]:
+        """Accept one ``JsonDataRequest`` or a batch (JSON array / NDJSON) and queue it for storage."""
+
+        body = await request.body()
+        ndjson = "ndjson" in request.headers.get("content-type", "")
+        try:
+            items = parse_json_records(body, ndjson=ndjson)
+            records = [JsonDataRequest.model_validate(item) for item in items]
+        except ValidationError as exc:
+            raise HTTPException(status_code=422, detail=exc.errors()) from None
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from None
+        if not records:
+            raise HTTPException(status_code=400, detail="No JSON records in request body")
+
         processed_at = int(time.time())
-        
+        if json_store is not None and not json_store.submit([record.model_dump() for record in records]):
+            raise HTTPException(status_code=503, detail="JSON ingest queue is full", headers={"Retry-After": "1"})
+        LOGGER.debug("JSON data received: %d records from %s", len(records), records[0].client_id)
+
+        if ndjson or len(records) > 1 or body.lstrip().startswith(b"["):
+            return JsonDataBatchResponse(
+                received=True,
+                processed_at=processed_at,
+                records=len(records),
+                client_ids=sorted({record.client_id for record in records}),
+            )
+        record = records[0]
         return JsonDataResponse(
             received=True,
             processed_at=processed_at,
-            client_id=request.client_id,
-            file_size=request.file_size,
-            message=f"JSON data from {request.client_id} processed successfully"
+            client_id=record.client_id,
+            file_size=record.file_size,
+            message=f"JSON data from {record.client_id} processed successfully",
+        )
+
+    @app.get("/api/json-data", response_model=JsonDataListResponse)
+    def list_json_data(
+        client_id: str = Query(..., description="Client that posted the payloads"),
+        limit: int = Query(50, ge=1, le=1000),
+        since: Optional[int] = Query(None, description="Only records with timestamp >= since"),
+    ) -> JsonDataListResponse:
+        if json_store is None:
+            raise HTTPException(status_code=404, detail="JSON storage is disabled (set JSON_STORE_PATH)")
+        return JsonDataListResponse(
+            client_id=client_id, records=json_store.recent(client_id=client_id, limit=limit, since=since)
         )
 
     return app
@@ -0,0 +1 @@
+"""Throughput benchmarks for the capture and aggregation pipeline."""
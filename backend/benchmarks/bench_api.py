@@ -0,0 +1,270 @@
+"""HTTP latency of the API endpoints while the capture pipeline is ingesting.
+
+For every combination of client cardinality and retention, a synthetic
+trace (``gen_trace``) is written and replayed at its recorded rate as the
+capture source of a real ``create_app()`` served by uvicorn in a child
+process, so the server does not share a GIL with the load generator.
+After a warm-up, each endpoint is hit by ``--concurrency`` keep-alive
+connections for ``--seconds``; the report gives requests/s, p50/p99
+latency, errors and the packets/s the capture accepted meanwhile (from
+``/metrics``). Results are printed as JSON (and written to ``--output``);
+``--baseline`` compares against an earlier file and exits non-zero when
+p99 or requests/s regress beyond ``--tolerance``. Run from ``backend/``::
+
+    python -m benchmarks.bench_api --clients 100,10000 --retention 300 --output api.json
+    python -m benchmarks.bench_api --clients 100,10000 --retention 300 --baseline api.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.gen_trace import generate
+from pcap import write_pcap
+
+SERVER_IP = "10.50.0.10"
+# gen_trace numera os clientes a partir de 172.16.0.1, o mais popular da cauda longa
+TOP_CLIENT = "172.16.0.1"
+PERCENTILES = (50, 99)
+
+_JSON_RECORD = json.dumps(
+    {"client_id": "bench", "timestamp": 0, "data_type": "sensor_data", "payload": {"temperature": 23.5}, "file_size": 64}
+).encode()
+
+# nome -> (método, caminho, corpo)
+ENDPOINTS: Dict[str, Tuple[str, str, Optional[bytes]]] = {
+    "summary": ("GET", "/api/summary", None),
+    "summary_since": ("GET", "/api/summary?since={recent}", None),
+    "drilldown_client": ("GET", f"/api/drilldown?client_ip={TOP_CLIENT}", None),
+    "drilldown_all": ("GET", "/api/drilldown?group_by=client", None),
+    "series": ("GET", f"/api/clients/{TOP_CLIENT}/series", None),
+    "json_data": ("POST", "/api/json-data", _JSON_RECORD),
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(settings_kwargs: Dict[str, Any], port: int) -> None:
+    # app.py cria uma instância no import a partir do ambiente; SERVER_IP evita a detecção "auto"
+    os.environ.setdefault("SERVER_IP", SERVER_IP)
+    import uvicorn
+
+    from app import create_app
+    from settings import Settings
+
+    uvicorn.run(create_app(Settings(**settings_kwargs)), host="127.0.0.1", port=port, log_level="warning")
+
+
+def _request(conn: http.client.HTTPConnection, method: str, path: str, body: Optional[bytes]) -> int:
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def _wait_ready(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            if _request(conn, "GET", "/api/health", None) == 200:
+                conn.close()
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"API did not start on port {port} within {timeout:.0f}s")
+
+
+def _scrape(port: int, name: str) -> float:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", "/metrics")
+    text = conn.getresponse().read().decode()
+    conn.close()
+    for line in text.splitlines():
+        if line.startswith(name + " ") or line.startswith(name + "{"):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def _percentile(samples: List[float], value: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * value / 100))]
+
+
+def load(port: int, endpoint: str, seconds: float, concurrency: int) -> Dict[str, Any]:
+    """Hit one endpoint from ``concurrency`` keep-alive connections for ``seconds``."""
+
+    method, template, body = ENDPOINTS[endpoint]
+    latencies: List[List[float]] = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    deadline = time.monotonic() + seconds
+
+    def worker(slot: int) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        samples = latencies[slot]
+        while time.monotonic() < deadline:
+            path = template.format(recent=int(time.time()) - 10)
+            started = time.perf_counter()
+            try:
+                status = _request(conn, method, path, body)
+            except (OSError, http.client.HTTPException):
+                errors[slot] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            samples.append(time.perf_counter() - started)
+            if status >= 400:
+                errors[slot] += 1
+        conn.close()
+
+    packets_before = _scrape(port, "traffic_capture_accepted_total")
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    accepted = _scrape(port, "traffic_capture_accepted_total") - packets_before
+
+    samples = sorted(sample for slot in latencies for sample in slot)
+    result: Dict[str, Any] = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": sum(errors),
+        "rps": round(len(samples) / elapsed, 1),
+    }
+    for value in PERCENTILES:
+        result[f"p{value}_ms"] = round(_percentile(samples, value) * 1e3, 2)
+    result["ingest_pps"] = round(accepted / elapsed, 1)
+    return result
+
+
+def run_case(args: argparse.Namespace, clients: int, retention: int, tmp: str) -> List[Dict[str, Any]]:
+    endpoints = args.endpoints.split(",")
+    duration = args.warmup + len(endpoints) * args.seconds + 10
+    trace = os.path.join(tmp, f"trace-{clients}.pcap")
+    with open(trace, "wb") as handle:
+        write_pcap(
+            handle,
+            generate(
+                packets=int(args.pps * duration), clients=clients, server_ip=SERVER_IP, pps=args.pps, start=time.time()
+            ),
+        )
+    settings_kwargs = dict(
+        server_ip=SERVER_IP,
+        capture_source=f"file:{trace}",
+        replay_speed=1.0,
+        retention_seconds=retention,
+        json_store_path=os.path.join(tmp, f"json-{clients}-{retention}.sqlite3"),
+        log_level="WARNING",
+    )
+    port = _free_port()
+    server = multiprocessing.get_context("spawn").Process(target=_serve, args=(settings_kwargs, port), daemon=True)
+    server.start()
+    try:
+        _wait_ready(port)
+        time.sleep(args.warmup)
+        results = []
+        for endpoint in endpoints:
+            result = load(port, endpoint, args.seconds, args.concurrency)
+            result.update(clients=clients, retention_seconds=retention, pps=args.pps)
+            print(
+                f"  {endpoint:<17} {result['rps']:>8.1f} req/s  p50 {result['p50_ms']:>7.2f} ms"
+                f"  p99 {result['p99_ms']:>7.2f} ms  errors {result['errors']}  ingest {result['ingest_pps']:,.0f} pkt/s",
+                file=sys.stderr,
+            )
+            results.append(result)
+        return results
+    finally:
+        server.terminate()
+        server.join(timeout=10)
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    """Describe runs whose p99 grew or requests/s dropped by more than ``tolerance``."""
+
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = {
+            (run["endpoint"], run["clients"], run["retention_seconds"]): run for run in json.load(handle)["runs"]
+        }
+    regressions = []
+    for run in results:
+        previous = baseline.get((run["endpoint"], run["clients"], run["retention_seconds"]))
+        if previous is None:
+            continue
+        label = f"{run['endpoint']} clients={run['clients']} retention={run['retention_seconds']}"
+        if previous["p99_ms"] and run["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p99 {previous['p99_ms']} -> {run['p99_ms']} ms")
+        if previous["rps"] and run["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{label}: {previous['rps']} -> {run['rps']} req/s")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", default="100,10000", help="comma-separated client cardinalities")
+    parser.add_argument("--retention", default="300", help="comma-separated RETENTION_SECONDS values")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"subset of {', '.join(ENDPOINTS)}")
+    parser.add_argument("--pps", type=float, default=20_000.0, help="ingest rate of the replayed trace")
+    parser.add_argument("--seconds", type=float, default=5.0, help="load duration per endpoint")
+    parser.add_argument("--warmup", type=float, default=10.0, help="ingest time before the first endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", help="write the JSON report here as well")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    unknown = set(args.endpoints.split(",")) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    runs: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for retention in (int(value) for value in args.retention.split(",")):
+            for clients in (int(value) for value in args.clients.split(",")):
+                print(f"{clients:,} clients, retention {retention}s, {args.pps:,.0f} pkt/s", file=sys.stderr)
+                runs.extend(run_case(args, clients, retention, tmp))
+
+    report = {
+        "meta": {
+            "started": int(time.time()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "runs": runs,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    if args.baseline:
+        regressions = compare(runs, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
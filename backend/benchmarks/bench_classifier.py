@@ -0,0 +1,155 @@
+"""Protocol classification cost: legacy hasattr/port ladder versus ``ProtocolClassifier``.
+
+Synthetic packets mimic pyshark's lazily dissected layers: every attribute
+probe walks the layer list, as ``Packet.__getattr__`` does. Run from
+``backend/``::
+
+    python -m benchmarks.bench_classifier --packets 200000 --flows 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import time
+from typing import Callable, List, Sequence
+
+from classifier import ProtocolClassifier, flow_key, inspect_layers
+from decoder import IPPROTO_ICMP, IPPROTO_TCP, IPPROTO_UDP
+
+LOGGER = logging.getLogger("legacy")
+
+
+class _Layer:
+    def __init__(self, layer_name: str, **fields: str) -> None:
+        self.layer_name = layer_name
+        self.__dict__.update(fields)
+
+
+class FakePacket:
+    """Minimal stand-in for ``pyshark.packet.packet.Packet``."""
+
+    def __init__(self, layers: Sequence[_Layer], transport_layer: str) -> None:
+        self.layers = list(layers)
+        self.transport_layer = transport_layer
+
+    def __getattr__(self, name: str):
+        for layer in self.__dict__["layers"]:
+            if layer.layer_name == name:
+                return layer
+        raise AttributeError(name)
+
+
+def legacy_by_ports(ip_proto: int, src_port: int, dst_port: int) -> str:
+    if ip_proto == IPPROTO_TCP:
+        LOGGER.info("TCP packet: src_port=%s, dst_port=%s", src_port, dst_port)
+        if (src_port == 21 or dst_port == 21 or src_port == 20 or dst_port == 20 or
+                (30000 <= src_port <= 30009) or (30000 <= dst_port <= 30009)):
+            LOGGER.info("FTP DETECTED BY PORT! src_port=%s, dst_port=%s", src_port, dst_port)
+            return "FTP"
+        if src_port == 80 or dst_port == 80:
+            LOGGER.info("HTTP DETECTED BY PORT! src_port=%s, dst_port=%s", src_port, dst_port)
+            return "HTTP"
+        if src_port == 443 or dst_port == 443:
+            LOGGER.info("HTTPS DETECTED BY PORT! src_port=%s, dst_port=%s", src_port, dst_port)
+            return "HTTPS/TLS"
+        if src_port == 53 or dst_port == 53:
+            LOGGER.info("DNS DETECTED BY PORT! src_port=%s, dst_port=%s", src_port, dst_port)
+            return "DNS"
+        LOGGER.info("TCP GENERIC: src_port=%s, dst_port=%s", src_port, dst_port)
+        return "TCP"
+    if ip_proto == IPPROTO_UDP:
+        LOGGER.info("UDP packet: src_port=%s, dst_port=%s", src_port, dst_port)
+        if src_port == 53 or dst_port == 53:
+            LOGGER.info("DNS DETECTED BY UDP PORT! src_port=%s, dst_port=%s", src_port, dst_port)
+            return "DNS"
+        return "UDP"
+    if ip_proto == IPPROTO_ICMP:
+        LOGGER.info("ICMP packet detected")
+        return "ICMP"
+    LOGGER.info("UNKNOWN PROTOCOL")
+    return "OTHER"
+
+
+def legacy_detect(packet: FakePacket) -> str:
+    """Copy of ``CaptureService._detect_protocol`` before the classifier."""
+
+    for layer_name, protocol in (("http", "HTTP"), ("ftp", "FTP"), ("ftp-data", "FTP"), ("dns", "DNS"),
+                                 ("tls", "HTTPS/TLS"), ("ssl", "HTTPS/TLS")):
+        if hasattr(packet, layer_name):
+            LOGGER.info("%s DETECTED BY LAYER!", protocol)
+            return protocol
+    try:
+        if hasattr(packet, "tcp"):
+            return legacy_by_ports(IPPROTO_TCP, int(packet.tcp.srcport), int(packet.tcp.dstport))
+        elif hasattr(packet, "udp"):
+            return legacy_by_ports(IPPROTO_UDP, int(packet.udp.srcport), int(packet.udp.dstport))
+        elif hasattr(packet, "icmp"):
+            return legacy_by_ports(IPPROTO_ICMP, 0, 0)
+    except Exception as exc:  # noqa: BLE001
+        LOGGER.debug("Error detecting protocol by port: %s", exc)
+    LOGGER.info("UNKNOWN PROTOCOL")
+    return "OTHER"
+
+
+def build_packets(count: int, flows: int, seed: int = 7) -> List[FakePacket]:
+    rng = random.Random(seed)
+    templates = []
+    for index in range(flows):
+        src = f"192.168.{index // 250}.{index % 250 + 1}"
+        dport, app = rng.choice(((80, "http"), (443, "tls"), (21, "ftp"), (53, None), (8080, None), (22, None)))
+        transport = "udp" if dport == 53 else "tcp"
+        ports = {"srcport": str(rng.randrange(1024, 65535)), "dstport": str(dport)}
+        ip = _Layer("ip", src=src, dst="10.50.0.10", proto=str(IPPROTO_UDP if transport == "udp" else IPPROTO_TCP))
+        layers = [_Layer("eth"), ip, _Layer(transport, **ports)]
+        if app:
+            layers.append(_Layer(app))
+        templates.append(FakePacket(layers, transport.upper()))
+    return [templates[rng.randrange(flows)] for _ in range(count)]
+
+
+def _new_detect(classifier: ProtocolClassifier) -> Callable[[FakePacket], str]:
+    def detect(packet: FakePacket) -> str:
+        ip_proto = int(packet.ip.proto)
+        layer = getattr(packet, packet.transport_layer.lower())
+        src_port, dst_port = int(layer.srcport), int(layer.dstport)
+        key = flow_key(ip_proto, packet.ip.src, src_port, packet.ip.dst, dst_port)
+        return classifier.classify_flow(key, ip_proto, src_port, dst_port, lambda: inspect_layers(packet.layers))
+
+    return detect
+
+
+def _time(label: str, function: Callable, items: Sequence) -> float:
+    started = time.perf_counter()
+    for item in items:
+        function(*item) if isinstance(item, tuple) else function(item)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {len(items) / elapsed:>14,.0f} pkt/s  {elapsed / len(items) * 1e9:>8.0f} ns/pkt")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--packets", type=int, default=200_000)
+    parser.add_argument("--flows", type=int, default=2_000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    packets = build_packets(args.packets, args.flows)
+    legacy = _time("legacy hasattr chain", legacy_detect, packets)
+    new = _time("classifier + flow cache", _new_detect(ProtocolClassifier()), packets)
+    print(f"speedup (pyshark path): {legacy / new:.2f}x")
+
+    rng = random.Random(11)
+    headers = [
+        (rng.choice((IPPROTO_TCP, IPPROTO_UDP)), rng.randrange(1024, 65535), rng.choice((80, 443, 21, 53, 8080, 30005)))
+        for _ in range(args.packets)
+    ]
+    legacy = _time("legacy port ladder", legacy_by_ports, headers)
+    new = _time("port lookup table", ProtocolClassifier().classify_ports, headers)
+    print(f"speedup (raw socket path): {legacy / new:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Ingest latency of a paced writer while summary readers poll the aggregator.
+
+Fills a 1 s-window aggregator with ``--clients`` clients over its whole
+retention, then runs one writer at ``--pps`` (batches of ``--batch``)
+against ``--readers`` threads calling ``get_summary`` in a loop. Readers
+either hold the ingest lock for the whole query, as before the published
+snapshot, or use the snapshot, where only open bins take the lock. Reports
+writer throughput, writer p99 latency and reader queries/s. Run from
+``backend/``::
+
+    python -m benchmarks.bench_contention --clients 3000 --readers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from aggregator import TrafficAggregator
+
+SERVER_IP = "10.50.0.10"
+
+
+def _sources(count: int) -> List[str]:
+    return [f"192.168.{client // 250}.{client % 250 + 1}" for client in range(count)]
+
+
+def make_loaded_aggregator(clients: int) -> TrafficAggregator:
+    aggregator = TrafficAggregator(server_ip=SERVER_IP, window_seconds=1, retention_seconds=60)
+    now = int(time.time())
+    sources = _sources(clients)
+    for ts in range(now - 59, now):
+        aggregator.add_packets([ts] * clients, sources, [SERVER_IP] * clients, [100] * clients, ["HTTP"] * clients)
+    return aggregator
+
+
+def locked_summary(aggregator: TrafficAggregator) -> List[Dict[str, object]]:
+    # Comportamento anterior: a consulta inteira roda com o lock de ingestão
+    with aggregator._lock:
+        tier = aggregator._base
+        bins, cutoff = aggregator._summary_bins(tier, None, None, None)
+        rows: List[Dict[str, object]] = []
+        for ts in bins:
+            bucket = tier.readable(ts, cutoff)
+            if not bucket:
+                continue
+            window_rows = bucket.summary
+            if window_rows is None:
+                window_rows = aggregator._window_rows(ts, bucket)
+                if ts < tier.head:
+                    bucket.summary = window_rows
+            rows.extend(window_rows)
+    return rows
+
+
+def run(args: argparse.Namespace, locked_readers: bool) -> Tuple[float, float, float]:
+    """Return (writer packets/s, writer p99 seconds, reader queries/s)."""
+
+    aggregator = make_loaded_aggregator(args.clients)
+    stop = threading.Event()
+    writer_latencies: List[float] = []
+    reads = [0] * args.readers
+    sources = _sources(args.batch)
+
+    def writer() -> None:
+        interval = args.batch / args.pps
+        next_at = time.perf_counter()
+        while not stop.is_set():
+            now = time.time()
+            started = time.perf_counter()
+            aggregator.add_packets(
+                [now] * args.batch, sources, [SERVER_IP] * args.batch, [60] * args.batch, ["TCP"] * args.batch
+            )
+            writer_latencies.append(time.perf_counter() - started)
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+
+    def reader(slot: int) -> None:
+        while not stop.is_set():
+            if locked_readers:
+                locked_summary(aggregator)
+            else:
+                aggregator.get_summary()
+            reads[slot] += 1
+
+    threads = [threading.Thread(target=writer)]
+    threads += [threading.Thread(target=reader, args=(slot,)) for slot in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    writer_latencies.sort()
+    p99 = writer_latencies[int(len(writer_latencies) * 0.99)] if writer_latencies else 0.0
+    return len(writer_latencies) * args.batch / args.seconds, p99, sum(reads) / args.seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=3000)
+    parser.add_argument("--pps", type=float, default=20_000.0, help="writer target packets/s")
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    for label, locked in (("locked readers", True), ("snapshot readers", False)):
+        pps, p99, reads = run(args, locked)
+        print(f"{label:<17} writer {pps:>10,.0f} pkt/s  p99 {p99 * 1e3:>7.2f} ms  {reads:>8,.0f} reads/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""JSON ingest throughput: one commit per request versus the batched writer.
+
+Posts ``records`` synthetic ``JsonDataRequest`` bodies ``batch`` records at a
+time into a fresh SQLite file. The baseline inserts and commits each request
+on the caller's thread, as a synchronous handler writing to disk would; the
+store path times ``submit`` (what the async handler pays) and the end-to-end
+rate until the writer has committed everything. Run from ``backend/``::
+
+    python -m benchmarks.bench_json_ingest --records 50000 --batch 1,50
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+from typing import Dict, List
+
+import jsonstore
+from jsonstore import JsonDataStore
+from serialization import dumps
+
+
+def build_records(count: int, clients: int = 500) -> List[Dict[str, object]]:
+    start = 1_700_000_000
+    return [
+        {
+            "client_id": f"client{index % clients}",
+            "timestamp": start + index,
+            "data_type": "sensor",
+            "file_size": 256,
+            "payload": {"seq": index, "temperature": 20 + index % 15, "tags": ["a", "b"]},
+        }
+        for index in range(count)
+    ]
+
+
+def per_request_commit(path: str, requests: List[List[Dict[str, object]]]) -> float:
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in jsonstore._SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+        started = time.perf_counter()
+        for records in requests:
+            with conn:
+                conn.executemany(
+                    jsonstore._INSERT,
+                    [
+                        (r["client_id"], r["timestamp"], r["data_type"], r["file_size"], time.time(), dumps(r["payload"]).decode())
+                        for r in records
+                    ],
+                )
+        return time.perf_counter() - started
+
+
+def batched_store(path: str, requests: List[List[Dict[str, object]]]) -> tuple:
+    store = JsonDataStore(path, queue_size=len(requests) + 1)
+    store.open()
+    try:
+        started = time.perf_counter()
+        for records in requests:
+            store.submit(records)
+        submitted = time.perf_counter() - started
+        store.wait_idle()
+        return submitted, time.perf_counter() - started
+    finally:
+        store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--batch", default="1,50", help="comma-separated records per request")
+    args = parser.parse_args()
+
+    records = build_records(args.records)
+    for batch in (int(value) for value in args.batch.split(",")):
+        requests = [records[index : index + batch] for index in range(0, len(records), batch)]
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = per_request_commit(os.path.join(tmp, "sync.sqlite3"), requests)
+            submitted, total = batched_store(os.path.join(tmp, "async.sqlite3"), requests)
+        print(f"{args.records:,} records, {batch} per request ({len(requests):,} requests)")
+        print(f"  commit per request        {args.records / baseline:>12,.0f} records/s")
+        print(f"  batched writer, submit    {args.records / submitted:>12,.0f} records/s")
+        print(f"  batched writer, committed {args.records / total:>12,.0f} records/s  {baseline / total:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Bytes per client per bin: per-client dicts (old layout) versus the aggregator's counter arrays.
+
+Fills ``--bins`` one-second windows with ``--clients`` clients sending
+traffic on three protocols, once into the dict-of-dicts layout the
+aggregator used before and once into ``TrafficAggregator``, and reports
+the bytes tracemalloc attributes to each per client and bin. Run from
+``backend/``::
+
+    python -m benchmarks.bench_memory --clients 2000 --bins 12
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Callable, Dict, Tuple
+
+from aggregator import TrafficAggregator
+
+PROTOCOLS = ("HTTP", "FTP", "DNS")
+
+
+def _address(client: int) -> str:
+    return f"10.{client // 65536}.{client // 256 % 256}.{client % 256}"
+
+
+def _measure(fill: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        kept = fill()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    assert kept is not None
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+
+def fill_legacy_layout(clients: int, bins: int) -> Dict[int, Dict[str, Any]]:
+    # Layout anterior: dict por cliente com defaultdict de dicts por protocolo
+    data: Dict[int, Dict[str, Any]] = {}
+    for ts in range(bins):
+        bucket = data.setdefault(ts, {})
+        for client in range(clients):
+            client_bucket = bucket.setdefault(
+                _address(client), {"in": 0, "out": 0, "proto": defaultdict(lambda: {"in": 0, "out": 0})}
+            )
+            for protocol in PROTOCOLS:
+                client_bucket["in"] += 100
+                client_bucket["proto"][protocol]["in"] += 100
+    return data
+
+
+def fill_aggregator(clients: int, bins: int) -> TrafficAggregator:
+    aggregator = TrafficAggregator(server_ip="10.50.0.10", window_seconds=1, retention_seconds=bins)
+    base_ts = int(time.time()) - bins + 1
+    for ts in range(bins):
+        for client in range(clients):
+            src_ip = _address(client)
+            for protocol in PROTOCOLS:
+                aggregator.add_packet(
+                    timestamp=base_ts + ts, src_ip=src_ip, dst_ip="10.50.0.10", length=100, protocol=protocol
+                )
+    return aggregator
+
+
+def bytes_per_client_per_bin(clients: int, bins: int) -> Tuple[float, float]:
+    """Return ``(legacy, compact)`` bytes per client per bin."""
+
+    legacy = _measure(lambda: fill_legacy_layout(clients, bins)) / (clients * bins)
+    compact = _measure(lambda: fill_aggregator(clients, bins)) / (clients * bins)
+    return legacy, compact
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--bins", type=int, default=12)
+    args = parser.parse_args()
+
+    legacy, compact = bytes_per_client_per_bin(args.clients, args.bins)
+    print(f"{args.clients} clients x {args.bins} bins, {len(PROTOCOLS)} protocols each")
+    print(f"legacy dicts   {legacy:>8.0f} B/client/bin")
+    print(f"counter arrays {compact:>8.0f} B/client/bin  ({legacy / compact:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Summary response encoding: pydantic models versus the pre-shaped fast path.
+
+Builds ``rows`` summary rows shaped like ``get_summary`` output and times
+each way of turning them into a response body, reporting latency and body
+size. The pydantic path (``SummaryResponse`` validation plus JSON dump) is
+what FastAPI did per request before; it is skipped when pydantic is not
+installed, as is orjson. Run from ``backend/``::
+
+    python -m benchmarks.bench_serialization --rows 10000,100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Callable, Dict, List
+
+import serialization
+from serialization import columnar, encode_summary
+
+
+def build_rows(count: int, clients: int = 2_000, window: int = 5, seed: int = 7) -> List[Dict[str, object]]:
+    rng = random.Random(seed)
+    start = 1_700_000_000
+    return [
+        {
+            "ts": start + (index // clients) * window,
+            "client_ip": f"10.{(index % clients) >> 8 & 0xFF}.{index % clients & 0xFF}.{1 + index % 200}",
+            "in_bytes": rng.randrange(1, 1 << 24),
+            "out_bytes": rng.randrange(1, 1 << 24),
+        }
+        for index in range(count)
+    ]
+
+
+def _time(encode: Callable[[], bytes], repeat: int) -> tuple:
+    best = float("inf")
+    body = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = encode()
+        best = min(best, time.perf_counter() - started)
+    return best, len(body)
+
+
+def _without_orjson(encode: Callable[[], bytes]) -> Callable[[], bytes]:
+    def run() -> bytes:
+        saved, serialization.orjson = serialization.orjson, None
+        try:
+            return encode()
+        finally:
+            serialization.orjson = saved
+
+    return run
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="10000,100000", help="comma-separated row counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        from models import SummaryResponse
+    except ImportError:
+        SummaryResponse = None
+
+    for count in (int(value) for value in args.rows.split(",")):
+        rows = build_rows(count)
+        cases: Dict[str, Callable[[], bytes]] = {}
+        if SummaryResponse is not None:
+            cases["pydantic models"] = lambda: SummaryResponse(bins=rows, resolution=5).model_dump_json().encode()
+        cases["rows, stdlib json"] = _without_orjson(lambda: encode_summary(rows, 5))
+        cases["columnar, stdlib json"] = _without_orjson(lambda: encode_summary(rows, 5, "columnar"))
+        if serialization.orjson is not None:
+            cases["rows, orjson"] = lambda: encode_summary(rows, 5)
+            cases["columnar, orjson"] = lambda: encode_summary(rows, 5, "columnar")
+
+        print(f"{count:,} rows")
+        baseline = None
+        for label, encode in cases.items():
+            elapsed, size = _time(encode, args.repeat)
+            baseline = baseline or elapsed
+            print(f"  {label:<24} {elapsed * 1e3:>9.1f} ms  {size / 1024:>9.0f} KiB  {baseline / elapsed:>6.2f}x")
+        if SummaryResponse is None:
+            print("  (pydantic not installed: model path skipped)")
+        if serialization.orjson is None:
+            print("  (orjson not installed: orjson paths skipped)")
+        # Evita que o custo de montar as colunas fique escondido no encode
+        started = time.perf_counter()
+        columnar(rows)
+        print(f"  columnar reshape alone   {(time.perf_counter() - started) * 1e3:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Aggregate packets/s of N decode+aggregate shards versus a single process.
+
+Each worker process owns a ``CaptureService`` and ``TrafficAggregator`` and
+feeds pre-built Ethernet frames through the raw-socket decode path, the same
+work a ``PACKET_FANOUT`` shard does after ``recvfrom_into``. Run from
+``backend/``::
+
+    python -m benchmarks.bench_sharding --packets 400000 --shards 1,2,4
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing
+import random
+import socket
+import struct
+import time
+from typing import List
+
+from aggregator import TrafficAggregator
+from capture import CaptureService
+
+SERVER_IP = "10.50.0.10"
+_PORTS = (80, 443, 53, 21, 22, 8080, 5000)
+
+
+def build_frames(count: int, clients: int, seed: int = 7) -> List[bytes]:
+    rng = random.Random(seed)
+    frames = []
+    for _ in range(count):
+        client = f"192.168.{rng.randrange(clients) // 250}.{rng.randrange(250) + 1}"
+        src, dst = (client, SERVER_IP) if rng.random() < 0.5 else (SERVER_IP, client)
+        transport = struct.pack("!HHIIBBHHH", rng.randrange(1024, 65535), rng.choice(_PORTS), 0, 0, 0x50, 0x18, 0, 0, 0)
+        ip = struct.pack(
+            "!BBHHHBBH4s4s", 0x45, 0, 20 + len(transport), 0, 0, 64, 6, 0, socket.inet_aton(src), socket.inet_aton(dst)
+        )
+        frames.append(b"\x00" * 12 + b"\x08\x00" + ip + transport)
+    return frames
+
+
+def _worker(packets: int, clients: int, seed: int, start_event, results) -> None:
+    logging.disable(logging.INFO)
+    aggregator = TrafficAggregator(server_ip=SERVER_IP, window_seconds=5, retention_seconds=300)
+    service = CaptureService(aggregator=aggregator, iface="any", batch_size=256)
+    frames = [memoryview(frame) for frame in build_frames(packets, clients, seed)]
+    start_event.wait()
+    started = time.perf_counter()
+    now = time.time()
+    for index, frame in enumerate(frames, 1):
+        service._process_frame(frame, len(frame), 1, now)
+        if not index % 65536:
+            service._drain(timeout=0)
+    service._flush_batch()
+    service._drain(timeout=0)
+    results.put(time.perf_counter() - started)
+
+
+def run(packets: int, shards: int, clients: int) -> float:
+    """Return aggregate packets/s for ``shards`` workers splitting ``packets``."""
+
+    context = multiprocessing.get_context("spawn")
+    start_event = context.Event()
+    results = context.Queue()
+    share = packets // shards
+    workers = [
+        context.Process(target=_worker, args=(share, clients, index, start_event, results)) for index in range(shards)
+    ]
+    for worker in workers:
+        worker.start()
+    # Espera os processos montarem os quadros antes de disparar o relógio
+    time.sleep(1.0)
+    start_event.set()
+    elapsed = max(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    return share * shards / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--packets", type=int, default=400_000)
+    parser.add_argument("--clients", type=int, default=5_000)
+    parser.add_argument("--shards", default="1,2,4")
+    args = parser.parse_args()
+
+    baseline = None
+    for shards in (int(value) for value in args.shards.split(",")):
+        pps = run(args.packets, shards, args.clients)
+        baseline = baseline or pps
+        print(f"shards={shards:<3d} {pps:>12,.0f} pkt/s  speedup={pps / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Generate a synthetic pcap trace for replay benchmarks.
+
+Frames are cut at the transport header (snaplen) while ``orig_len`` carries
+a realistic packet size, so multi-million packet traces stay small. Run from
+``backend/``::
+
+    python -m benchmarks.gen_trace /tmp/trace.pcap --packets 5000000 --clients 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import socket
+import struct
+import time
+from typing import Iterator, List, Tuple
+
+from pcap import write_pcap
+
+# (protocolo IP, porta do servidor, peso) aproximando o tráfego do laboratório
+TRAFFIC_MIX: Tuple[Tuple[int, int, int], ...] = (
+    (6, 80, 30),
+    (6, 443, 35),
+    (6, 21, 5),
+    (6, 30005, 10),
+    (17, 53, 10),
+    (6, 22, 5),
+    (17, 5000, 5),
+)
+# Clientes numerados a partir de 172.16.0.1
+_CLIENT_BASE = 0xAC100001
+_SIZES = (64, 64, 128, 512, 1024, 1500, 1500, 1500)
+
+
+def _frame(src: str, dst: str, ip_proto: int, src_port: int, dst_port: int) -> bytes:
+    if ip_proto == 6:
+        transport = struct.pack("!HHIIBBHHH", src_port, dst_port, 0, 0, 0x50, 0x18, 0, 0, 0)
+    else:
+        transport = struct.pack("!HHHH", src_port, dst_port, 8, 0)
+    ip = struct.pack(
+        "!BBHHHBBH4s4s",
+        0x45, 0, 20 + len(transport), 0, 0, 64, ip_proto, 0, socket.inet_aton(src), socket.inet_aton(dst),
+    )
+    return b"\x00" * 12 + b"\x08\x00" + ip + transport
+
+
+def generate(
+    *, packets: int, clients: int, server_ip: str, pps: float, start: float, seed: int = 7
+) -> Iterator[Tuple[float, bytes, int]]:
+    rng = random.Random(seed)
+    protocols = [entry[:2] for entry in TRAFFIC_MIX]
+    weights = [entry[2] for entry in TRAFFIC_MIX]
+    # Um fluxo por cliente, em ambos os sentidos; os quadros são montados uma vez e reutilizados
+    flows: List[Tuple[bytes, bytes]] = []
+    for index in range(clients):
+        client = socket.inet_ntoa(struct.pack("!I", _CLIENT_BASE + index))
+        ip_proto, port = rng.choices(protocols, weights)[0]
+        client_port = rng.randrange(1024, 65535)
+        flows.append(
+            (
+                _frame(client, server_ip, ip_proto, client_port, port),
+                _frame(server_ip, client, ip_proto, port, client_port),
+            )
+        )
+
+    # Popularidade em cauda longa: poucos clientes concentram a maior parte dos pacotes
+    ranks = [int(clients * rng.random() ** 3) for _ in range(65536)]
+    interval = 1.0 / pps
+    for number in range(packets):
+        inbound, outbound = flows[ranks[rng.getrandbits(16)]]
+        yield start + number * interval, inbound if rng.getrandbits(1) else outbound, rng.choice(_SIZES)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output")
+    parser.add_argument("--packets", type=int, default=1_000_000)
+    parser.add_argument("--clients", type=int, default=5_000)
+    parser.add_argument("--server-ip", default="10.50.0.10")
+    parser.add_argument("--pps", type=float, default=50_000.0, help="packet rate encoded in the timestamps")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with open(args.output, "wb") as handle:
+        count = write_pcap(
+            handle,
+            generate(
+                packets=args.packets,
+                clients=args.clients,
+                server_ip=args.server_ip,
+                pps=args.pps,
+                start=time.time(),
+                seed=args.seed,
+            ),
+        )
+    print(f"wrote {count:,} packets to {args.output} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Kernel-side capture filters built from the server addresses and port rules.
+
+``compile_filter`` emits a classic BPF program for ``SO_ATTACH_FILTER`` on
+the AF_PACKET socket; ``filter_expression`` is the same filter in tcpdump
+syntax for the pyshark/tshark backend. Loads go through the kernel's
+``SKF_NET_OFF`` (network header) and ``SKF_AD_PROTOCOL`` (ethertype)
+extensions, so one program works on ``iface=any`` whatever the link layer
+of each interface is.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import os
+import socket
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from classifier import parse_port_map
+from decoder import IPPROTO_TCP, IPPROTO_UDP
+from netindex import parse_server_ips
+
+CAPTURE_FILTERS = ("off", "server", "ports")
+
+# linux/filter.h
+BPF_LD, BPF_LDX, BPF_ALU, BPF_JMP, BPF_RET = 0x00, 0x01, 0x04, 0x05, 0x06
+BPF_W, BPF_H, BPF_B = 0x00, 0x08, 0x10
+BPF_ABS, BPF_IND, BPF_MSH = 0x20, 0x40, 0xA0
+BPF_JA, BPF_JEQ, BPF_JGT, BPF_JGE = 0x00, 0x10, 0x20, 0x30
+BPF_AND = 0x50
+BPF_K = 0x00
+SKF_AD_OFF = -0x1000
+SKF_AD_PROTOCOL = 0
+SKF_NET_OFF = -0x100000
+BPF_MAXINSNS = 4096
+
+SO_ATTACH_FILTER = 26
+_SOL_PACKET = 263
+_PACKET_STATISTICS = 6
+# Sem snaplen o programa aceita o quadro inteiro
+_FULL_FRAME = 0x40000
+_ETH_P_IP = 0x0800
+_ETH_P_IPV6 = 0x86DD
+_SYS_CLASS_NET = "/sys/class/net"
+
+Instruction = Tuple[int, int, int, int]
+# Alvo de salto: deslocamento relativo (0 = próxima instrução) ou nome de um rótulo
+_Target = Union[int, str]
+
+
+class _Assembler:
+    """Collects instructions with symbolic jump targets and resolves them to offsets."""
+
+    def __init__(self) -> None:
+        self._code: List[Tuple[int, _Target, _Target, int]] = []
+        self._labels: Dict[str, int] = {}
+
+    def label(self, name: str) -> None:
+        self._labels[name] = len(self._code)
+
+    def emit(self, code: int, k: int = 0, jt: _Target = 0, jf: _Target = 0) -> None:
+        self._code.append((code, jt, jf, k & 0xFFFFFFFF))
+
+    def jump(self, target: str) -> None:
+        # BPF_JA salta pelo campo k (32 bits), não por jt/jf
+        self._code.append((BPF_JMP | BPF_JA, 0, 0, target))  # type: ignore[arg-type]
+
+    def load_net(self, size: int, offset: int) -> None:
+        self.emit(BPF_LD | size | BPF_ABS, SKF_NET_OFF + offset)
+
+    def assemble(self) -> List[Instruction]:
+        if len(self._code) > BPF_MAXINSNS:
+            raise ValueError(f"Capture filter needs {len(self._code)} instructions; the kernel allows {BPF_MAXINSNS}")
+        program = []
+        for position, (code, jt, jf, k) in enumerate(self._code):
+            if isinstance(k, str):
+                k = self._labels[k] - position - 1
+            offsets = []
+            for target in (jt, jf):
+                offset = target if isinstance(target, int) else self._labels[target] - position - 1
+                if not 0 <= offset <= 0xFF:
+                    raise ValueError("Capture filter is too large for BPF jump offsets; use fewer server entries")
+                offsets.append(offset)
+            program.append((code, offsets[0], offsets[1], k))
+        return program
+
+
+def _words(value: int, bits: int) -> List[int]:
+    return [(value >> (bits - 32 * (index + 1))) & 0xFFFFFFFF for index in range(bits // 32)]
+
+
+def _match_address(asm: _Assembler, networks: Sequence, offset: int, matched: str, prefix: str) -> None:
+    """Jump to ``matched`` if the address at ``offset`` of the network header is in ``networks``."""
+
+    for number, network in enumerate(networks):
+        following = f"{prefix}-{number}"
+        words = _words(int(network.network_address), network.max_prefixlen)
+        masks = _words(int(network.netmask), network.max_prefixlen)
+        checks = [(index, word, mask) for index, (word, mask) in enumerate(zip(words, masks)) if mask]
+        for position, (index, word, mask) in enumerate(checks):
+            asm.load_net(BPF_W, offset + 4 * index)
+            if mask != 0xFFFFFFFF:
+                asm.emit(BPF_ALU | BPF_AND | BPF_K, mask)
+            last = position == len(checks) - 1
+            asm.emit(BPF_JMP | BPF_JEQ | BPF_K, word, matched if last else 0, following)
+        if not checks:
+            # Prefixo /0: qualquer endereço da família
+            asm.jump(matched)
+        asm.label(following)
+
+
+def _match_ports(asm: _Assembler, rules: Sequence[Tuple[int, int, int, str]], ip_proto: int, accept: str) -> None:
+    """Jump to ``accept`` if the port in A falls in a rule of ``ip_proto``; fall through otherwise."""
+
+    for rule_proto, low, high, _ in rules:
+        if rule_proto != ip_proto:
+            continue
+        if low == high:
+            asm.emit(BPF_JMP | BPF_JEQ | BPF_K, low, accept, 0)
+        else:
+            asm.emit(BPF_JMP | BPF_JGE | BPF_K, low, 0, 1)
+            asm.emit(BPF_JMP | BPF_JGT | BPF_K, high, 0, accept)
+
+
+def _transport_block(
+    asm: _Assembler, family: str, rules: Sequence[Tuple[int, int, int, str]], proto_offset: int
+) -> None:
+    """After an address match: accept only TCP/UDP packets whose source or destination port has a rule."""
+
+    asm.load_net(BPF_B, proto_offset)
+    for ip_proto, name in ((IPPROTO_TCP, "tcp"), (IPPROTO_UDP, "udp")):
+        asm.emit(BPF_JMP | BPF_JEQ | BPF_K, ip_proto, f"{family}-{name}", 0)
+    asm.jump("reject")
+    for ip_proto, name in ((IPPROTO_TCP, "tcp"), (IPPROTO_UDP, "udp")):
+        asm.label(f"{family}-{name}")
+        for port_offset in (0, 2):
+            if family == "v4":
+                # X = tamanho do cabeçalho IPv4 (IHL * 4)
+                asm.emit(BPF_LDX | BPF_B | BPF_MSH, SKF_NET_OFF)
+                asm.emit(BPF_LD | BPF_H | BPF_IND, SKF_NET_OFF + port_offset)
+            else:
+                # IPv6 sem cabeçalhos de extensão: transporte logo após os 40 bytes fixos
+                asm.load_net(BPF_H, 40 + port_offset)
+            _match_ports(asm, rules, ip_proto, "accept")
+        asm.jump("reject")
+
+
+def compile_filter(server_ip: str, *, mode: str = "server", port_map: str = "", snaplen: int = 0) -> List[Instruction]:
+    """Build the classic BPF program for ``mode`` (see ``CAPTURE_FILTERS``).
+
+    ``server`` keeps IPv4/IPv6 packets with a server address or prefix at
+    either end; ``ports`` additionally requires a TCP/UDP port covered by
+    ``port_map``. Accepted packets are cut to ``snaplen`` bytes (0 = whole
+    frame); with ``off`` the program only truncates.
+    """
+
+    if mode not in CAPTURE_FILTERS:
+        raise ValueError(f"capture filter must be one of {', '.join(CAPTURE_FILTERS)}")
+    keep = snaplen if snaplen > 0 else _FULL_FRAME
+    asm = _Assembler()
+    if mode == "off":
+        asm.emit(BPF_RET | BPF_K, keep)
+        return asm.assemble()
+
+    networks = parse_server_ips(server_ip)
+    rules = parse_port_map(port_map) if mode == "ports" else []
+    by_family = {version: [network for network in networks if network.version == version] for version in (4, 6)}
+
+    asm.emit(BPF_LD | BPF_W | BPF_ABS, SKF_AD_OFF + SKF_AD_PROTOCOL)
+    asm.emit(BPF_JMP | BPF_JEQ | BPF_K, _ETH_P_IP, "v4" if by_family[4] else "reject", 0)
+    asm.emit(BPF_JMP | BPF_JEQ | BPF_K, _ETH_P_IPV6, "v6" if by_family[6] else "reject", "reject")
+    for version, family, source, destination, proto_offset in ((4, "v4", 12, 16, 9), (6, "v6", 8, 24, 6)):
+        if not by_family[version]:
+            continue
+        matched = f"{family}-matched" if mode == "ports" else "accept"
+        asm.label(family)
+        _match_address(asm, by_family[version], source, matched, f"{family}-src")
+        _match_address(asm, by_family[version], destination, matched, f"{family}-dst")
+        asm.jump("reject")
+        if mode == "ports":
+            asm.label(matched)
+            _transport_block(asm, family, rules, proto_offset)
+    asm.label("accept")
+    asm.emit(BPF_RET | BPF_K, keep)
+    asm.label("reject")
+    asm.emit(BPF_RET | BPF_K, 0)
+    return asm.assemble()
+
+
+def filter_expression(server_ip: str, *, mode: str = "server", port_map: str = "") -> Optional[str]:
+    """The same filter in tcpdump syntax (pyshark ``bpf_filter``); None for ``off``."""
+
+    if mode not in CAPTURE_FILTERS:
+        raise ValueError(f"capture filter must be one of {', '.join(CAPTURE_FILTERS)}")
+    if mode == "off":
+        return None
+    hosts = " or ".join(
+        f"host {network.network_address}" if network.prefixlen == network.max_prefixlen else f"net {network}"
+        for network in parse_server_ips(server_ip)
+    )
+    if mode == "server":
+        return f"({hosts})"
+    ports = " or ".join(
+        f"{'tcp' if ip_proto == IPPROTO_TCP else 'udp'} " + (f"port {low}" if low == high else f"portrange {low}-{high}")
+        for ip_proto, low, high, _ in parse_port_map(port_map)
+    )
+    return f"({hosts}) and ({ports or 'tcp or udp'})"
+
+
+def attach_filter(sock: socket.socket, program: Sequence[Instruction]) -> None:
+    """Attach ``program`` to ``sock`` with ``SO_ATTACH_FILTER`` (the kernel copies it)."""
+
+    code = b"".join(struct.pack("HBBI", *instruction) for instruction in program)
+    buffer = ctypes.create_string_buffer(code)
+    fprog = struct.pack("HL", len(program), ctypes.addressof(buffer))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+def packet_statistics(sock: socket.socket) -> Tuple[int, int]:
+    """``(delivered, dropped)`` since the previous call (``PACKET_STATISTICS`` resets on read).
+
+    ``delivered`` counts packets that passed the filter, including the ones
+    dropped because the socket buffer was full.
+    """
+
+    packets, drops = struct.unpack("II", sock.getsockopt(_SOL_PACKET, _PACKET_STATISTICS, 8))
+    return packets, drops
+
+
+def interface_packets(iface: str) -> int:
+    """rx + tx packets seen by ``iface`` (``any`` = every interface), from sysfs."""
+
+    try:
+        names = os.listdir(_SYS_CLASS_NET) if iface == "any" else [iface]
+    except OSError:
+        return 0
+    total = 0
+    for name in names:
+        for counter in ("rx_packets", "tx_packets"):
+            try:
+                with open(os.path.join(_SYS_CLASS_NET, name, "statistics", counter), encoding="ascii") as handle:
+                    total += int(handle.read())
+            except (OSError, ValueError):
+                continue
+    return total
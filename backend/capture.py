@@ -3,159 +3,491 @@
 from __future__ import annotations
 
 import logging
+import socket
 import threading
 import time
-from typing import Optional
-
-import pyshark
+from collections import Counter
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 from aggregator import TrafficAggregator
+from bpf import CAPTURE_FILTERS, attach_filter, compile_filter, filter_expression, interface_packets, packet_statistics
+from classifier import DEFAULT_PORT_MAP, ProtocolClassifier, flow_key, inspect_layers
+from decoder import ETH_P_ALL, DecodedPacket, decode_ethernet, decode_ip, wire_length
+from flows import FlowTable
+from metrics import REGISTRY, Registry
+from pcap import frame_payload, paced, read_packets
+from spsc import SpscRing
+from tracing import PacketTracer
+
+if TYPE_CHECKING:
+    import pyshark
 
 LOGGER = logging.getLogger(__name__)
 
+CAPTURE_BACKENDS = ("rawsocket", "pyshark")
+
+# Tipos de hardware (ARPHRD_*) cujos quadros começam com cabeçalho Ethernet
+_ETHERNET_HATYPES = frozenset({1, 772})
+_ARPHRD_ETHER = 1
+_ARPHRD_LOOPBACK = 772
+_ARPHRD_NONE = 0xFFFE
+# sll_pkttype de cópias de quadros enviados pelo próprio host
+_PACKET_OUTGOING = 4
+_RECV_BUFFER_SIZE = 65536
+_SOL_PACKET = 263
+_PACKET_FANOUT = 18
+_PACKET_FANOUT_HASH = 0
+_SOCKET_TIMEOUT = 0.5
+# Intervalo de leitura de PACKET_STATISTICS no socket de captura
+_KERNEL_STATS_SECONDS = 1.0
+
+# Contado por lote na thread de agregação, nunca por pacote na captura
+CLASSIFIED_PACKETS = REGISTRY.counter(
+    "traffic_capture_classified_packets_total", "Packets handed to the aggregator by protocol.", ("protocol",)
+)
+BATCH_SECONDS = REGISTRY.histogram(
+    "traffic_capture_batch_seconds", "Time to merge one drained batch into the aggregator."
+)
+
+
+class PacketBatch:
+    """Columnar buffer of decoded packets awaiting a bulk aggregator merge."""
+
+    __slots__ = ("timestamps", "src_ips", "dst_ips", "lengths", "protocols", "started")
+
+    def __init__(self) -> None:
+        self.timestamps: List[float] = []
+        self.src_ips: List[str] = []
+        self.dst_ips: List[str] = []
+        self.lengths: List[int] = []
+        self.protocols: List[str] = []
+        self.started = 0.0
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, timestamp: float, src_ip: str, dst_ip: str, length: int, protocol: str) -> None:
+        if not self.timestamps:
+            self.started = time.monotonic()
+        self.timestamps.append(timestamp)
+        self.src_ips.append(src_ip)
+        self.dst_ips.append(dst_ip)
+        self.lengths.append(length)
+        self.protocols.append(protocol)
+
+    def clear(self) -> None:
+        self.timestamps.clear()
+        self.src_ips.clear()
+        self.dst_ips.clear()
+        self.lengths.clear()
+        self.protocols.clear()
+
 
 class CaptureService:
     """Capture packets from an interface and feed the aggregator."""
 
-    def __init__(self, *, aggregator: TrafficAggregator, iface: str) -> None:
+    def __init__(
+        self,
+        *,
+        aggregator: TrafficAggregator,
+        iface: str,
+        backend: str = "rawsocket",
+        batch_size: int = 256,
+        batch_interval_ms: int = 50,
+        fanout_group: Optional[int] = None,
+        port_map: str = DEFAULT_PORT_MAP,
+        flow_cache_size: int = 65536,
+        tracer: Optional[PacketTracer] = None,
+        queue_size: int = 1024,
+        queue_policy: str = "drop-oldest",
+        source: str = "iface",
+        replay_speed: float = 0.0,
+        flow_table_size: int = 0,
+        flow_idle_timeout: float = 30.0,
+        flow_active_timeout: float = 300.0,
+        capture_filter: str = "server",
+        snaplen: int = 0,
+    ) -> None:
+        if backend not in CAPTURE_BACKENDS:
+            raise ValueError(f"Unknown capture backend: {backend}")
+        if capture_filter not in CAPTURE_FILTERS:
+            raise ValueError(f"Unknown capture filter: {capture_filter}")
+        if source != "iface" and not source.startswith("file:"):
+            raise ValueError(f"Unknown capture source: {source}")
         self.aggregator = aggregator
         self.iface = iface
+        self.backend = backend
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval_ms / 1000.0
+        self.fanout_group = fanout_group
+        self.source = source
+        self.replay_speed = replay_speed
+        self.classifier = ProtocolClassifier(port_map, flow_cache_size=flow_cache_size)
+        # Filtro BPF no kernel: pacotes sem o servidor (ou fora das portas) nunca chegam ao Python
+        self.capture_filter = capture_filter
+        self.snaplen = max(0, snaplen)
+        self.bpf_expression = filter_expression(aggregator.server_ip, mode=capture_filter, port_map=port_map)
+        self._bpf_program: Optional[List[Tuple[int, int, int, int]]] = None
+        if capture_filter != "off" or self.snaplen:
+            try:
+                self._bpf_program = compile_filter(
+                    aggregator.server_ip, mode=capture_filter, port_map=port_map, snaplen=self.snaplen
+                )
+            except ValueError as exc:
+                LOGGER.warning("Capture filter disabled, every frame reaches userspace: %s", exc)
+        # Contadores do kernel (backend rawsocket): entregues ao socket, perdidos com o buffer cheio
+        self.kernel_delivered = 0
+        self.kernel_dropped = 0
+        self._interface_baseline: Optional[int] = None
+        # Tabela de conexões opcional; com ela o protocolo é classificado uma vez por fluxo
+        self.flows: Optional[FlowTable] = (
+            FlowTable(
+                aggregator.server_ip,
+                max_flows=flow_table_size,
+                idle_timeout=flow_idle_timeout,
+                active_timeout=flow_active_timeout,
+                retention_seconds=aggregator.retention_seconds,
+            )
+            if flow_table_size > 0
+            else None
+        )
+        self.tracer = tracer or PacketTracer()
+        # Sem rastreamento ativo o caminho quente só testa se _trace é None
+        self._trace = self.tracer.trace if self.tracer.enabled else None
+        # Lotes prontos passam por uma fila limitada até a thread de agregação
+        self.queue = SpscRing(queue_size, queue_policy)
+        self._batch = PacketBatch()
         self._thread: Optional[threading.Thread] = None
+        self._consumer: Optional[threading.Thread] = None
         self._stop_event = threading.Event()
 
     def start(self) -> None:
         if self._thread and self._thread.is_alive():
             return
 
-        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._consumer = threading.Thread(target=self._consume, name="aggregation-consumer", daemon=True)
+        self._consumer.start()
+        self._thread = threading.Thread(target=self._run, name="capture", daemon=True)
         self._thread.start()
 
     def stop(self) -> None:
         self._stop_event.set()
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=1)
+        self.queue.close()
+        if self._consumer and self._consumer.is_alive():
+            self._consumer.join(timeout=1)
 
     def _run(self) -> None:
-        LOGGER.info("=== CAPTURE THREAD STARTING ===")
-        LOGGER.info("Starting LiveCapture on interface %s", self.iface)
+        if self.source.startswith("file:"):
+            path = self.source[len("file:") :]
+            LOGGER.info("Replaying %s at %s", path, f"{self.replay_speed}x" if self.replay_speed > 0 else "full speed")
+            try:
+                self._run_file(path)
+            except Exception as exc:  # noqa: BLE001
+                LOGGER.exception("Replay of %s failed: %s", path, exc)
+            return
+
+        LOGGER.info("Starting %s capture on interface %s", self.backend, self.iface)
+        run_backend = self._run_rawsocket if self.backend == "rawsocket" else self._run_pyshark
         while not self._stop_event.is_set():
             try:
-                LOGGER.info("Creating LiveCapture instance...")
-                capture = pyshark.LiveCapture(interface=self.iface)
-                LOGGER.info("Starting packet capture...")
-                packet_count = 0
-                for packet in capture.sniff_continuously():
-                    if self._stop_event.is_set():
-                        break
-                    packet_count += 1
-                    LOGGER.info("Processing packet #%d", packet_count)
-                    self._process_packet(packet)
+                run_backend()
             except Exception as exc:  # noqa: BLE001
                 LOGGER.exception("Capture loop error: %s", exc)
                 time.sleep(1)
 
+    def _run_rawsocket(self) -> None:
+        """Read frames straight off an AF_PACKET socket and decode headers in-process."""
+
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            if self._bpf_program is not None:
+                attach_filter(sock, self._bpf_program)
+                LOGGER.info(
+                    "Attached %d-instruction capture filter %s (snaplen %s)",
+                    len(self._bpf_program),
+                    self.bpf_expression or "off",
+                    self.snaplen or "full",
+                )
+            if self.iface != "any":
+                sock.bind((self.iface, 0))
+            if self.fanout_group is not None:
+                # Sockets do mesmo grupo dividem o tráfego por hash de fluxo no kernel
+                sock.setsockopt(_SOL_PACKET, _PACKET_FANOUT, (self.fanout_group & 0xFFFF) | (_PACKET_FANOUT_HASH << 16))
+            sock.settimeout(_SOCKET_TIMEOUT)
+            packet_statistics(sock)
+            self._interface_baseline = interface_packets(self.iface) - self.kernel_delivered
+            buffer = bytearray(_RECV_BUFFER_SIZE)
+            view = memoryview(buffer)
+            snaplen = self.snaplen
+            next_stats = time.time() + _KERNEL_STATS_SECONDS
+            while not self._stop_event.is_set():
+                try:
+                    # MSG_TRUNC faz o kernel devolver o tamanho real do quadro
+                    length, address = sock.recvfrom_into(buffer, 0, socket.MSG_TRUNC)
+                except socket.timeout:
+                    self._flush_batch()
+                    self._poll_kernel_stats(sock)
+                    if self.flows is not None:
+                        self.flows.expire(time.time())
+                    continue
+                if address[2] == _PACKET_OUTGOING and address[3] == _ARPHRD_LOOPBACK:
+                    # Em lo cada quadro aparece como enviado e como recebido; como libpcap, fica só a entrada
+                    continue
+                now = time.time()
+                if now >= next_stats:
+                    self._poll_kernel_stats(sock)
+                    next_stats = now + _KERNEL_STATS_SECONDS
+                frame = view[: min(length, _RECV_BUFFER_SIZE)]
+                if snaplen and length >= snaplen:
+                    # O corte do filtro também corta o MSG_TRUNC; o tamanho real vem do cabeçalho IP
+                    length = wire_length(frame, address[3] in _ETHERNET_HATYPES) or length
+                self._process_frame(frame, length, address[3], now)
+        finally:
+            self._flush_batch()
+            self._poll_kernel_stats(sock)
+            sock.close()
+
+    def _poll_kernel_stats(self, sock: socket.socket) -> None:
+        try:
+            delivered, dropped = packet_statistics(sock)
+        except OSError:
+            return
+        self.kernel_delivered += delivered
+        self.kernel_dropped += dropped
+
+    @property
+    def kernel_filtered(self) -> int:
+        """Packets the interface(s) saw that the BPF filter kept out of the socket (approximate).
+
+        Derived from the sysfs rx/tx counters since the socket opened minus
+        what the socket was delivered, so traffic on other interfaces than
+        the captured ones, or between polls, blurs it slightly.
+        """
+
+        if self._interface_baseline is None:
+            return 0
+        seen = interface_packets(self.iface) - self._interface_baseline
+        return max(0, seen - self.kernel_delivered)
+
+    def _run_file(self, path: str) -> None:
+        """Feed a pcap/pcapng trace through the same decode → classify → aggregate path."""
+
+        offset: Optional[float] = None
+        with open(path, "rb") as handle:
+            for record in paced(read_packets(handle), self.replay_speed):
+                if self._stop_event.is_set():
+                    break
+                if offset is None:
+                    # Os timestamps gravados são deslocados para o presente, mantendo o espaçamento
+                    offset = time.time() - record.timestamp
+                frame, ethernet = frame_payload(record)
+                hatype = _ARPHRD_ETHER if ethernet else _ARPHRD_NONE
+                self._process_frame(frame, record.orig_len, hatype, record.timestamp + offset)
+        self._flush_batch()
+        LOGGER.info("Replay of %s finished", path)
+
+    def _run_pyshark(self) -> None:
+        """Deep-inspection fallback driven by tshark dissection (slow)."""
+
+        import pyshark
+
+        # O tshark compila a mesma expressão com libpcap; -s corta o quadro (packet.length segue o original)
+        capture = pyshark.LiveCapture(
+            interface=self.iface,
+            bpf_filter=self.bpf_expression,
+            custom_parameters=["-s", str(self.snaplen)] if self.snaplen else None,
+        )
+        for packet in capture.sniff_continuously():
+            if self._stop_event.is_set():
+                break
+            self._process_packet(packet)
+        self._flush_batch()
+
+    def _enqueue(self, timestamp: float, src_ip: str, dst_ip: str, length: int, protocol: str) -> None:
+        if self._trace is not None:
+            self._trace(timestamp, src_ip, dst_ip, length, protocol)
+        batch = self._batch
+        batch.append(timestamp, src_ip, dst_ip, length, protocol)
+        if len(batch) >= self.batch_size or time.monotonic() - batch.started >= self.batch_interval:
+            self._flush_batch()
+
+    def _flush_batch(self) -> None:
+        batch = self._batch
+        self.tracer.maybe_report(self.queue)
+        if not batch:
+            return
+        # O lote passa a pertencer ao consumidor; a captura segue com um novo
+        self._batch = PacketBatch()
+        if not self.queue.put(batch):
+            self.tracer.count_dropped(len(batch))
+
+    def _consume(self) -> None:
+        """Aggregation thread: merge queued batches so readers never stall the capture loop."""
+
+        while not (self.queue.closed and not len(self.queue)):
+            try:
+                self._drain(timeout=_SOCKET_TIMEOUT)
+            except Exception as exc:  # noqa: BLE001
+                LOGGER.exception("Failed to add packet batch to aggregator: %s", exc)
+
+    def _drain(self, timeout: Optional[float] = None) -> int:
+        batches = self.queue.drain(timeout)
+        if not batches:
+            return 0
+        if len(batches) == 1:
+            merged = batches[0]
+        else:
+            merged = PacketBatch()
+            for batch in batches:
+                merged.timestamps.extend(batch.timestamps)
+                merged.src_ips.extend(batch.src_ips)
+                merged.dst_ips.extend(batch.dst_ips)
+                merged.lengths.extend(batch.lengths)
+                merged.protocols.extend(batch.protocols)
+        started = time.perf_counter()
+        accepted = self.aggregator.add_packets(
+            merged.timestamps, merged.src_ips, merged.dst_ips, merged.lengths, merged.protocols
+        )
+        BATCH_SECONDS.observe(time.perf_counter() - started)
+        self.tracer.count_batch(len(merged), sum(merged.lengths), accepted)
+        for protocol, count in Counter(merged.protocols).items():
+            CLASSIFIED_PACKETS.labels(protocol).inc(count)
+        return len(merged)
+
+    def register_metrics(self, registry: Registry = REGISTRY) -> None:
+        """Expose the tracer, queue and flow-cache counters, read when ``registry`` is rendered."""
+
+        tracer, queue, classifier = self.tracer, self.queue, self.classifier
+        counters = (
+            ("traffic_capture_packets_total", "Packets handed to the aggregator.", lambda: tracer.packets),
+            ("traffic_capture_bytes_total", "Bytes handed to the aggregator.", lambda: tracer.bytes),
+            ("traffic_capture_accepted_total", "Packets that matched the server address.", lambda: tracer.accepted),
+            (
+                "traffic_capture_skipped_total",
+                "Packets that did not match the server address.",
+                lambda: tracer.skipped,
+            ),
+            ("traffic_capture_dropped_total", "Packets dropped before aggregation.", lambda: tracer.dropped),
+            (
+                "traffic_capture_parse_failures_total",
+                "Frames that were not decodable IP packets.",
+                lambda: tracer.malformed,
+            ),
+            (
+                "traffic_capture_queue_dropped_batches_total",
+                "Batches the capture queue dropped.",
+                lambda: queue.dropped,
+            ),
+            ("traffic_classifier_flow_cache_hits_total", "Flow-cache hits in the classifier.", lambda: classifier.hits),
+            (
+                "traffic_classifier_flow_cache_misses_total",
+                "Flow-cache misses in the classifier.",
+                lambda: classifier.misses,
+            ),
+        )
+        for name, documentation, callback in counters:
+            registry.callback(name, documentation, callback, kind="counter")
+        registry.callback("traffic_capture_queue_depth", "Batches waiting in the capture queue.", lambda: len(queue))
+        registry.callback(
+            "traffic_capture_queue_high_water", "Deepest the capture queue has been.", lambda: queue.high_water
+        )
+        if self.backend == "rawsocket" and self.source == "iface":
+            kernel = (
+                (
+                    "traffic_capture_kernel_delivered_total",
+                    "Packets the BPF filter let through to the socket.",
+                    lambda: self.kernel_delivered,
+                ),
+                (
+                    "traffic_capture_kernel_dropped_total",
+                    "Packets the kernel dropped with the socket buffer full.",
+                    lambda: self.kernel_dropped,
+                ),
+                (
+                    "traffic_capture_kernel_filtered_total",
+                    "Interface packets the BPF filter kept out (approximate).",
+                    lambda: self.kernel_filtered,
+                ),
+            )
+            for name, documentation, callback in kernel:
+                registry.callback(name, documentation, callback, kind="counter")
+        flows = self.flows
+        if flows is not None:
+            registry.callback("traffic_flows_active", "Open connections in the flow table.", lambda: len(flows))
+            registry.callback(
+                "traffic_flows_exported_total",
+                "Flows ended by timeout, FIN/RST or eviction.",
+                lambda: flows.exported,
+                kind="counter",
+            )
+            registry.callback(
+                "traffic_flows_evicted_total",
+                "Flows evicted to stay within the table size.",
+                lambda: flows.evicted,
+                kind="counter",
+            )
+
+    def _process_frame(self, frame: memoryview, length: int, hatype: int, timestamp: float) -> None:
+        if hatype in _ETHERNET_HATYPES:
+            decoded = decode_ethernet(frame)
+        else:
+            decoded = decode_ip(frame)
+        if decoded is None:
+            self.tracer.count_malformed()
+            return
+
+        protocol = None
+        if self.flows is not None:
+            protocol = self.flows.observe(timestamp, decoded, length, self.classifier.classify_ports)
+        if protocol is None:
+            protocol = self.classifier.classify_ports(decoded.ip_proto, decoded.src_port, decoded.dst_port)
+        self._enqueue(timestamp, decoded.src_ip, decoded.dst_ip, length, protocol)
+
     def _process_packet(self, packet: pyshark.packet.packet.Packet) -> None:
         try:
             timestamp = float(packet.sniff_timestamp)
             length = int(packet.length)
-            src_ip = packet.ip.src
-            dst_ip = packet.ip.dst
-            LOGGER.info("Packet: %s -> %s, length=%d", src_ip, dst_ip, length)
-        except Exception as exc:  # noqa: BLE001
-            LOGGER.debug("Skipping packet due to parse error: %s", exc)
+            header = _pyshark_header(packet)
+        except Exception:  # noqa: BLE001
+            self.tracer.count_malformed()
             return
 
-        protocol = self._detect_protocol(packet)
-        LOGGER.info("Detected protocol: %s", protocol)
+        protocol = self._detect_protocol(packet, header)
+        if self.flows is not None:
+            self.flows.observe(timestamp, header, length, lambda *_: protocol)
+        self._enqueue(timestamp, header.src_ip, header.dst_ip, length, protocol)
 
-        try:
-            self.aggregator.add_packet(
-                timestamp=timestamp,
-                src_ip=src_ip,
-                dst_ip=dst_ip,
-                length=length,
-                protocol=protocol,
-            )
-            LOGGER.info("Packet added to aggregator successfully")
-        except Exception as exc:  # noqa: BLE001
-            LOGGER.exception("Failed to add packet to aggregator: %s", exc)
-
-    def _detect_protocol(self, packet: pyshark.packet.packet.Packet) -> str:
-        # PRIMEIRO: Detectar por conteúdo/layers (mais preciso para protocolos de aplicação)
-        if hasattr(packet, 'http'):
-            LOGGER.info("🌐 HTTP DETECTED BY LAYER!")
-            return "HTTP"
-        if hasattr(packet, 'ftp'):
-            LOGGER.info("🐟 FTP DETECTED BY LAYER!")
-            return "FTP"
-        if hasattr(packet, 'ftp-data'):
-            LOGGER.info("🐟 FTP-DATA DETECTED BY LAYER!")
-            return "FTP"
-        if hasattr(packet, 'dns'):
-            LOGGER.info("🔍 DNS DETECTED BY LAYER!")
-            return "DNS"
-        if hasattr(packet, 'tls'):
-            LOGGER.info("🔒 TLS DETECTED BY LAYER!")
-            return "HTTPS/TLS"
-        if hasattr(packet, 'ssl'):
-            LOGGER.info("🔒 SSL DETECTED BY LAYER!")
-            return "HTTPS/TLS"
-            
-        # SEGUNDO: Detectar por porta (fallback para protocolos não detectados por layer)
-        try:
-            if hasattr(packet, 'tcp'):
-                src_port = int(packet.tcp.srcport)
-                dst_port = int(packet.tcp.dstport)
-                
-                LOGGER.info("🔍 TCP packet: src_port=%s, dst_port=%s", src_port, dst_port)
-                
-                # FTP - porta 21 (controle) e 20 (dados) e portas passivas (30000-30009)
-                if (src_port == 21 or dst_port == 21 or 
-                    src_port == 20 or dst_port == 20 or
-                    (30000 <= src_port <= 30009) or (30000 <= dst_port <= 30009)):
-                    LOGGER.info("🐟 FTP DETECTED BY PORT! src_port=%s, dst_port=%s", src_port, dst_port)
-                    return "FTP"
-                
-                # HTTP - porta 80 (fallback se não detectou por layer)
-                if src_port == 80 or dst_port == 80:
-                    LOGGER.info("🌐 HTTP DETECTED BY PORT! src_port=%s, dst_port=%s", src_port, dst_port)
-                    return "HTTP"
-                
-                # HTTPS - porta 443  
-                if src_port == 443 or dst_port == 443:
-                    LOGGER.info("🔒 HTTPS DETECTED BY PORT! src_port=%s, dst_port=%s", src_port, dst_port)
-                    return "HTTPS/TLS"
-                    
-                # DNS - porta 53
-                if src_port == 53 or dst_port == 53:
-                    LOGGER.info("🔍 DNS DETECTED BY PORT! src_port=%s, dst_port=%s", src_port, dst_port)
-                    return "DNS"
-                    
-                # Se é TCP mas não identificamos protocolo específico
-                LOGGER.info("📦 TCP GENERIC: src_port=%s, dst_port=%s", src_port, dst_port)
-                return "TCP"
-                
-            elif hasattr(packet, 'udp'):
-                src_port = int(packet.udp.srcport)
-                dst_port = int(packet.udp.dstport) 
-                
-                LOGGER.info("📦 UDP packet: src_port=%s, dst_port=%s", src_port, dst_port)
-                
-                # DNS - porta 53
-                if src_port == 53 or dst_port == 53:
-                    LOGGER.info("🔍 DNS DETECTED BY UDP PORT! src_port=%s, dst_port=%s", src_port, dst_port)
-                    return "DNS"
-                    
-                return "UDP"
-                
-            elif hasattr(packet, 'icmp'):
-                LOGGER.info("📡 ICMP packet detected")
-                return "ICMP"
-                
-        except Exception as exc:
-            LOGGER.debug("Error detecting protocol by port: %s", exc)
-            
-        LOGGER.info("❓ UNKNOWN PROTOCOL")
-        return "OTHER"
+    def _detect_protocol(self, packet: pyshark.packet.packet.Packet, header: DecodedPacket) -> str:
+        key = flow_key(header.ip_proto, header.src_ip, header.src_port, header.dst_ip, header.dst_port)
+        return self.classifier.classify_flow(
+            key, header.ip_proto, header.src_port, header.dst_port, lambda: inspect_layers(packet.layers)
+        )
+
+
+def _pyshark_header(packet: pyshark.packet.packet.Packet) -> DecodedPacket:
+    """Read the IPv4 or IPv6 addresses and transport fields of a dissected packet.
+
+    Raises ``AttributeError`` for packets without an IP layer; unreadable
+    transport headers leave ports and flags at 0.
+    """
 
+    ip_layer = getattr(packet, "ip", None)
+    if ip_layer is not None:
+        ip_proto = int(ip_layer.proto)
+    else:
+        ip_layer = packet.ipv6
+        ip_proto = int(ip_layer.nxt)
 
+    src_port = dst_port = tcp_flags = 0
+    try:
+        transport = packet.transport_layer
+        if transport in ("TCP", "UDP"):
+            layer = getattr(packet, transport.lower())
+            src_port, dst_port = int(layer.srcport), int(layer.dstport)
+            if transport == "TCP":
+                tcp_flags = int(layer.flags, 16)
+    except Exception as exc:  # noqa: BLE001
+        LOGGER.debug("Error reading transport header: %s", exc)
+    return DecodedPacket(ip_layer.src, ip_layer.dst, ip_proto, src_port, dst_port, tcp_flags)
@@ -0,0 +1,156 @@
+"""Table-driven protocol classification with a per-flow cache."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from decoder import IPPROTO_ICMP, IPPROTO_ICMPV6, IPPROTO_TCP, IPPROTO_UDP
+
+# Regras "transporte:porta[-porta]=PROTOCOLO"; em empate entre as portas de origem e destino vence a regra listada primeiro
+DEFAULT_PORT_MAP = "tcp:20-21=FTP,tcp:30000-30009=FTP,tcp:80=HTTP,tcp:443=HTTPS/TLS,tcp:53=DNS,udp:53=DNS"
+
+# Camadas de aplicação dissecadas pelo tshark, em ordem de prioridade
+LAYER_PROTOCOLS: Tuple[Tuple[str, str], ...] = (
+    ("http", "HTTP"),
+    ("ftp", "FTP"),
+    ("ftp-data", "FTP"),
+    ("dns", "DNS"),
+    ("tls", "HTTPS/TLS"),
+    ("ssl", "HTTPS/TLS"),
+)
+
+_TRANSPORTS = {"tcp": IPPROTO_TCP, "udp": IPPROTO_UDP}
+_FALLBACKS = {IPPROTO_TCP: "TCP", IPPROTO_UDP: "UDP", IPPROTO_ICMP: "ICMP", IPPROTO_ICMPV6: "ICMP"}
+_MAX_RULES = 255
+
+FlowKey = Tuple[Hashable, ...]
+
+
+def parse_port_map(raw: str) -> List[Tuple[int, int, int, str]]:
+    """Parse ``"tcp:80=HTTP,tcp:30000-30009=FTP,..."`` into ``(ip_proto, low, high, protocol)`` rules."""
+
+    rules: List[Tuple[int, int, int, str]] = []
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        spec, _, protocol = item.partition("=")
+        transport, _, ports = spec.partition(":")
+        low, _, high = ports.partition("-")
+        try:
+            ip_proto = _TRANSPORTS[transport.strip().lower()]
+            first, last = int(low), int(high or low)
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid port rule: {item!r}") from None
+        if not protocol.strip() or not 0 <= first <= last <= 0xFFFF:
+            raise ValueError(f"Invalid port rule: {item!r}")
+        rules.append((ip_proto, first, last, protocol.strip().upper()))
+    if len(rules) > _MAX_RULES:
+        raise ValueError(f"At most {_MAX_RULES} port rules are supported")
+    return rules
+
+
+class ProtocolClassifier:
+    """Classify packets by transport port through precompiled lookup tables.
+
+    Each transport gets a 64 KiB table mapping a port to the rank of the
+    first rule covering it, so a packet costs two indexed loads instead of a
+    chain of comparisons. ``classify_flow`` adds an LRU cache keyed by the
+    flow 5-tuple for callers whose classification involves deep inspection.
+    """
+
+    def __init__(self, port_map: str = DEFAULT_PORT_MAP, *, flow_cache_size: int = 65536, inspect_packets: int = 4) -> None:
+        self.flow_cache_size = flow_cache_size
+        self.inspect_packets = max(1, inspect_packets)
+        self.hits = 0
+        self.misses = 0
+        # Rank 0 = sem regra; rank N aponta para _names[N]
+        self._names: List[str] = [""]
+        self._tables: Dict[int, bytearray] = {ip_proto: bytearray(0x10000) for ip_proto in _TRANSPORTS.values()}
+        for ip_proto, low, high, protocol in parse_port_map(port_map):
+            self._names.append(protocol)
+            rank = len(self._names) - 1
+            table = self._tables[ip_proto]
+            for port in range(low, high + 1):
+                if not table[port]:
+                    table[port] = rank
+        # Valor: [protocolo, inspeções restantes]; 0 significa classificação definitiva
+        self._flows: "OrderedDict[FlowKey, List]" = OrderedDict()
+
+    def classify_ports(self, ip_proto: int, src_port: int, dst_port: int) -> str:
+        table = self._tables.get(ip_proto)
+        if table is None:
+            return _FALLBACKS.get(ip_proto, "OTHER")
+        src_rank = table[src_port]
+        dst_rank = table[dst_port]
+        if src_rank and (not dst_rank or src_rank < dst_rank):
+            return self._names[src_rank]
+        if dst_rank:
+            return self._names[dst_rank]
+        return _FALLBACKS[ip_proto]
+
+    def has_rule(self, ip_proto: int, src_port: int, dst_port: int) -> bool:
+        table = self._tables.get(ip_proto)
+        return table is not None and bool(table[src_port] or table[dst_port])
+
+    def classify_flow(
+        self,
+        key: FlowKey,
+        ip_proto: int,
+        src_port: int,
+        dst_port: int,
+        inspect: Optional[Callable[[], Optional[str]]] = None,
+    ) -> str:
+        """Classify one packet of ``key``, reusing the flow's cached label when settled.
+
+        ``inspect`` returns a protocol found by deep inspection, or ``None``.
+        Flows that only match the generic TCP/UDP fallback are re-inspected
+        for their first ``inspect_packets`` packets, since the application
+        layer usually appears after the handshake.
+        """
+
+        flows = self._flows
+        entry = flows.get(key)
+        if entry is not None and not entry[1]:
+            flows.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        protocol = inspect() if inspect is not None else None
+        if protocol is not None:
+            remaining = 0
+        else:
+            protocol = self.classify_ports(ip_proto, src_port, dst_port)
+            if inspect is None or self.has_rule(ip_proto, src_port, dst_port):
+                remaining = 0
+            else:
+                remaining = (entry[1] if entry is not None else self.inspect_packets) - 1
+
+        if entry is not None:
+            entry[0], entry[1] = protocol, remaining
+            flows.move_to_end(key)
+        elif self.flow_cache_size > 0:
+            flows[key] = [protocol, remaining]
+            if len(flows) > self.flow_cache_size:
+                flows.popitem(last=False)
+        return protocol
+
+
+def inspect_layers(layers: Iterable) -> Optional[str]:
+    """Application protocol of a dissected packet, from one pass over its layer names."""
+
+    names = {layer.layer_name for layer in layers}
+    for layer_name, protocol in LAYER_PROTOCOLS:
+        if layer_name in names:
+            return protocol
+    return None
+
+
+def flow_key(ip_proto: int, src_ip: str, src_port: int, dst_ip: str, dst_port: int) -> FlowKey:
+    """Direction-independent 5-tuple, so both halves of a conversation share a cache entry."""
+
+    if (src_ip, src_port) <= (dst_ip, dst_port):
+        return (ip_proto, src_ip, src_port, dst_ip, dst_port)
+    return (ip_proto, dst_ip, dst_port, src_ip, src_port)
@@ -0,0 +1,163 @@
+"""Fast-path header decoding for raw capture backends."""
+
+from __future__ import annotations
+
+import socket
+import struct
+from typing import NamedTuple, Optional, Union
+
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+ETH_P_8021Q = 0x8100
+ETH_P_8021AD = 0x88A8
+
+IPPROTO_ICMP = 1
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+IPPROTO_ICMPV6 = 58
+
+# Cabeçalhos de extensão IPv6 que apenas encadeiam o próximo cabeçalho
+_IPV6_EXTENSION_HEADERS = frozenset({0, 43, 60})
+_IPV6_FRAGMENT = 44
+
+_ETH_HEADER = struct.Struct("!6s6sH")
+_VLAN_TAG = struct.Struct("!HH")
+_PORTS = struct.Struct("!HH")
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class DecodedPacket(NamedTuple):
+    """Network and transport header fields extracted from a frame."""
+
+    src_ip: str
+    dst_ip: str
+    ip_proto: int
+    src_port: int
+    dst_port: int
+    tcp_flags: int
+
+
+def decode_ethernet(frame: Buffer) -> Optional[DecodedPacket]:
+    """Decode an Ethernet II frame (optionally VLAN tagged)."""
+
+    if len(frame) < _ETH_HEADER.size:
+        return None
+
+    ethertype = _ETH_HEADER.unpack_from(frame, 0)[2]
+    offset = _ETH_HEADER.size
+    while ethertype in (ETH_P_8021Q, ETH_P_8021AD):
+        if len(frame) < offset + _VLAN_TAG.size:
+            return None
+        ethertype = _VLAN_TAG.unpack_from(frame, offset)[1]
+        offset += _VLAN_TAG.size
+
+    if ethertype == ETH_P_IP:
+        return decode_ipv4(frame, offset)
+    if ethertype == ETH_P_IPV6:
+        return decode_ipv6(frame, offset)
+    return None
+
+
+def wire_length(frame: Buffer, ethernet: bool) -> Optional[int]:
+    """Original frame length from the IP length field, for frames cut by a snaplen."""
+
+    offset = 0
+    if ethernet:
+        if len(frame) < _ETH_HEADER.size:
+            return None
+        ethertype = _ETH_HEADER.unpack_from(frame, 0)[2]
+        offset = _ETH_HEADER.size
+        while ethertype in (ETH_P_8021Q, ETH_P_8021AD):
+            if len(frame) < offset + _VLAN_TAG.size:
+                return None
+            ethertype = _VLAN_TAG.unpack_from(frame, offset)[1]
+            offset += _VLAN_TAG.size
+    if len(frame) < offset + 6:
+        return None
+    version = frame[offset] >> 4
+    if version == 4:
+        return offset + ((frame[offset + 2] << 8) | frame[offset + 3])
+    if version == 6:
+        return offset + 40 + ((frame[offset + 4] << 8) | frame[offset + 5])
+    return None
+
+
+def decode_ip(packet: Buffer, offset: int = 0) -> Optional[DecodedPacket]:
+    """Decode a bare IP packet, dispatching on the version nibble."""
+
+    if len(packet) <= offset:
+        return None
+
+    version = packet[offset] >> 4
+    if version == 4:
+        return decode_ipv4(packet, offset)
+    if version == 6:
+        return decode_ipv6(packet, offset)
+    return None
+
+
+def decode_ipv4(packet: Buffer, offset: int) -> Optional[DecodedPacket]:
+    """Decode an IPv4 header and its transport header."""
+
+    if len(packet) < offset + 20:
+        return None
+
+    header_len = (packet[offset] & 0x0F) * 4
+    if header_len < 20:
+        return None
+
+    ip_proto = packet[offset + 9]
+    src_ip = socket.inet_ntoa(bytes(packet[offset + 12 : offset + 16]))
+    dst_ip = socket.inet_ntoa(bytes(packet[offset + 16 : offset + 20]))
+
+    # Fragmentos não iniciais não carregam cabeçalho de transporte
+    fragment_offset = ((packet[offset + 6] & 0x1F) << 8) | packet[offset + 7]
+    if fragment_offset:
+        return DecodedPacket(src_ip, dst_ip, ip_proto, 0, 0, 0)
+
+    return _decode_transport(packet, offset + header_len, src_ip, dst_ip, ip_proto)
+
+
+def decode_ipv6(packet: Buffer, offset: int) -> Optional[DecodedPacket]:
+    """Decode an IPv6 header, skipping extension headers."""
+
+    if len(packet) < offset + 40:
+        return None
+
+    next_header = packet[offset + 6]
+    src_ip = socket.inet_ntop(socket.AF_INET6, bytes(packet[offset + 8 : offset + 24]))
+    dst_ip = socket.inet_ntop(socket.AF_INET6, bytes(packet[offset + 24 : offset + 40]))
+    offset += 40
+
+    while next_header in _IPV6_EXTENSION_HEADERS or next_header == _IPV6_FRAGMENT:
+        if len(packet) < offset + 8:
+            return DecodedPacket(src_ip, dst_ip, next_header, 0, 0, 0)
+        if next_header == _IPV6_FRAGMENT:
+            fragment_offset = ((packet[offset + 2] << 8) | packet[offset + 3]) >> 3
+            next_header = packet[offset]
+            if fragment_offset:
+                return DecodedPacket(src_ip, dst_ip, next_header, 0, 0, 0)
+            offset += 8
+            continue
+        extension_len = (packet[offset + 1] + 1) * 8
+        next_header = packet[offset]
+        offset += extension_len
+
+    return _decode_transport(packet, offset, src_ip, dst_ip, next_header)
+
+
+def _decode_transport(
+    packet: Buffer,
+    offset: int,
+    src_ip: str,
+    dst_ip: str,
+    ip_proto: int,
+) -> DecodedPacket:
+    src_port = dst_port = tcp_flags = 0
+    if ip_proto in (IPPROTO_TCP, IPPROTO_UDP) and len(packet) >= offset + _PORTS.size:
+        src_port, dst_port = _PORTS.unpack_from(packet, offset)
+        if ip_proto == IPPROTO_TCP and len(packet) >= offset + 14:
+            tcp_flags = packet[offset + 13]
+    return DecodedPacket(src_ip, dst_ip, ip_proto, src_port, dst_port, tcp_flags)
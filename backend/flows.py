@@ -0,0 +1,244 @@
+"""Per-connection (5-tuple) flow table with idle/active timeouts and LRU eviction."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from decoder import DecodedPacket
+from netindex import ServerIndex
+
+# Chave relativa ao servidor: (ip_proto, client_ip, client_port, server_port)
+FlowKey = Tuple[int, str, int, int]
+
+_TCP_FIN = 0x01
+_TCP_SYN = 0x02
+_TCP_RST = 0x04
+_TCP_ACK = 0x10
+# Bits de FIN visto por sentido em FlowRecord.fins
+_FIN_IN = 1
+_FIN_OUT = 2
+_FIN_BOTH = _FIN_IN | _FIN_OUT
+# Depois do segundo FIN o fluxo espera o ACK final antes de ser encerrado
+_FIN_LINGER_SECONDS = 1.0
+_TRANSPORT_NAMES = {1: "ICMP", 6: "TCP", 17: "UDP", 58: "ICMPv6"}
+
+
+class FlowRecord:
+    """Counters of one connection between a client and the server."""
+
+    __slots__ = (
+        "key",
+        "protocol",
+        "first_seen",
+        "last_seen",
+        "packets_in",
+        "packets_out",
+        "bytes_in",
+        "bytes_out",
+        "tcp_flags",
+        "fins",
+        "closing_at",
+    )
+
+    def __init__(self, key: FlowKey, protocol: str, timestamp: float) -> None:
+        self.key = key
+        self.protocol = protocol
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.packets_in = 0
+        self.packets_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.tcp_flags = 0
+        self.fins = 0
+        # Timestamp do segundo FIN; negativo enquanto a conexão não fecha dos dois lados
+        self.closing_at = -1.0
+
+    def as_dict(self, closed: bool) -> Dict[str, object]:
+        ip_proto, client_ip, client_port, server_port = self.key
+        return {
+            "client_ip": client_ip,
+            "client_port": client_port,
+            "server_port": server_port,
+            "transport": _TRANSPORT_NAMES.get(ip_proto, str(ip_proto)),
+            "protocol": self.protocol,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "packets_in": self.packets_in,
+            "packets_out": self.packets_out,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "tcp_flags": self.tcp_flags,
+            "closed": closed,
+        }
+
+
+class FlowTable:
+    """Bounded table of the server's connections, exported NetFlow-style.
+
+    A flow ends after ``idle_timeout`` seconds without packets, on TCP RST,
+    about a second after both sides sent FIN (so the final ACK stays in the
+    same flow; a new SYN on the same ports starts a new one), or when
+    evicted as least recently used once ``max_flows`` are open.
+    Flows longer than ``active_timeout`` are exported and restarted so long
+    transfers show up before they finish. Ended flows are kept for
+    ``retention_seconds`` (and at most ``max_flows`` of them) for drilldown,
+    indexed by client so a drilldown does not scan the table under the lock
+    the capture thread takes for every packet.
+    Timeouts follow packet timestamps, so replayed traces expire the same
+    way live ones do. The protocol is classified once, on a flow's first
+    packet.
+    """
+
+    def __init__(
+        self,
+        server_ip: str,
+        *,
+        max_flows: int = 65536,
+        idle_timeout: float = 30.0,
+        active_timeout: float = 300.0,
+        retention_seconds: float = 300.0,
+    ) -> None:
+        if max_flows <= 0:
+            raise ValueError("max_flows must be positive")
+        self.server_ip = server_ip
+        self._is_server = ServerIndex(server_ip).contains
+        self.max_flows = max_flows
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.retention_seconds = retention_seconds
+        self.exported = 0
+        self.evicted = 0
+        self._active: "OrderedDict[FlowKey, FlowRecord]" = OrderedDict()
+        self._finished: Deque[FlowRecord] = deque()
+        # Fluxos ativos e encerrados de cada cliente, para get_flows não varrer a tabela com o lock
+        self._by_client: Dict[str, Set[FlowRecord]] = {}
+        # Fluxos com FIN dos dois lados, em ordem de fechamento
+        self._closing: Deque[FlowRecord] = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def observe(
+        self,
+        timestamp: float,
+        packet: DecodedPacket,
+        length: int,
+        classify: Callable[[int, int, int], str],
+    ) -> Optional[str]:
+        """Account one packet; returns its flow's protocol, or ``None`` if the server is not an endpoint.
+
+        ``classify(ip_proto, src_port, dst_port)`` runs only for a flow's first packet.
+        """
+
+        if self._is_server(packet.dst_ip):
+            key = (packet.ip_proto, packet.src_ip, packet.src_port, packet.dst_port)
+            inbound = True
+        elif self._is_server(packet.src_ip):
+            key = (packet.ip_proto, packet.dst_ip, packet.dst_port, packet.src_port)
+            inbound = False
+        else:
+            return None
+
+        with self._lock:
+            active = self._active
+            self._expire_idle(timestamp)
+            flow = active.get(key)
+            if flow is None:
+                flow = active[key] = self._track(
+                    FlowRecord(key, classify(packet.ip_proto, packet.src_port, packet.dst_port), timestamp)
+                )
+                if len(active) > self.max_flows:
+                    self._finish(active.popitem(last=False)[1])
+                    self.evicted += 1
+            else:
+                active.move_to_end(key)
+                reopened = flow.closing_at >= 0 and packet.tcp_flags & (_TCP_SYN | _TCP_ACK) == _TCP_SYN
+                if reopened or timestamp - flow.first_seen >= self.active_timeout:
+                    # Exporta a parte já vista e recomeça a contagem do mesmo fluxo
+                    self._finish(flow)
+                    flow = active[key] = self._track(FlowRecord(key, flow.protocol, timestamp))
+
+            if timestamp > flow.last_seen:
+                flow.last_seen = timestamp
+            if inbound:
+                flow.packets_in += 1
+                flow.bytes_in += length
+            else:
+                flow.packets_out += 1
+                flow.bytes_out += length
+            flow.tcp_flags |= packet.tcp_flags
+            if packet.tcp_flags & _TCP_RST:
+                self._finish(active.pop(key))
+            elif packet.tcp_flags & _TCP_FIN:
+                flow.fins |= _FIN_IN if inbound else _FIN_OUT
+                if flow.fins == _FIN_BOTH and flow.closing_at < 0:
+                    flow.closing_at = timestamp
+                    self._closing.append(flow)
+            return flow.protocol
+
+    def expire(self, now: float) -> int:
+        """End flows idle since before ``now - idle_timeout``; returns how many ended."""
+
+        with self._lock:
+            return self._expire_idle(now)
+
+    def get_flows(
+        self, *, client_ip: str, from_ts: float, to_ts: float, limit: int = 1000
+    ) -> List[Dict[str, object]]:
+        """Flows of ``client_ip`` active at any point in ``[from_ts, to_ts)``, largest first."""
+
+        # Só os fluxos do cliente, copiados com o lock; ordenação fora dele
+        with self._lock:
+            active = self._active
+            matches = [
+                flow.as_dict(active.get(flow.key) is not flow)
+                for flow in self._by_client.get(client_ip, ())
+                if flow.first_seen < to_ts and flow.last_seen >= from_ts
+            ]
+        matches.sort(key=lambda row: row["bytes_in"] + row["bytes_out"], reverse=True)
+        return matches[:limit]
+
+    def _expire_idle(self, now: float) -> int:
+        active = self._active
+        expired = 0
+        closing = self._closing
+        while closing and closing[0].closing_at + _FIN_LINGER_SECONDS < now:
+            flow = closing.popleft()
+            # Pode já ter saído da tabela (LRU, inatividade ou reinício)
+            if active.get(flow.key) is flow:
+                del active[flow.key]
+                self._finish(flow)
+                expired += 1
+        cutoff = now - self.idle_timeout
+        # O mais antigo no LRU é o menos recentemente visto; para no primeiro ainda ativo
+        while active:
+            flow = next(iter(active.values()))
+            if flow.last_seen >= cutoff:
+                break
+            self._finish(active.popitem(last=False)[1])
+            expired += 1
+        return expired
+
+    def _track(self, flow: FlowRecord) -> FlowRecord:
+        self._by_client.setdefault(flow.key[1], set()).add(flow)
+        return flow
+
+    def _forget(self, flow: FlowRecord) -> None:
+        flows = self._by_client[flow.key[1]]
+        flows.discard(flow)
+        if not flows:
+            del self._by_client[flow.key[1]]
+
+    def _finish(self, flow: FlowRecord) -> None:
+        finished = self._finished
+        finished.append(flow)
+        self.exported += 1
+        if len(finished) > self.max_flows:
+            self._forget(finished.popleft())
+        cutoff = flow.last_seen - self.retention_seconds
+        while finished and finished[0].last_seen < cutoff:
+            self._forget(finished.popleft())
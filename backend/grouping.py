@@ -0,0 +1,115 @@
+"""Client grouping by default prefix (/24, /64) or a prefix→group CSV table."""
+
+from __future__ import annotations
+
+import csv
+import ipaddress
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from netindex import Network
+
+GROUP_BY = ("ip", "prefix", "group")
+
+# Chaves sintéticas que não são endereços passam sem agrupamento
+_PASSTHROUGH = frozenset({"other"})
+
+
+def load_group_table(path: str) -> List[Tuple[Network, str]]:
+    """Read ``prefix,group`` rows; blank lines, ``#`` comments and a header row are skipped."""
+
+    entries: List[Tuple[Network, str]] = []
+    with open(path, newline="", encoding="utf-8") as handle:
+        for line_no, row in enumerate(csv.reader(handle), start=1):
+            if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+                continue
+            if len(row) < 2:
+                raise ValueError(f"{path}:{line_no}: expected 'prefix,group'")
+            prefix, group = row[0].strip(), row[1].strip()
+            try:
+                network = ipaddress.ip_network(prefix, strict=False)
+            except ValueError:
+                if line_no == 1:
+                    continue
+                raise ValueError(f"{path}:{line_no}: invalid prefix {prefix!r}") from None
+            entries.append((network, group))
+    return entries
+
+
+def rollup_rows(rows: Iterable[Dict[str, object]], key_of: Callable[[str], str]) -> List[Dict[str, object]]:
+    """Sum summary rows per ``(ts, key_of(client_ip))``, keeping the order bins first appear in."""
+
+    totals: Dict[Tuple[int, str], List[int]] = {}
+    for row in rows:
+        key = (row["ts"], key_of(row["client_ip"]))
+        entry = totals.get(key)
+        if entry is None:
+            entry = totals[key] = [0, 0]
+        entry[0] += row["in_bytes"]
+        entry[1] += row["out_bytes"]
+    return [
+        {"ts": ts, "client_ip": client, "in_bytes": in_bytes, "out_bytes": out_bytes}
+        for (ts, client), (in_bytes, out_bytes) in totals.items()
+    ]
+
+
+class ClientGrouper:
+    """Map client addresses to their default prefix or to a named group.
+
+    Group lookups are longest-prefix matches over the CSV table, compiled
+    per family into ``(host_bits, {network_int >> host_bits: group})``
+    levels probed from the longest prefix down. Addresses no entry covers
+    fall back to their default prefix. Both lookups go through an LRU cache
+    keyed by address, so the same clients cost one dict hit.
+    """
+
+    def __init__(
+        self,
+        table_path: Optional[str] = None,
+        *,
+        v4_prefix: int = 24,
+        v6_prefix: int = 64,
+        cache_size: int = 65536,
+    ) -> None:
+        if not 0 <= v4_prefix <= 32 or not 0 <= v6_prefix <= 128:
+            raise ValueError("Default group prefixes must be within 0-32 (IPv4) and 0-128 (IPv6)")
+        self.v4_prefix = v4_prefix
+        self.v6_prefix = v6_prefix
+        levels: Dict[int, Dict[int, Dict[int, str]]] = {4: {}, 6: {}}
+        for network, group in load_group_table(table_path) if table_path else []:
+            host_bits = network.max_prefixlen - network.prefixlen
+            # A primeira linha vence em prefixos repetidos, como nas regras de porta
+            levels[network.version].setdefault(host_bits, {}).setdefault(
+                int(network.network_address) >> host_bits, group
+            )
+        self._levels = {version: tuple(sorted(by_bits.items())) for version, by_bits in levels.items()}
+        self._lookup = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def key_function(self, group_by: str) -> Callable[[str], str]:
+        """Return ``client_ip -> key`` for ``group_by`` (``ip``, ``prefix`` or ``group``)."""
+
+        if group_by == "ip":
+            return str
+        if group_by == "prefix":
+            return lambda client: self._lookup(client)[0]
+        if group_by == "group":
+            return lambda client: self._lookup(client)[1]
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+
+    def _resolve(self, client: str) -> Tuple[str, str]:
+        if client in _PASSTHROUGH:
+            return client, client
+        # Chaves já agregadas por prefixo ("10.0.0.0/24") são resolvidas pelo endereço de rede
+        try:
+            address = ipaddress.ip_address(client.partition("/")[0])
+        except ValueError:
+            return client, client
+        value = int(address)
+        default_bits = (32 - self.v4_prefix) if address.version == 4 else (128 - self.v6_prefix)
+        default_net = ipaddress.ip_network((value >> default_bits << default_bits, address.max_prefixlen - default_bits))
+        prefix = str(default_net)
+        for host_bits, networks in self._levels[address.version]:
+            group = networks.get(value >> host_bits)
+            if group is not None:
+                return prefix, group
+        return prefix, prefix
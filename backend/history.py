@@ -0,0 +1,274 @@
+"""Append-only columnar history of closed windows on disk."""
+
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import queue
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from aggregator import PROTOCOLS, protocol_id
+
+LOGGER = logging.getLogger(__name__)
+
+SEGMENT_SECONDS = 3600
+# Janelas fechadas aguardando o gravador; cheia, a janela é descartada em vez de bloquear quem a fechou
+_QUEUE_SIZE = 1024
+
+# Uma coluna por arquivo: nome -> typecode do array
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("ts", "q"),
+    ("client", "I"),
+    ("proto", "B"),
+    ("in", "Q"),
+    ("out", "Q"),
+)
+
+HistoryRow = Tuple[int, str, str, int, int]
+
+
+class _MappedSegment:
+    """Zero-copy, read-only view of one segment's column files."""
+
+    def __init__(self, directory: Path, stack: ExitStack) -> None:
+        self.columns: Dict[str, memoryview] = {}
+        length: Optional[int] = None
+        for name, typecode in COLUMNS:
+            path = directory / f"{name}.col"
+            size = path.stat().st_size if path.exists() else 0
+            if size == 0:
+                self.columns = {}
+                self.length = 0
+                return
+            handle = stack.enter_context(open(path, "rb"))
+            mapped = stack.enter_context(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ))
+            itemsize = array(typecode).itemsize
+            view = memoryview(mapped)[: size - size % itemsize].cast(typecode)
+            stack.callback(view.release)
+            self.columns[name] = view
+            length = len(view) if length is None else min(length, len(view))
+        # Um flush interrompido pode deixar colunas com tamanhos diferentes
+        self.length = length or 0
+
+    def range(self, from_ts: int, to_ts: int) -> range:
+        with self.columns["ts"][: self.length] as ts:
+            return range(bisect_left(ts, from_ts), bisect_left(ts, to_ts + 1))
+
+
+class HistoryStore:
+    """Persist closed windows as per-hour segments of ts/client/proto/in/out columns.
+
+    ``append_window`` only queues the payload: after ``open`` a writer
+    thread buffers rows and appends them to the column files in bulk, so
+    the thread that closed the window (ingest or the close tick) never
+    waits on disk. Client IPs are interned into ``clients.txt`` so ids stay
+    stable across restarts. Reads memory-map the column files.
+
+    Each window is stored as it was when it closed; packets that reach the
+    aggregator later for an already closed window are not persisted.
+    """
+
+    def __init__(self, directory: str, *, flush_seconds: float = 30.0, flush_rows: int = 50_000) -> None:
+        self.directory = Path(directory)
+        self.flush_seconds = flush_seconds
+        self.flush_rows = flush_rows
+        self.rows_written = 0
+        self.dropped_windows = 0
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Dict[str, object]]]" = queue.Queue(_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._client_ids: Dict[str, int] = {}
+        self._client_names: List[str] = []
+        self._pending_clients: List[str] = []
+        self._buffer = {name: array(typecode) for name, typecode in COLUMNS}
+        self._buffer_segment: Optional[int] = None
+        self._last_flush = time.monotonic()
+
+    def open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        clients_path = self.directory / "clients.txt"
+        if clients_path.exists():
+            with open(clients_path, encoding="utf-8") as handle:
+                for line in handle:
+                    name = line.rstrip("\n")
+                    if name:
+                        self._client_ids[name] = len(self._client_names)
+                        self._client_names.append(name)
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+    def append_window(self, payload: Dict[str, object]) -> None:
+        """Window listener: queue one closed window (``TrafficAggregator`` payload) for the writer."""
+
+        if self._thread is None:
+            self._append(payload)
+            return
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            self.dropped_windows += 1
+            LOGGER.warning("History writer is behind; dropped window %s", payload["ts"])
+
+    def _run(self) -> None:
+        while True:
+            try:
+                payload = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                payload = {}
+            if payload is None:
+                return
+            try:
+                if payload:
+                    self._append(payload)
+                elif time.monotonic() - self._last_flush >= self.flush_seconds:
+                    self.flush()
+            except (OSError, ValueError) as exc:
+                LOGGER.exception("Failed to write history: %s", exc)
+
+    def _append(self, payload: Dict[str, object]) -> None:
+        ts = int(payload["ts"])  # type: ignore[arg-type]
+        segment = ts - ts % SEGMENT_SECONDS
+        with self._lock:
+            if self._buffer_segment is not None and segment != self._buffer_segment:
+                self._flush_locked()
+            self._buffer_segment = segment
+            buffer = self._buffer
+            for entry in payload["clients"]:  # type: ignore[union-attr]
+                client_id = self._intern(entry["client_ip"])
+                for protocol, totals in entry["protocols"].items():
+                    buffer["ts"].append(ts)
+                    buffer["client"].append(client_id)
+                    buffer["proto"].append(protocol_id(protocol))
+                    buffer["in"].append(totals["in_bytes"])
+                    buffer["out"].append(totals["out_bytes"])
+
+            if len(buffer["ts"]) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_seconds:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _intern(self, client_ip: str) -> int:
+        client_id = self._client_ids.get(client_ip)
+        if client_id is None:
+            client_id = len(self._client_names)
+            self._client_ids[client_ip] = client_id
+            self._client_names.append(client_ip)
+            self._pending_clients.append(client_ip)
+        return client_id
+
+    def _flush_locked(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._buffer["ts"] or self._buffer_segment is None:
+            return
+
+        # O dicionário de clientes é gravado antes das colunas que o referenciam
+        if self._pending_clients:
+            with open(self.directory / "clients.txt", "a", encoding="utf-8") as handle:
+                handle.write("".join(f"{name}\n" for name in self._pending_clients))
+            self._pending_clients = []
+
+        segment_dir = self._segment_dir(self._buffer_segment)
+        segment_dir.mkdir(parents=True, exist_ok=True)
+        for name, typecode in COLUMNS:
+            with open(segment_dir / f"{name}.col", "ab") as handle:
+                self._buffer[name].tofile(handle)
+        self.rows_written += len(self._buffer["ts"])
+        self._buffer = {name: array(typecode) for name, typecode in COLUMNS}
+
+    def _segment_dir(self, segment: int) -> Path:
+        return self.directory / str(segment)
+
+    def _segments(self, from_ts: int, to_ts: int) -> List[int]:
+        if not self.directory.exists():
+            return []
+        segments = []
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and entry.name.isdigit():
+                segment = int(entry.name)
+                if segment + SEGMENT_SECONDS > from_ts and segment <= to_ts:
+                    segments.append(segment)
+        return sorted(segments)
+
+    def iter_rows(self, from_ts: int, to_ts: int) -> Iterator[HistoryRow]:
+        """Yield ``(ts, client_ip, protocol, in_bytes, out_bytes)`` rows in time order."""
+
+        names = self._client_names
+        for segment in self._segments(from_ts, to_ts):
+            with ExitStack() as stack:
+                mapped = _MappedSegment(self._segment_dir(segment), stack)
+                if not mapped.length:
+                    continue
+                columns = mapped.columns
+                ts_col, client_col, proto_col = columns["ts"], columns["client"], columns["proto"]
+                in_col, out_col = columns["in"], columns["out"]
+                for index in mapped.range(from_ts, to_ts):
+                    client_id = client_col[index]
+                    if client_id >= len(names):
+                        continue
+                    proto = proto_col[index]
+                    yield (
+                        ts_col[index],
+                        names[client_id],
+                        PROTOCOLS[proto] if proto < len(PROTOCOLS) else "OTHER",
+                        in_col[index],
+                        out_col[index],
+                    )
+
+    def get_summary(self, *, from_ts: int, to_ts: int, resolution: int) -> List[Dict[str, object]]:
+        """Per-client totals between ``from_ts`` and ``to_ts``, re-binned to ``resolution``."""
+
+        totals: Dict[Tuple[int, str], List[int]] = defaultdict(lambda: [0, 0])
+        for ts, client_ip, _, in_bytes, out_bytes in self.iter_rows(from_ts, to_ts):
+            entry = totals[(ts - ts % resolution, client_ip)]
+            entry[0] += in_bytes
+            entry[1] += out_bytes
+        return [
+            {"ts": ts, "client_ip": client_ip, "in_bytes": in_bytes, "out_bytes": out_bytes}
+            for (ts, client_ip), (in_bytes, out_bytes) in sorted(totals.items(), key=lambda item: item[0][0])
+        ]
+
+    def get_drilldown(self, *, ts: int, client_ip: str, resolution: int) -> Optional[Dict[str, object]]:
+        """Protocol totals for one client over the bin ``[ts, ts + resolution)``."""
+
+        totals: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        for _, row_client, protocol, in_bytes, out_bytes in self.iter_rows(ts, ts + resolution - 1):
+            if row_client == client_ip:
+                entry = totals[protocol]
+                entry[0] += in_bytes
+                entry[1] += out_bytes
+        if not totals:
+            return None
+        return {
+            "ts": ts,
+            "client_ip": client_ip,
+            "items": [
+                {"protocol": protocol, "in_bytes": in_bytes, "out_bytes": out_bytes}
+                for protocol, (in_bytes, out_bytes) in sorted(totals.items())
+            ],
+        }
+
+    def load_latest_segment(self) -> List[HistoryRow]:
+        """Rows of the most recent segment, used to warm the aggregator at startup."""
+
+        segments = self._segments(0, int(time.time()) + SEGMENT_SECONDS)
+        if not segments:
+            return []
+        latest = segments[-1]
+        return list(self.iter_rows(latest, latest + SEGMENT_SECONDS - 1))
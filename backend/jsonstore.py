@@ -0,0 +1,205 @@
+"""Background bulk persistence of ``/api/json-data`` payloads in SQLite (WAL)."""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Dict, List, Optional, Sequence
+
+from metrics import REGISTRY, Registry
+from serialization import dumps
+from spsc import SpscRing
+
+LOGGER = logging.getLogger(__name__)
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS json_data (
+        id INTEGER PRIMARY KEY,
+        client_id TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        data_type TEXT NOT NULL,
+        file_size INTEGER NOT NULL,
+        received_at REAL NOT NULL,
+        payload TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS json_data_client_ts ON json_data (client_id, timestamp)",
+)
+_INSERT = (
+    "INSERT INTO json_data (client_id, timestamp, data_type, file_size, received_at, payload) VALUES (?, ?, ?, ?, ?, ?)"
+)
+# Faixa de INTEGER do SQLite (64 bits com sinal)
+_SQLITE_INT_MIN, _SQLITE_INT_MAX = -(2**63), 2**63 - 1
+
+
+def _sqlite_int(value: Any) -> int:
+    number = int(value)
+    if not _SQLITE_INT_MIN <= number <= _SQLITE_INT_MAX:
+        raise OverflowError(f"{number} does not fit in a 64-bit integer")
+    return number
+
+
+def _encode_payload(payload: Any) -> str:
+    try:
+        return dumps(payload).decode("utf-8")
+    except TypeError:
+        # orjson recusa inteiros acima de 64 bits, que o json da stdlib aceita
+        return json.dumps(payload, separators=(",", ":"))
+
+
+def parse_json_records(body: bytes, ndjson: bool = False) -> List[Dict[str, Any]]:
+    """Split a request body into record dicts: one object, a JSON array, or NDJSON lines.
+
+    Raises ``ValueError`` for malformed JSON or items that are not objects.
+    """
+
+    if ndjson:
+        items = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        parsed = json.loads(body)
+        items = parsed if isinstance(parsed, list) else [parsed]
+    if not all(isinstance(item, dict) for item in items):
+        raise ValueError("Each JSON record must be an object")
+    return items
+
+
+class JsonDataStore:
+    """Queue validated records and bulk-insert them from a writer thread.
+
+    ``submit`` only appends the batch to a bounded ``SpscRing`` and returns,
+    so request handlers never wait on disk; the producer is the event loop
+    thread running the async endpoint. The writer drains every batch queued
+    while it was busy and inserts them with one ``executemany`` in a single
+    transaction, so commits (and WAL syncs) grow with load instead of
+    happening per request. Rows are indexed by ``(client_id, timestamp)``;
+    readers use their own connection, which WAL lets proceed alongside the
+    writer.
+    """
+
+    def __init__(self, path: str, *, queue_size: int = 4096, flush_seconds: float = 0.2) -> None:
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+        self._queue = SpscRing(queue_size, "drop-newest")
+        self._thread: Optional[threading.Thread] = None
+        self._batches_done = 0
+
+    def open(self) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+        self._thread = threading.Thread(target=self._run, name="json-data-writer", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._queue.close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def submit(self, records: Sequence[Dict[str, Any]], received_at: Optional[float] = None) -> bool:
+        """Queue ``records``; ``False`` means the queue is full and nothing was queued."""
+
+        received_at = time.time() if received_at is None else received_at
+        if not self._queue.put((received_at, records)):
+            self.rejected += len(records)
+            return False
+        self.accepted += len(records)
+        return True
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued record is committed (tests and benchmarks)."""
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._batches_done < self._queue.enqueued:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def recent(self, *, client_id: str, limit: int = 50, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Newest records of ``client_id`` first, optionally with ``timestamp >= since``."""
+
+        query = "SELECT client_id, timestamp, data_type, file_size, received_at, payload FROM json_data WHERE client_id = ?"
+        params: List[Any] = [client_id]
+        if since is not None:
+            query += " AND timestamp >= ?"
+            params.append(since)
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        params.append(limit)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [
+            {
+                "client_id": client,
+                "timestamp": timestamp,
+                "data_type": data_type,
+                "file_size": file_size,
+                "received_at": received_at,
+                "payload": json.loads(payload),
+            }
+            for client, timestamp, data_type, file_size, received_at, payload in rows
+        ]
+
+    def register_metrics(self, registry: Registry = REGISTRY) -> None:
+        counters = (
+            ("traffic_json_records_accepted_total", "JSON records queued for storage.", lambda: self.accepted),
+            ("traffic_json_records_rejected_total", "JSON records refused with a full queue.", lambda: self.rejected),
+            ("traffic_json_records_written_total", "JSON records committed to SQLite.", lambda: self.written),
+            ("traffic_json_records_failed_total", "JSON records that could not be stored.", lambda: self.failed),
+        )
+        for name, documentation, callback in counters:
+            registry.callback(name, documentation, callback, kind="counter")
+        registry.callback(
+            "traffic_json_queue_depth", "Request batches waiting for the writer.", lambda: len(self._queue)
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _run(self) -> None:
+        with closing(self._connect()) as conn:
+            while not (self._queue.closed and not len(self._queue)):
+                batches = self._queue.drain(self.flush_seconds)
+                if batches:
+                    try:
+                        self._write(conn, batches)
+                    except (sqlite3.Error, OverflowError, ValueError) as exc:
+                        self.failed += sum(len(records) for _, records in batches)
+                        LOGGER.exception("Failed to store %d JSON batches: %s", len(batches), exc)
+                    self._batches_done += len(batches)
+
+    def _write(self, conn: sqlite3.Connection, batches: List[Any]) -> None:
+        rows = []
+        for received_at, records in batches:
+            for record in records:
+                try:
+                    rows.append(
+                        (
+                            str(record["client_id"]),
+                            _sqlite_int(record["timestamp"]),
+                            str(record["data_type"]),
+                            _sqlite_int(record["file_size"]),
+                            received_at,
+                            _encode_payload(record["payload"]),
+                        )
+                    )
+                except (KeyError, TypeError, ValueError, OverflowError) as exc:
+                    # Um registro que não pode ser gravado não derruba o lote nem o gravador
+                    self.failed += 1
+                    LOGGER.warning("Skipping JSON record of %r: %s", record.get("client_id"), exc)
+        if not rows:
+            return
+        with conn:
+            conn.executemany(_INSERT, rows)
+        self.written += len(rows)
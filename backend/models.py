@@ -1,6 +1,6 @@
 """Pydantic models for API responses."""
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from pydantic import BaseModel
 
@@ -25,6 +25,23 @@ class SummaryResponse(BaseModel):
     """Response model for the traffic summary endpoint."""
 
     bins: List[SummaryBin]
+    resolution: Optional[int] = None
+
+
+class SummaryColumns(BaseModel):
+    """Summary bins as equal-length per-field arrays."""
+
+    ts: List[int]
+    client_ip: List[str]
+    in_bytes: List[int]
+    out_bytes: List[int]
+
+
+class ColumnarSummaryResponse(BaseModel):
+    """Summary endpoint payload for ``format=columnar``."""
+
+    columns: SummaryColumns
+    resolution: Optional[int] = None
 
 
 class DrilldownItem(BaseModel):
@@ -43,6 +60,92 @@ class DrilldownResponse(BaseModel):
     items: List[DrilldownItem]
 
 
+class RangeDrilldownGroup(BaseModel):
+    """Protocol mix of one client (``key`` = address) or one bin (``key`` = ts)."""
+
+    key: Union[int, str]
+    in_bytes: int
+    out_bytes: int
+    items: List[DrilldownItem]
+
+
+class RangeDrilldownResponse(BaseModel):
+    """Protocol mix over a time range, optionally split per client or bin."""
+
+    from_ts: int
+    to_ts: int
+    resolution: int
+    group_by: str
+    in_bytes: int
+    out_bytes: int
+    items: List[DrilldownItem]
+    groups: List[RangeDrilldownGroup]
+
+
+class SeriesColumns(BaseModel):
+    """Per-bin byte arrays aligned with ``SeriesResponse.ts``."""
+
+    in_bytes: List[int]
+    out_bytes: List[int]
+
+
+class ClientSeries(SeriesColumns):
+    """Dense time series of one client; ``protocols`` only when requested."""
+
+    client_ip: str
+    protocols: Optional[Dict[str, SeriesColumns]] = None
+
+
+class SeriesResponse(BaseModel):
+    """Zero-filled client series sharing one timestamp axis."""
+
+    resolution: int
+    ts: List[int]
+    series: List[ClientSeries]
+
+
+class TopItem(BaseModel):
+    """Estimated traffic of one heavy-hitter client."""
+
+    client_ip: str
+    bytes: int
+    error: int
+
+
+class TopResponse(BaseModel):
+    """Response model for the top talkers endpoint."""
+
+    by: str
+    items: List[TopItem]
+
+
+class FlowItem(BaseModel):
+    """Counters of one client connection to the server."""
+
+    client_ip: str
+    client_port: int
+    server_port: int
+    transport: str
+    protocol: str
+    first_seen: float
+    last_seen: float
+    packets_in: int
+    packets_out: int
+    bytes_in: int
+    bytes_out: int
+    tcp_flags: int
+    closed: bool
+
+
+class FlowsResponse(BaseModel):
+    """Response model for the per-connection drill-down endpoint."""
+
+    ts: int
+    client_ip: str
+    resolution: int
+    flows: List[FlowItem]
+
+
 class JsonDataRequest(BaseModel):
     """Request model for JSON data received via FTP."""
     
@@ -63,3 +166,30 @@ class JsonDataResponse(BaseModel):
     message: str
 
 
+
+
+class JsonDataBatchResponse(BaseModel):
+    """Response for an NDJSON or array body carrying several records."""
+
+    received: bool
+    processed_at: int
+    records: int
+    client_ids: List[str]
+
+
+class JsonDataRecord(BaseModel):
+    """A stored JSON payload as returned by the query endpoint."""
+
+    client_id: str
+    timestamp: int
+    data_type: str
+    file_size: int
+    received_at: float
+    payload: Dict[str, Any]
+
+
+class JsonDataListResponse(BaseModel):
+    """Most recent stored payloads of one client, newest first."""
+
+    client_id: str
+    records: List[JsonDataRecord]
@@ -0,0 +1,147 @@
+"""Server address matching over host addresses and CIDR prefixes (IPv4 and IPv6)."""
+
+from __future__ import annotations
+
+import fcntl
+import ipaddress
+import logging
+import socket
+import struct
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple, Union
+
+LOGGER = logging.getLogger(__name__)
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+# Acima disso o cache de endereços já resolvidos é descartado e recomeça
+_CACHE_LIMIT = 65536
+_SIOCGIFADDR = 0x8915
+_IF_INET6 = "/proc/net/if_inet6"
+
+
+def parse_server_ips(raw: str) -> List[Network]:
+    """Parse ``"10.0.0.1, 10.0.1.0/24, 2001:db8::/64"`` into networks; raises ValueError if invalid."""
+
+    networks: List[Network] = []
+    for entry in raw.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError as exc:
+            raise ValueError(f"Invalid server address or prefix: {entry!r}") from exc
+    if not networks:
+        raise ValueError("At least one server address is required")
+    return networks
+
+
+class ServerIndex:
+    """Compiled set of server addresses; ``contains(ip)`` answers whether ``ip`` is the server.
+
+    Host entries (/32, /128) live in a frozenset of canonical strings, so
+    with no prefixes ``contains`` is the set's own ``__contains__``. Prefix
+    entries are indexed per family as ``{prefix_len: {network_int >> host_bits}}``;
+    a lookup shifts the address once per distinct prefix length. Prefix
+    results are cached per address string, since the same clients recur.
+    """
+
+    def __init__(self, spec: str) -> None:
+        self.networks = parse_server_ips(spec)
+        hosts: Set[str] = set()
+        # família (4/6) -> bits de host -> redes deslocadas
+        prefixes: Dict[int, Dict[int, Set[int]]] = {4: {}, 6: {}}
+        for network in self.networks:
+            if network.prefixlen == network.max_prefixlen:
+                hosts.add(str(network.network_address))
+            else:
+                host_bits = network.max_prefixlen - network.prefixlen
+                prefixes[network.version].setdefault(host_bits, set()).add(int(network.network_address) >> host_bits)
+        self.hosts: FrozenSet[str] = frozenset(hosts)
+        self._prefixes: Dict[int, Tuple[Tuple[int, FrozenSet[int]], ...]] = {
+            version: tuple(sorted((bits, frozenset(values)) for bits, values in by_bits.items()))
+            for version, by_bits in prefixes.items()
+        }
+        self._cache: Dict[str, bool] = {}
+        self.contains: Callable[[str], bool] = (
+            self.hosts.__contains__ if not any(self._prefixes.values()) else self._contains_prefix
+        )
+
+    def __contains__(self, address: str) -> bool:
+        return self.contains(address)
+
+    def __str__(self) -> str:
+        return ",".join(
+            str(network.network_address) if network.prefixlen == network.max_prefixlen else str(network)
+            for network in self.networks
+        )
+
+    def _contains_prefix(self, address: str) -> bool:
+        if address in self.hosts:
+            return True
+        cached = self._cache.get(address)
+        if cached is not None:
+            return cached
+        try:
+            parsed = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        value = int(parsed)
+        matched = any(value >> bits in networks for bits, networks in self._prefixes[parsed.version])
+        if len(self._cache) >= _CACHE_LIMIT:
+            self._cache.clear()
+        self._cache[address] = matched
+        return matched
+
+
+def interface_addresses(iface: str) -> List[str]:
+    """Unicast addresses configured on ``iface`` (``"any"`` = every non-loopback interface)."""
+
+    names = [name for _, name in socket.if_nameindex()] if iface == "any" else [iface]
+    addresses: List[str] = []
+    for name in names:
+        if name == "lo":
+            continue
+        address = _ipv4_address(name)
+        if address is not None:
+            addresses.append(address)
+    addresses.extend(_ipv6_addresses(set(names)))
+    return addresses
+
+
+def _ipv4_address(name: str) -> Optional[str]:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        try:
+            request = struct.pack("256s", name.encode()[:15])
+            reply = fcntl.ioctl(sock.fileno(), _SIOCGIFADDR, request)
+        except OSError:
+            return None
+    return socket.inet_ntoa(reply[20:24])
+
+
+def _ipv6_addresses(names: Set[str]) -> List[str]:
+    try:
+        with open(_IF_INET6, encoding="ascii") as handle:
+            lines = handle.read().splitlines()
+    except OSError:
+        return []
+    addresses = []
+    for line in lines:
+        fields = line.split()
+        # Campos: endereço em hex, índice, prefixo, escopo, flags, nome
+        if len(fields) < 6 or fields[5] not in names or fields[5] == "lo":
+            continue
+        addresses.append(str(ipaddress.IPv6Address(bytes.fromhex(fields[0]))))
+    return addresses
+
+
+def resolve_server_ips(spec: str, iface: str, lookup: Callable[[str], Sequence[str]] = interface_addresses) -> str:
+    """Expand ``"auto"`` to the capture interface's addresses; other specs are validated as-is."""
+
+    if spec.strip().lower() != "auto":
+        return str(ServerIndex(spec))
+    addresses = list(lookup(iface))
+    if not addresses:
+        raise ValueError(f"SERVER_IP=auto found no addresses on interface {iface!r}; set SERVER_IP explicitly")
+    LOGGER.info("SERVER_IP=auto resolved to %s on %s", ",".join(addresses), iface)
+    return str(ServerIndex(",".join(addresses)))
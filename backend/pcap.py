@@ -0,0 +1,171 @@
+"""Minimal pcap/pcapng reader and pcap writer for offline replay."""
+
+from __future__ import annotations
+
+import struct
+import time
+from typing import BinaryIO, Dict, Iterable, Iterator, NamedTuple, Tuple
+
+# Link types (LINKTYPE_*) suportados pelo decodificador
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+
+_PCAP_MAGIC_US = 0xA1B2C3D4
+_PCAP_MAGIC_NS = 0xA1B23C4D
+_PCAPNG_SHB = 0x0A0D0D0A
+_PCAPNG_BYTE_ORDER = 0x1A2B3C4D
+_PCAPNG_IDB = 0x00000001
+_PCAPNG_SPB = 0x00000003
+_PCAPNG_EPB = 0x00000006
+_PCAPNG_TSRESOL = 9
+_SLL_HEADER = 16
+
+
+class PcapRecord(NamedTuple):
+    """One captured frame; ``data`` may be shorter than ``orig_len`` (snaplen)."""
+
+    timestamp: float
+    data: bytes
+    orig_len: int
+    linktype: int
+
+
+def read_packets(handle: BinaryIO) -> Iterator[PcapRecord]:
+    """Yield the records of a pcap or pcapng stream, detecting the format from its magic."""
+
+    head = handle.read(4)
+    if len(head) < 4:
+        return
+    if struct.unpack("<I", head)[0] == _PCAPNG_SHB:
+        yield from _read_pcapng(handle, head)
+        return
+    for order in ("<", ">"):
+        magic = struct.unpack(f"{order}I", head)[0]
+        if magic in (_PCAP_MAGIC_US, _PCAP_MAGIC_NS):
+            yield from _read_pcap(handle, order, 1e-9 if magic == _PCAP_MAGIC_NS else 1e-6)
+            return
+    raise ValueError("Not a pcap or pcapng file")
+
+
+def _read_pcap(handle: BinaryIO, order: str, resolution: float) -> Iterator[PcapRecord]:
+    header = handle.read(20)
+    if len(header) < 20:
+        raise ValueError("Truncated pcap header")
+    linktype = struct.unpack(f"{order}HHiIII", header)[5] & 0x0FFFFFFF
+    record = struct.Struct(f"{order}IIII")
+    read = handle.read
+    while True:
+        raw = read(16)
+        if len(raw) < 16:
+            return
+        seconds, fraction, incl_len, orig_len = record.unpack(raw)
+        data = read(incl_len)
+        if len(data) < incl_len:
+            return
+        yield PcapRecord(seconds + fraction * resolution, data, orig_len, linktype)
+
+
+def _read_pcapng(handle: BinaryIO, head: bytes) -> Iterator[PcapRecord]:
+    order = "<"
+    # Por interface: (linktype, segundos por unidade de timestamp)
+    interfaces: Dict[int, Tuple[int, float]] = {}
+    block_type = struct.unpack("<I", head)[0]
+    while True:
+        raw_length = handle.read(4)
+        if len(raw_length) < 4:
+            return
+        if block_type == _PCAPNG_SHB:
+            body_start = handle.read(4)
+            order = "<" if struct.unpack("<I", body_start)[0] == _PCAPNG_BYTE_ORDER else ">"
+            length = struct.unpack(f"{order}I", raw_length)[0]
+            body = body_start + handle.read(length - 16)
+            # Cada seção reinicia a numeração das interfaces
+            interfaces = {}
+        else:
+            length = struct.unpack(f"{order}I", raw_length)[0]
+            body = handle.read(length - 12)
+        handle.read(4)
+        if len(body) < length - 12:
+            return
+
+        if block_type == _PCAPNG_IDB:
+            linktype = struct.unpack_from(f"{order}H", body, 0)[0]
+            interfaces[len(interfaces)] = (linktype, _pcapng_resolution(body[8:], order))
+        elif block_type == _PCAPNG_EPB:
+            interface, high, low, incl_len, orig_len = struct.unpack_from(f"{order}IIIII", body, 0)
+            linktype, resolution = interfaces.get(interface, (LINKTYPE_ETHERNET, 1e-6))
+            yield PcapRecord(((high << 32) | low) * resolution, body[20 : 20 + incl_len], orig_len, linktype)
+        elif block_type == _PCAPNG_SPB:
+            orig_len = struct.unpack_from(f"{order}I", body, 0)[0]
+            linktype, _ = interfaces.get(0, (LINKTYPE_ETHERNET, 1e-6))
+            yield PcapRecord(0.0, body[4 : 4 + orig_len], orig_len, linktype)
+
+        raw_type = handle.read(4)
+        if len(raw_type) < 4:
+            return
+        block_type = struct.unpack(f"{order}I", raw_type)[0]
+
+
+def _pcapng_resolution(options: bytes, order: str) -> float:
+    offset = 0
+    while offset + 4 <= len(options):
+        code, length = struct.unpack_from(f"{order}HH", options, offset)
+        if code == 0:
+            break
+        if code == _PCAPNG_TSRESOL and length >= 1:
+            value = options[offset + 4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+        offset += 4 + (length + 3) // 4 * 4
+    return 1e-6
+
+
+def frame_payload(record: PcapRecord) -> Tuple[memoryview, bool]:
+    """Return ``(frame, is_ethernet)`` with link headers the decoder does not know stripped."""
+
+    view = memoryview(record.data)
+    if record.linktype == LINKTYPE_ETHERNET:
+        return view, True
+    if record.linktype == LINKTYPE_LINUX_SLL:
+        return view[_SLL_HEADER:], False
+    return view, False
+
+
+def paced(records: Iterable[PcapRecord], speed: float) -> Iterator[PcapRecord]:
+    """Release records at their recorded spacing divided by ``speed`` (0 = as fast as possible)."""
+
+    if speed <= 0:
+        yield from records
+        return
+    first = None
+    started = time.monotonic()
+    for record in records:
+        if first is None:
+            first = record.timestamp
+        delay = (record.timestamp - first) / speed - (time.monotonic() - started)
+        # Atrasos menores que 1 ms se acumulam até valer um sleep
+        if delay > 0.001:
+            time.sleep(delay)
+        yield record
+
+
+def write_pcap(
+    handle: BinaryIO, records: Iterable[Tuple[float, bytes, int]], linktype: int = LINKTYPE_ETHERNET
+) -> int:
+    """Write ``(timestamp, frame, orig_len)`` records as a microsecond pcap; returns the record count.
+
+    ``orig_len`` larger than the frame marks it as truncated by the snaplen,
+    which keeps synthetic traces small while carrying realistic packet sizes.
+    """
+
+    handle.write(struct.pack("<IHHiIII", _PCAP_MAGIC_US, 2, 4, 0, 0, 65535, linktype))
+    record = struct.Struct("<IIII")
+    count = 0
+    for timestamp, frame, orig_len in records:
+        seconds = int(timestamp)
+        handle.write(record.pack(seconds, int((timestamp - seconds) * 1e6), len(frame), max(orig_len, len(frame))))
+        handle.write(frame)
+        count += 1
+    return count
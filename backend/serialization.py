@@ -0,0 +1,40 @@
+"""Fast JSON encoding of pre-shaped API payloads, bypassing per-row model validation."""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Sequence
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+SUMMARY_FIELDS = ("ts", "client_ip", "in_bytes", "out_bytes")
+FORMATS = ("rows", "columnar")
+
+_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, check_circular=False)
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode ``payload`` with orjson when installed, else the stdlib C encoder."""
+
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return _encoder.encode(payload).encode("utf-8")
+
+
+def columnar(rows: Sequence[Dict[str, Any]], fields: Sequence[str] = SUMMARY_FIELDS) -> Dict[str, List[Any]]:
+    """Turn row dicts into ``{field: [values...]}``; keys repeat once instead of once per row."""
+
+    return {field: [row[field] for row in rows] for field in fields}
+
+
+def encode_summary(bins: Sequence[Dict[str, Any]], resolution: int, layout: str = "rows") -> bytes:
+    """Serialize a summary response; ``columnar`` replaces ``bins`` with per-field arrays."""
+
+    if layout == "columnar":
+        return dumps({"columns": columnar(bins), "resolution": resolution})
+    if layout != "rows":
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return dumps({"bins": bins, "resolution": resolution})
@@ -9,21 +9,68 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     """Runtime configuration loaded from environment variables."""
 
+    # Endereços/prefixos do servidor separados por vírgula (IPv4 e IPv6); "auto" usa os da interface IFACE
     server_ip: str = "auto"
     iface: str = "any"
+    capture_backend: str = "rawsocket"
+    # "iface" captura ao vivo; "file:trace.pcap" reproduz um pcap/pcapng pelo mesmo pipeline
+    capture_source: str = "iface"
+    # Velocidade da reprodução: 0 = o mais rápido possível, 1 = tempo gravado, 2 = o dobro
+    replay_speed: float = 0.0
+    capture_batch_size: int = 256
+    capture_batch_ms: int = 50
+    # Fila entre captura e agregação, em lotes; política ao encher: drop-newest, drop-oldest ou block
+    capture_queue_size: int = 1024
+    capture_queue_policy: str = "drop-oldest"
+    # Filtro BPF no kernel: off, server (só pacotes de/para SERVER_IP) ou ports (também exige porta de PROTOCOL_PORTS)
+    capture_filter: str = "server"
+    # Bytes guardados por pacote pelo filtro (0 = quadro inteiro); o tamanho real vem do cabeçalho IP
+    capture_snaplen: int = 0
+    # Regras porta -> protocolo "transporte:porta[-porta]=PROTOCOLO"; a primeira regra vence
+    protocol_ports: str = "tcp:20-21=FTP,tcp:30000-30009=FTP,tcp:80=HTTP,tcp:443=HTTPS/TLS,tcp:53=DNS,udp:53=DNS"
+    # Fluxos (5-tupla) com protocolo já classificado mantidos em cache LRU
+    flow_cache_size: int = 65536
+    # Tabela de conexões para /api/flows (0 desativa); timeouts de inatividade e de duração em segundos
+    flow_table_size: int = 0
+    flow_idle_timeout: float = 30.0
+    flow_active_timeout: float = 300.0
+    log_level: str = "INFO"
+    # Rastreamento por pacote (desligado por padrão): 1 a cada N pacotes ou só um IP de cliente
+    trace_sample_every: int = 0
+    trace_client_ip: Optional[str] = None
+    trace_max_lines_per_second: int = 50
+    # Intervalo do resumo de vazão da captura em INFO
+    capture_stats_seconds: float = 60.0
+    # Processos de captura+agregação em um grupo PACKET_FANOUT (1 = processo único)
+    shards: int = 1
     window_seconds: int = 5
     retention_seconds: int = 300
+    # Tiers de rollup "janela:retenção" em segundos (1 min por 24 h); "60:86400,900:2592000" acrescenta 15 min por 30 dias
+    rollup_tiers: str = "60:86400"
+    # Clientes mantidos por janela de rollup (o resto soma em "other"); 0 = todos
+    rollup_max_clients: int = 200
+    stream_queue_size: int = 32
+    # Capacidade dos sketches Space-Saving por janela (0 desativa /api/top)
+    topk_capacity: int = 64
+    # Granularidade dos clientes na ingestão: ip, prefix (/24 e /64 por padrão) ou group (tabela CSV)
+    client_key: str = "ip"
+    # CSV "prefixo,grupo" para group_by=group; endereços fora da tabela caem no prefixo padrão
+    client_groups_file: Optional[str] = None
+    client_group_v4_prefix: int = 24
+    client_group_v6_prefix: int = 64
+    # Máximo de clientes guardados por janela fechada; o restante vira "other" (0 = sem limite)
+    max_clients_per_window: int = 0
+    # Diretório do histórico colunar em disco; vazio desativa a persistência
+    history_dir: Optional[str] = None
+    history_flush_seconds: int = 30
+    # SQLite (WAL) para os payloads de /api/json-data; vazio só confirma o recebimento sem guardar
+    json_store_path: Optional[str] = None
+    # Fila entre o endpoint assíncrono e o gravador, em requisições; cheia responde 503
+    json_queue_size: int = 4096
+    json_flush_ms: int = 200
 
     model_config = SettingsConfigDict(env_file=".env", env_prefix="", env_nested_delimiter="__")
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # Se server_ip for "auto", usar 0.0.0.0 para capturar todo tráfego
-        if self.server_ip == "auto":
-            self.server_ip = "0.0.0.0"
-        # Log para debug
-        print(f"DEBUG: Final SERVER_IP = {self.server_ip}")
-
 
 @lru_cache
 def get_settings() -> Settings:
@@ -0,0 +1,311 @@
+"""Multi-process sharded capture and aggregation."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from collections import defaultdict
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Tuple
+
+from aggregator import TrafficAggregator
+
+LOGGER = logging.getLogger(__name__)
+
+# Métodos do agregador que a API pode chamar em cada shard
+SHARD_METHODS = frozenset(
+    {
+        "get_summary",
+        "get_drilldown",
+        "get_range_drilldown",
+        "get_series",
+        "get_top",
+        "summary_etag",
+        "select_resolution",
+        "retained_since",
+        "get_flows",
+    }
+)
+_TICK_SECONDS = 1.0
+
+
+class ShardUnavailable(RuntimeError):
+    """A shard process exited; its part of the traffic can no longer be queried."""
+
+    def __init__(self, index: int) -> None:
+        super().__init__(f"Shard {index} is not running")
+        self.index = index
+
+
+def _tick(aggregator: TrafficAggregator, stop: threading.Event) -> None:
+    # Fecha janelas pelo relógio mesmo com o pipe ocupado por consultas
+    while not stop.wait(_TICK_SECONDS):
+        aggregator.close_windows()
+
+
+def _shard_main(
+    index: int,
+    aggregator_kwargs: Dict[str, Any],
+    capture_kwargs: Dict[str, Any],
+    conn: Connection,
+) -> None:
+    """Worker process: own capture socket in a fanout group plus a private aggregator."""
+
+    from capture import CaptureService
+
+    logging.basicConfig(level=logging.INFO)
+    aggregator = TrafficAggregator(**aggregator_kwargs)
+    capture = CaptureService(aggregator=aggregator, **capture_kwargs)
+    capture.start()
+    stop = threading.Event()
+    ticker = threading.Thread(target=_tick, args=(aggregator, stop), name=f"shard-{index}-tick", daemon=True)
+    ticker.start()
+    LOGGER.info("Shard %d started (pid %d)", index, os.getpid())
+    try:
+        while True:
+            method, kwargs = conn.recv()
+            if method == "stop":
+                break
+            try:
+                if method not in SHARD_METHODS:
+                    raise ValueError(f"Unsupported shard method: {method}")
+                # A tabela de fluxos pertence à captura, não ao agregador
+                target = aggregator if method != "get_flows" else capture.flows
+                if target is None:
+                    raise ValueError("Flow table is disabled")
+                conn.send(("ok", getattr(target, method)(**kwargs)))
+            except ValueError as exc:
+                conn.send(("value_error", str(exc)))
+            except Exception as exc:  # noqa: BLE001
+                LOGGER.exception("Shard %d failed on %s: %s", index, method, exc)
+                conn.send(("error", repr(exc)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        stop.set()
+        capture.stop()
+
+
+class ShardedAggregator:
+    """Run N capture+aggregation shards in worker processes and merge their answers.
+
+    Each shard opens its own AF_PACKET socket in a shared ``PACKET_FANOUT``
+    group, so the kernel spreads flows across processes by hash. Queries are
+    sent to every shard over a pipe and merged here. Exposes the read side of
+    ``TrafficAggregator`` used by the API; a query raises ``ShardUnavailable``
+    once a shard process has died.
+    """
+
+    def __init__(
+        self,
+        *,
+        shards: int,
+        aggregator_kwargs: Dict[str, Any],
+        capture_kwargs: Dict[str, Any],
+        fanout_group: Optional[int] = None,
+    ) -> None:
+        if shards < 1:
+            raise ValueError("shards must be >= 1")
+        self.shards = shards
+        self.aggregator_kwargs = aggregator_kwargs
+        self.capture_kwargs = dict(capture_kwargs)
+        self.capture_kwargs["backend"] = "rawsocket"
+        self.capture_kwargs["fanout_group"] = fanout_group if fanout_group is not None else os.getpid() & 0xFFFF
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[multiprocessing.process.BaseProcess] = []
+        self._connections: List[Connection] = []
+        self._locks: List[threading.Lock] = []
+
+    def start(self) -> None:
+        if self._processes:
+            return
+        for index in range(self.shards):
+            parent_conn, child_conn = self._context.Pipe()
+            process = self._context.Process(
+                target=_shard_main,
+                args=(index, self.aggregator_kwargs, self.capture_kwargs, child_conn),
+                name=f"traffic-shard-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+            self._connections.append(parent_conn)
+            self._locks.append(threading.Lock())
+
+    def stop(self) -> None:
+        for conn, lock in zip(self._connections, self._locks):
+            with lock:
+                try:
+                    conn.send(("stop", {}))
+                except (BrokenPipeError, OSError):
+                    pass
+        for process in self._processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self._processes, self._connections, self._locks = [], [], []
+
+    def _call_all(self, method: str, **kwargs: Any) -> List[Any]:
+        # Envia a todos antes de ler, para que os shards respondam em paralelo
+        for lock in self._locks:
+            lock.acquire()
+        dead: List[int] = []
+        try:
+            sent = []
+            for index, conn in enumerate(self._connections):
+                try:
+                    conn.send((method, kwargs))
+                    sent.append(index)
+                except OSError:
+                    dead.append(index)
+            # Lê a resposta de todo shard que recebeu a chamada, para não deixar o pipe dessincronizado
+            replies = []
+            for index in sent:
+                try:
+                    replies.append(self._connections[index].recv())
+                except (EOFError, OSError):
+                    dead.append(index)
+        finally:
+            for lock in self._locks:
+                lock.release()
+
+        if dead:
+            LOGGER.error("Shard call %s failed: shard %d is not running", method, min(dead))
+            raise ShardUnavailable(min(dead))
+        results = []
+        for status, value in replies:
+            if status == "value_error":
+                raise ValueError(value)
+            if status != "ok":
+                raise RuntimeError(f"Shard call {method} failed: {value}")
+            results.append(value)
+        return results
+
+    def select_resolution(self, **kwargs: Any) -> int:
+        return self._call_all("select_resolution", **kwargs)[0]
+
+    def retained_since(self, resolution: Optional[int] = None) -> Optional[int]:
+        retained = [value for value in self._call_all("retained_since", resolution=resolution) if value is not None]
+        return min(retained) if retained else None
+
+    def summary_etag(self, **kwargs: Any) -> str:
+        digest = hashlib.blake2b("|".join(self._call_all("summary_etag", **kwargs)).encode(), digest_size=12)
+        return f'W/"{digest.hexdigest()}"'
+
+    def get_summary(self, **kwargs: Any) -> List[Dict[str, object]]:
+        totals: Dict[Tuple[int, str], List[int]] = {}
+        for rows in self._call_all("get_summary", **kwargs):
+            for row in rows:
+                entry = totals.setdefault((row["ts"], row["client_ip"]), [0, 0])
+                entry[0] += row["in_bytes"]
+                entry[1] += row["out_bytes"]
+        return [
+            {"ts": ts, "client_ip": client_ip, "in_bytes": in_bytes, "out_bytes": out_bytes}
+            for (ts, client_ip), (in_bytes, out_bytes) in sorted(totals.items(), key=lambda item: item[0][0])
+        ]
+
+    def get_drilldown(self, **kwargs: Any) -> Optional[Dict[str, object]]:
+        results = [result for result in self._call_all("get_drilldown", **kwargs) if result]
+        if not results:
+            return None
+        totals: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        for result in results:
+            for item in result["items"]:
+                entry = totals[item["protocol"]]
+                entry[0] += item["in_bytes"]
+                entry[1] += item["out_bytes"]
+        return {
+            "ts": results[0]["ts"],
+            "client_ip": results[0]["client_ip"],
+            "items": [
+                {"protocol": protocol, "in_bytes": in_bytes, "out_bytes": out_bytes}
+                for protocol, (in_bytes, out_bytes) in sorted(totals.items())
+            ],
+        }
+
+    def get_range_drilldown(self, **kwargs: Any) -> Dict[str, object]:
+        results = self._call_all("get_range_drilldown", **kwargs)
+
+        def merge(entries: List[Dict[str, object]]) -> Dict[str, object]:
+            protocols: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+            for entry in entries:
+                for item in entry["items"]:
+                    totals = protocols[item["protocol"]]
+                    totals[0] += item["in_bytes"]
+                    totals[1] += item["out_bytes"]
+            return {
+                "in_bytes": sum(entry["in_bytes"] for entry in entries),
+                "out_bytes": sum(entry["out_bytes"] for entry in entries),
+                "items": [
+                    {"protocol": protocol, "in_bytes": in_bytes, "out_bytes": out_bytes}
+                    for protocol, (in_bytes, out_bytes) in sorted(protocols.items())
+                ],
+            }
+
+        grouped: Dict[object, List[Dict[str, object]]] = defaultdict(list)
+        for result in results:
+            for group in result["groups"]:
+                grouped[group["key"]].append(group)
+        groups = [{"key": key, **merge(entries)} for key, entries in grouped.items()]
+        group_by = results[0]["group_by"]
+        if group_by == "bin":
+            groups.sort(key=lambda group: group["key"])
+        else:
+            groups.sort(key=lambda group: group["in_bytes"] + group["out_bytes"], reverse=True)
+        return {
+            "from_ts": min(result["from_ts"] for result in results),
+            "to_ts": max(result["to_ts"] for result in results),
+            "resolution": results[0]["resolution"],
+            "group_by": group_by,
+            **merge(results),
+            "groups": groups,
+        }
+
+    def get_series(self, **kwargs: Any) -> Dict[str, object]:
+        results = self._call_all("get_series", **kwargs)
+        # Cada shard alinha pelos próprios bins (heads diferentes); soma pela união dos timestamps
+        timeline = sorted({ts for result in results for ts in result["ts"]})
+        position = {ts: index for index, ts in enumerate(timeline)}
+        merged: List[Dict[str, object]] = []
+
+        def zeros() -> Dict[str, List[int]]:
+            return {"in_bytes": [0] * len(timeline), "out_bytes": [0] * len(timeline)}
+
+        for result in results:
+            offsets = [position[ts] for ts in result["ts"]]
+            for index, entry in enumerate(result["series"]):
+                if len(merged) <= index:
+                    merged.append({"client_ip": entry["client_ip"], **zeros()})
+                target = merged[index]
+                for key in ("in_bytes", "out_bytes"):
+                    for offset, value in zip(offsets, entry[key]):
+                        target[key][offset] += value
+                if "protocols" in entry:
+                    protocols = target.setdefault("protocols", {})
+                    for name, columns in entry["protocols"].items():
+                        totals = protocols.get(name) or protocols.setdefault(name, zeros())
+                        for key in ("in_bytes", "out_bytes"):
+                            for offset, value in zip(offsets, columns[key]):
+                                totals[key][offset] += value
+        resolution = results[0]["resolution"] if results else 0
+        return {"resolution": resolution, "ts": timeline, "series": merged}
+
+    def get_top(self, *, k: int, **kwargs: Any) -> List[Dict[str, object]]:
+        # Um cliente pode ficar abaixo do corte em cada shard e ainda liderar no total
+        totals: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        for items in self._call_all("get_top", k=k * self.shards, **kwargs):
+            for item in items:
+                entry = totals[item["client_ip"]]
+                entry[0] += item["bytes"]
+                entry[1] += item["error"]
+        ranked = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)[:k]
+        return [{"client_ip": client_ip, "bytes": count, "error": error} for client_ip, (count, error) in ranked]
+
+    def get_flows(self, *, limit: int = 1000, **kwargs: Any) -> List[Dict[str, object]]:
+        # O fanout distribui por hash de fluxo, então cada conexão vive em um único shard
+        flows = [flow for shard_flows in self._call_all("get_flows", limit=limit, **kwargs) for flow in shard_flows]
+        flows.sort(key=lambda flow: flow["bytes_in"] + flow["bytes_out"], reverse=True)
+        return flows[:limit]
@@ -0,0 +1,124 @@
+"""Bounded-memory streaming sketches for heavy-hitter queries."""
+
+from __future__ import annotations
+
+import heapq
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+
+class SpaceSaving:
+    """Weighted Space-Saving heavy-hitter summary with at most ``capacity`` keys.
+
+    Each tracked key keeps an overestimated count and the maximum error of
+    that estimate; keys whose true weight exceeds ``total / capacity`` are
+    guaranteed to be tracked. The minimum is found through a lazily
+    invalidated heap, so updates cost O(log capacity) amortized.
+    """
+
+    __slots__ = ("capacity", "counts", "errors", "_heap")
+
+    def __init__(self, capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.counts: Dict[Hashable, int] = {}
+        self.errors: Dict[Hashable, int] = {}
+        self._heap: List[Tuple[int, int, Hashable]] = []
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def clear(self) -> None:
+        self.counts.clear()
+        self.errors.clear()
+        self._heap.clear()
+
+    def update(self, key: Hashable, weight: int) -> None:
+        counts = self.counts
+        count = counts.get(key)
+        if count is not None:
+            count += weight
+        elif len(counts) < self.capacity:
+            count = weight
+            self.errors[key] = 0
+        else:
+            evicted, floor = self._pop_min()
+            del counts[evicted]
+            del self.errors[evicted]
+            count = floor + weight
+            self.errors[key] = floor
+        counts[key] = count
+        self._push(count, key)
+
+    def merge(self, other: "SpaceSaving") -> None:
+        """Fold another summary into this one, keeping the heaviest keys."""
+
+        combined = SpaceSaving.merged(self.capacity, (self, other))
+        self.counts, self.errors, self._heap = combined.counts, combined.errors, combined._heap
+
+    def top(self, k: int) -> List[Tuple[Hashable, int, int]]:
+        """Return up to ``k`` ``(key, count, error)`` tuples, heaviest first."""
+
+        ranked = heapq.nlargest(k, self.counts.items(), key=lambda item: item[1])
+        return [(key, count, self.errors[key]) for key, count in ranked]
+
+    @classmethod
+    def merged(cls, capacity: int, sketches: Iterable["SpaceSaving"]) -> "SpaceSaving":
+        """Combine summaries with the mergeable Space-Saving rule.
+
+        A full sketch may have evicted any key it does not track, so such a
+        key gets that sketch's minimum count added to both its count and its
+        error; counts stay upper bounds after the merge is cut back to
+        ``capacity`` keys.
+        """
+
+        result = cls(capacity)
+        merged: Dict[Hashable, int] = {}
+        errors: Dict[Hashable, int] = {}
+        # Soma dos mínimos dos sketches cheios, somada a toda chave; quem rastreia a chave desconta o seu
+        floor_total = 0
+        for sketch in sketches:
+            floor = sketch.floor()
+            floor_total += floor
+            sketch_errors = sketch.errors
+            for key, count in sketch.counts.items():
+                merged[key] = merged.get(key, 0) + count - floor
+                errors[key] = errors.get(key, 0) + sketch_errors[key] - floor
+        if floor_total:
+            merged = {key: count + floor_total for key, count in merged.items()}
+            errors = {key: error + floor_total for key, error in errors.items()}
+        result._rebuild(merged, errors)
+        return result
+
+    def floor(self) -> int:
+        """Upper bound on the weight of any untracked key: the minimum count once full, else 0."""
+
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def _rebuild(self, counts: Dict[Hashable, int], errors: Dict[Hashable, int]) -> None:
+        if len(counts) > self.capacity:
+            # As chaves cortadas ficam limitadas pelo mínimo das mantidas, o piso do sketch cheio
+            kept = heapq.nlargest(self.capacity, counts.items(), key=lambda item: item[1])
+            counts = dict(kept)
+        self.counts = counts
+        self.errors = {key: errors[key] for key in counts}
+        self._heap = [(count, id(key), key) for key, count in counts.items()]
+        heapq.heapify(self._heap)
+
+    def _push(self, count: int, key: Hashable) -> None:
+        heap = self._heap
+        heapq.heappush(heap, (count, id(key), key))
+        # Entradas obsoletas se acumulam no heap; recompacta quando passam do limite
+        if len(heap) > 4 * self.capacity:
+            self._heap = [(value, id(item), item) for item, value in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> Tuple[Hashable, int]:
+        heap = self._heap
+        counts = self.counts
+        while True:
+            count, _, key = heapq.heappop(heap)
+            if counts.get(key) == count:
+                return key, count
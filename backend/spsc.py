@@ -0,0 +1,109 @@
+"""Bounded single-producer/single-consumer ring between capture and aggregation."""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, List, Optional
+
+QUEUE_POLICIES = ("drop-newest", "drop-oldest", "block")
+
+
+class SpscRing:
+    """Fixed-capacity ring buffer for exactly one producer and one consumer thread.
+
+    The producer only advances ``_tail`` and the consumer only advances
+    ``_head``, so the common ``put`` needs no lock. ``drain`` takes every
+    pending item in one pass under ``_lock``; the producer takes the same
+    lock only when the ring is full and the policy is ``drop-oldest``. With
+    ``block`` the producer waits for space instead of dropping.
+    """
+
+    def __init__(self, capacity: int, policy: str = "drop-oldest") -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.enqueued = 0
+        self.dropped = 0
+        self.high_water = 0
+        self._slots: List[Any] = [None] * capacity
+        self._head = 0
+        self._tail = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Event()
+        self._not_full = threading.Event()
+
+    def __len__(self) -> int:
+        return self._tail - self._head
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def put(self, item: Any) -> bool:
+        """Append ``item``; returns ``False`` if it was dropped (full ring, ``drop-newest``, or closed)."""
+
+        if self._closed:
+            return False
+        if self._tail - self._head >= self.capacity:
+            if self.policy == "drop-newest":
+                self.dropped += 1
+                return False
+            if self.policy == "drop-oldest":
+                with self._lock:
+                    # O consumidor pode ter liberado espaço enquanto esperávamos o lock
+                    if self._tail - self._head >= self.capacity:
+                        self._slots[self._head % self.capacity] = None
+                        self._head += 1
+                        self.dropped += 1
+            else:
+                while self._tail - self._head >= self.capacity and not self._closed:
+                    self._not_full.clear()
+                    if self._tail - self._head >= self.capacity:
+                        self._not_full.wait(0.1)
+                if self._closed:
+                    return False
+
+        self._slots[self._tail % self.capacity] = item
+        self._tail += 1
+        self.enqueued += 1
+        depth = self._tail - self._head
+        if depth > self.high_water:
+            self.high_water = depth
+        if not self._not_empty.is_set():
+            self._not_empty.set()
+        return True
+
+    def drain(self, timeout: Optional[float] = None) -> List[Any]:
+        """Remove and return every pending item, waiting up to ``timeout`` if the ring is empty."""
+
+        if self._tail == self._head and timeout != 0:
+            self._not_empty.clear()
+            if self._tail == self._head:
+                self._not_empty.wait(timeout)
+
+        with self._lock:
+            head, tail = self._head, self._tail
+            if head == tail:
+                return []
+            slots, capacity = self._slots, self.capacity
+            items = []
+            for index in range(head, tail):
+                slot = index % capacity
+                items.append(slots[slot])
+                slots[slot] = None
+            self._head = tail
+
+        if not self._not_full.is_set():
+            self._not_full.set()
+        return items
+
+    def close(self) -> None:
+        """Reject further puts and wake a waiting consumer or producer."""
+
+        self._closed = True
+        self._not_empty.set()
+        self._not_full.set()
@@ -0,0 +1,144 @@
+"""Push closed aggregation windows to streaming subscribers."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Dict, FrozenSet, List, Optional, Set
+
+from aggregator import TrafficAggregator
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Bounded per-viewer queue that drops the oldest frame when full."""
+
+    def __init__(
+        self,
+        *,
+        clients: Optional[FrozenSet[str]] = None,
+        protocols: Optional[FrozenSet[str]] = None,
+        max_queue: int = 32,
+    ) -> None:
+        self.clients = clients
+        self.protocols = protocols
+        self.dropped = 0
+        self._queue: "asyncio.Queue[Dict[str, object]]" = asyncio.Queue(maxsize=max_queue)
+
+    def offer(self, payload: Dict[str, object]) -> None:
+        frame = self._filter(payload)
+        if frame is None:
+            return
+        if self._queue.full():
+            # Consumidor lento: descarta o quadro mais antigo em vez de crescer a fila
+            self._queue.get_nowait()
+            self.dropped += 1
+        frame["dropped"] = self.dropped
+        self._queue.put_nowait(frame)
+
+    async def next(self) -> Dict[str, object]:
+        return await self._queue.get()
+
+    def _filter(self, payload: Dict[str, object]) -> Optional[Dict[str, object]]:
+        clients: List[Dict[str, object]] = []
+        for entry in payload["clients"]:  # type: ignore[union-attr]
+            if self.clients is not None and entry["client_ip"] not in self.clients:
+                continue
+            protocols: Dict[str, Dict[str, int]] = entry["protocols"]
+            if self.protocols is None:
+                in_bytes, out_bytes = entry["in_bytes"], entry["out_bytes"]
+            else:
+                protocols = {name: totals for name, totals in protocols.items() if name in self.protocols}
+                if not protocols:
+                    continue
+                in_bytes = sum(totals["in_bytes"] for totals in protocols.values())
+                out_bytes = sum(totals["out_bytes"] for totals in protocols.values())
+            clients.append(
+                {
+                    "client_ip": entry["client_ip"],
+                    "in_bytes": in_bytes,
+                    "out_bytes": out_bytes,
+                    "protocols": protocols,
+                }
+            )
+
+        if not clients and (self.clients is not None or self.protocols is not None):
+            return None
+        return {"ts": payload["ts"], "clients": clients}
+
+
+class WindowBroadcaster:
+    """Fan out each closed window to every subscriber exactly once."""
+
+    def __init__(self, aggregator: TrafficAggregator, *, max_queue: int = 32, tick_seconds: float = 1.0) -> None:
+        self.aggregator = aggregator
+        self.max_queue = max_queue
+        self.tick_seconds = tick_seconds
+        self._subscribers: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self.aggregator.add_window_listener(self._on_window_closed)
+        self._task = asyncio.create_task(self._tick())
+
+    async def stop(self) -> None:
+        self.aggregator.remove_window_listener(self._on_window_closed)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def subscribe(
+        self,
+        *,
+        clients: Optional[FrozenSet[str]] = None,
+        protocols: Optional[FrozenSet[str]] = None,
+    ) -> Subscription:
+        subscription = Subscription(clients=clients, protocols=protocols, max_queue=self.max_queue)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def _on_window_closed(self, payload: Dict[str, object]) -> None:
+        # Chamado pela thread de captura; a entrega acontece no event loop
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._publish, payload)
+
+    def _publish(self, payload: Dict[str, object]) -> None:
+        for subscription in list(self._subscribers):
+            subscription.offer(payload)
+
+    async def _tick(self) -> None:
+        # Fecha janelas pelo relógio quando não chegam pacotes novos
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # Fora do event loop: espera o lock de ingestão e roda os listeners de janela
+                await loop.run_in_executor(None, self.aggregator.close_windows, time.time())
+            except Exception as exc:  # noqa: BLE001
+                LOGGER.exception("Failed to close windows: %s", exc)
+            await asyncio.sleep(self.tick_seconds)
+
+
+def parse_filter(raw: Optional[str], *, upper: bool = False) -> Optional[FrozenSet[str]]:
+    """Parse a comma separated query parameter into a filter set."""
+
+    if not raw:
+        return None
+    values = [value.strip() for value in raw.split(",") if value.strip()]
+    if upper:
+        values = [value.upper() for value in values]
+    return frozenset(values) or None
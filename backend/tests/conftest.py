@@ -0,0 +1,8 @@
+"""Shared pytest configuration for backend tests."""
+
+import sys
+from pathlib import Path
+
+# Os módulos do backend importam uns aos outros pelo nome (``from aggregator import ...``),
+# como no container, onde o diretório backend é o /app.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
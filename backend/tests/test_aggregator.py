@@ -1,17 +1,25 @@
 """Unit tests for the traffic aggregator."""
 
+import threading
 import time
 
-from backend.aggregator import TrafficAggregator
+import pytest
 
+from backend.aggregator import TrafficAggregator, parse_rollup_tiers
 
-def make_aggregator(window: int = 5, retention: int = 300) -> TrafficAggregator:
-    return TrafficAggregator(server_ip="10.50.0.10", window_seconds=window, retention_seconds=retention)
+
+def make_aggregator(window: int = 5, retention: int = 300, tiers=()) -> TrafficAggregator:
+    return TrafficAggregator(
+        server_ip="10.50.0.10",
+        window_seconds=window,
+        retention_seconds=retention,
+        rollup_tiers=tiers,
+    )
 
 
 def test_packets_are_binned_by_window_seconds() -> None:
     aggregator = make_aggregator(window=10)
-    base_ts = time.time()
+    base_ts = float(int(time.time()) // 10 * 10)
 
     aggregator.add_packet(
         timestamp=base_ts,
@@ -108,3 +116,378 @@ def test_garbage_collection_removes_old_bins() -> None:
     summary = aggregator.get_summary()
     assert all(entry["ts"] >= now_ts - 5 for entry in summary)
 
+
+
+def test_add_packets_merges_batch_like_add_packet() -> None:
+    batched = make_aggregator()
+    single = make_aggregator()
+    ts = int(time.time())
+    packets = [
+        (ts, "192.168.0.50", "10.50.0.10", 100, "http"),
+        (ts, "10.50.0.10", "192.168.0.50", 40, "HTTP"),
+        (ts, "192.168.0.50", "10.50.0.10", 60, "FTP"),
+        (ts, "192.168.0.51", "10.50.0.10", 10, ""),
+        (ts, "192.168.0.52", "192.168.0.53", 999, "UDP"),
+    ]
+
+    accepted = batched.add_packets(*[list(column) for column in zip(*packets)])
+    for timestamp, src_ip, dst_ip, length, protocol in packets:
+        single.add_packet(timestamp=timestamp, src_ip=src_ip, dst_ip=dst_ip, length=length, protocol=protocol)
+
+    assert accepted == 4
+    assert batched.get_summary() == single.get_summary()
+    ts_bin = batched.get_summary()[0]["ts"]
+    assert batched.get_drilldown(ts=ts_bin, client_ip="192.168.0.50") == single.get_drilldown(
+        ts=ts_bin, client_ip="192.168.0.50"
+    )
+
+
+def test_add_packets_rejects_mismatched_columns() -> None:
+    aggregator = make_aggregator()
+
+    with pytest.raises(ValueError):
+        aggregator.add_packets([1.0, 2.0], ["a"], ["b"], [1], ["TCP"])
+
+
+def test_ring_slots_are_recycled_when_head_advances() -> None:
+    aggregator = make_aggregator(window=5, retention=10)
+    base_ts = int(time.time()) // 5 * 5 - 60
+
+    aggregator.add_packet(timestamp=base_ts, src_ip="192.168.0.60", dst_ip="10.50.0.10", length=10, protocol="TCP")
+    # Mesmo slot do anel, uma volta completa depois
+    wrapped_ts = base_ts + 5 * aggregator._base.n_slots
+    aggregator.add_packet(timestamp=wrapped_ts, src_ip="192.168.0.61", dst_ip="10.50.0.10", length=20, protocol="TCP")
+    # Pacote atrasado além da retenção é descartado sem reabrir o slot
+    aggregator.add_packet(timestamp=base_ts, src_ip="192.168.0.62", dst_ip="10.50.0.10", length=30, protocol="TCP")
+
+    summary = aggregator.get_summary(from_ts=base_ts, to_ts=wrapped_ts)
+    assert [(entry["ts"], entry["client_ip"]) for entry in summary] == [(wrapped_ts, "192.168.0.61")]
+    assert aggregator.get_drilldown(ts=base_ts, client_ip="192.168.0.60") is None
+
+
+def test_summary_since_and_etag_track_changes() -> None:
+    aggregator = make_aggregator(window=5, retention=60)
+    base_ts = int(time.time()) // 5 * 5 - 20
+
+    aggregator.add_packet(timestamp=base_ts, src_ip="192.168.0.70", dst_ip="10.50.0.10", length=10, protocol="TCP")
+    aggregator.add_packet(timestamp=base_ts + 5, src_ip="192.168.0.70", dst_ip="10.50.0.10", length=20, protocol="TCP")
+    query = {"from_ts": base_ts - 5, "to_ts": base_ts + 10}
+
+    etag = aggregator.summary_etag(**query)
+    assert etag == aggregator.summary_etag(**query)
+    assert [entry["ts"] for entry in aggregator.get_summary(**query, since=base_ts + 5)] == [base_ts + 5]
+
+    # Escrita tardia numa janela fechada invalida o cache e o ETag
+    aggregator.get_summary(**query)
+    aggregator.add_packet(timestamp=base_ts, src_ip="192.168.0.70", dst_ip="10.50.0.10", length=5, protocol="TCP")
+
+    assert aggregator.summary_etag(**query) != etag
+    assert aggregator.get_summary(**query)[0]["in_bytes"] == 15
+
+
+def test_window_listeners_receive_each_closed_window_once() -> None:
+    aggregator = make_aggregator(window=5, retention=60)
+    base_ts = int(time.time()) // 5 * 5 - 30
+    closed = []
+    aggregator.add_window_listener(closed.append)
+
+    aggregator.add_packet(timestamp=base_ts, src_ip="192.168.0.80", dst_ip="10.50.0.10", length=10, protocol="HTTP")
+    aggregator.add_packet(timestamp=base_ts + 1, src_ip="10.50.0.10", dst_ip="192.168.0.80", length=4, protocol="DNS")
+    assert closed == []
+
+    aggregator.add_packet(timestamp=base_ts + 5, src_ip="192.168.0.81", dst_ip="10.50.0.10", length=20, protocol="TCP")
+    assert [payload["ts"] for payload in closed] == [base_ts]
+    client = closed[0]["clients"][0]
+    assert client["client_ip"] == "192.168.0.80"
+    assert (client["in_bytes"], client["out_bytes"]) == (10, 4)
+    assert client["protocols"]["DNS"] == {"in_bytes": 0, "out_bytes": 4}
+
+    # O relógio fecha a janela aberta; chamadas repetidas não reenviam janelas
+    assert aggregator.close_windows(now=base_ts + 20) == 1
+    assert aggregator.close_windows(now=base_ts + 20) == 0
+    assert [payload["ts"] for payload in closed] == [base_ts, base_ts + 5]
+
+
+
+def test_windows_closed_by_two_threads_reach_listeners_in_order() -> None:
+    aggregator = make_aggregator(window=5, retention=60)
+    base_ts = int(time.time()) // 5 * 5 - 40
+    client = {"src_ip": "192.168.0.80", "dst_ip": "10.50.0.10", "protocol": "HTTP"}
+    aggregator.add_packet(timestamp=base_ts, length=10, **client)
+    delivered = []
+
+    def ingest() -> None:
+        for offset in (5, 10, 15):
+            aggregator.add_packet(timestamp=base_ts + offset, length=10, **client)
+
+    ingest_thread = threading.Thread(target=ingest)
+
+    def slow_listener(payload) -> None:
+        if not delivered:
+            # A ingestão fecha janelas mais novas enquanto o tick ainda entrega a primeira
+            ingest_thread.start()
+            time.sleep(0.2)
+        delivered.append(payload["ts"])
+
+    aggregator.add_window_listener(slow_listener)
+    assert aggregator.close_windows(now=base_ts + 7) == 1
+    ingest_thread.join(timeout=2)
+
+    assert delivered == [base_ts, base_ts + 5, base_ts + 10]
+
+
+
+def test_ids_of_clients_gone_from_every_window_are_reused(monkeypatch) -> None:
+    monkeypatch.setattr("backend.aggregator._CLIENT_SWEEP_MIN", 8)
+    monkeypatch.setattr("backend.aggregator._CLIENT_QUARANTINE_SECONDS", 0.0)
+    aggregator = make_aggregator(window=5, retention=10)
+    base_ts = int(time.time()) // 5 * 5 - 800
+
+    # 10 clientes novos por janela (800 no total); a retenção guarda só as últimas
+    for window in range(80):
+        for client in range(10):
+            aggregator.add_packet(
+                timestamp=base_ts + 5 * window,
+                src_ip=f"192.168.{window}.{client + 1}",
+                dst_ip="10.50.0.10",
+                length=10,
+                protocol="HTTP",
+            )
+
+    # Ids vivos, em quarentena e livres: algumas vezes os ~40 clientes retidos
+    assert len(aggregator._client_names) < 150
+    assert len(aggregator._client_ids) < 100
+    last_ts = base_ts + 5 * 79
+    rows = aggregator.get_summary(from_ts=last_ts, to_ts=last_ts)
+    assert sorted(row["client_ip"] for row in rows) == sorted(f"192.168.79.{client + 1}" for client in range(10))
+
+def test_closed_windows_fold_into_rollup_tiers() -> None:
+    aggregator = make_aggregator(window=5, retention=20, tiers=[(60, 3600)])
+    base_ts = int(time.time()) // 60 * 60 - 600
+
+    for offset in (0, 5, 30, 55):
+        aggregator.add_packet(
+            timestamp=base_ts + offset,
+            src_ip="192.168.0.90",
+            dst_ip="10.50.0.10",
+            length=10,
+            protocol="HTTP",
+        )
+    aggregator.add_packet(timestamp=base_ts + 60, src_ip="10.50.0.10", dst_ip="192.168.0.90", length=7, protocol="FTP")
+    aggregator.close_windows(now=base_ts + 120)
+
+    # Fora da retenção base, o tier de 1 minuto é escolhido automaticamente
+    assert aggregator.select_resolution(from_ts=base_ts) == 60
+    summary = aggregator.get_summary(from_ts=base_ts, to_ts=base_ts + 60)
+    assert [(entry["ts"], entry["in_bytes"], entry["out_bytes"]) for entry in summary] == [
+        (base_ts, 40, 0),
+        (base_ts + 60, 0, 7),
+    ]
+    drilldown = aggregator.get_drilldown(ts=base_ts + 60, client_ip="192.168.0.90", resolution=60)
+    assert drilldown["items"] == [{"protocol": "FTP", "in_bytes": 0, "out_bytes": 7}]
+
+    with pytest.raises(ValueError):
+        aggregator.get_summary(resolution=30)
+
+
+def test_parse_rollup_tiers() -> None:
+    assert parse_rollup_tiers("60:86400, 900:2592000") == [(60, 86400), (900, 2592000)]
+    assert parse_rollup_tiers("") == []
+    with pytest.raises(ValueError):
+        parse_rollup_tiers("60")
+
+
+def test_top_talkers_and_per_window_client_cap() -> None:
+    aggregator = TrafficAggregator(
+        server_ip="10.50.0.10",
+        window_seconds=5,
+        retention_seconds=60,
+        topk_capacity=8,
+        max_clients_per_window=2,
+    )
+    base_ts = int(time.time()) // 5 * 5 - 20
+    for index, length in enumerate((500, 300, 20, 10, 5)):
+        aggregator.add_packet(
+            timestamp=base_ts,
+            src_ip=f"192.168.1.{index}",
+            dst_ip="10.50.0.10",
+            length=length,
+            protocol="TCP",
+        )
+    aggregator.add_packet(timestamp=base_ts + 5, src_ip="10.50.0.10", dst_ip="192.168.1.1", length=400, protocol="TCP")
+    query = {"from_ts": base_ts, "to_ts": base_ts + 5}
+
+    top = aggregator.get_top(k=2, by="total", **query)
+    assert [(item["client_ip"], item["bytes"]) for item in top] == [("192.168.1.1", 700), ("192.168.1.0", 500)]
+    assert aggregator.get_top(k=1, by="in", **query)[0]["client_ip"] == "192.168.1.0"
+
+    # A janela fechada guarda os 2 maiores clientes e soma o resto em "other"
+    closed = {entry["client_ip"]: entry["in_bytes"] for entry in aggregator.get_summary(from_ts=base_ts, to_ts=base_ts)}
+    assert closed == {"192.168.1.0": 500, "192.168.1.1": 300, "other": 35}
+    with pytest.raises(ValueError):
+        aggregator.get_top(k=1, by="bogus")
+
+
+def test_late_packet_copies_closed_window_instead_of_mutating_snapshot() -> None:
+    aggregator = make_aggregator(window=5)
+    base_ts = float(int(time.time()) // 5 * 5) - 10
+    aggregator.add_packet(timestamp=base_ts, src_ip="192.168.0.1", dst_ip="10.50.0.10", length=100, protocol="HTTP")
+    aggregator.add_packet(timestamp=base_ts + 5, src_ip="192.168.0.1", dst_ip="10.50.0.10", length=1, protocol="HTTP")
+    before = aggregator._snapshot
+    closed = before.readable(0, aggregator._base, int(base_ts), 0)
+    assert closed is not None
+
+    aggregator.add_packet(timestamp=base_ts, src_ip="192.168.0.1", dst_ip="10.50.0.10", length=50, protocol="DNS")
+    aggregator.add_packet(timestamp=base_ts, src_ip="192.168.0.1", dst_ip="10.50.0.10", length=25, protocol="DNS")
+
+    assert closed.counters[0] == 100
+    # Escritas tardias só marcam o snapshot; a próxima leitura o republica uma vez
+    assert aggregator._snapshot is before
+    summary = aggregator.get_summary(from_ts=int(base_ts), to_ts=int(base_ts))
+    assert summary[0]["in_bytes"] == 175
+    after = aggregator._snapshot
+    assert after is not before
+    aggregator.get_summary(from_ts=int(base_ts), to_ts=int(base_ts))
+    assert aggregator._snapshot is after
+
+
+def test_series_is_dense_and_zero_filled_across_closed_and_open_bins() -> None:
+    aggregator = make_aggregator(window=5)
+    base = int(time.time()) // 5 * 5 - 20
+    aggregator.add_packets(
+        [base, base + 10, base + 20, base + 20],
+        ["192.168.0.10", "192.168.0.10", "192.168.0.11", "10.50.0.10"],
+        ["10.50.0.10", "10.50.0.10", "10.50.0.10", "192.168.0.10"],
+        [100, 40, 7, 60],
+        ["HTTP", "DNS", "HTTP", "HTTP"],
+    )
+
+    result = aggregator.get_series(client_ips=["192.168.0.10", "10.9.9.9"], from_ts=base, to_ts=base + 20, protocols=True)
+
+    assert result["resolution"] == 5
+    assert result["ts"] == [base, base + 5, base + 10, base + 15, base + 20]
+    client, unknown = result["series"]
+    assert client["in_bytes"] == [100, 0, 40, 0, 0]
+    assert client["out_bytes"] == [0, 0, 0, 0, 60]
+    assert client["protocols"] == {
+        "DNS": {"in_bytes": [0, 0, 40, 0, 0], "out_bytes": [0, 0, 0, 0, 0]},
+        "HTTP": {"in_bytes": [100, 0, 0, 0, 0], "out_bytes": [0, 0, 0, 0, 60]},
+    }
+    assert unknown["in_bytes"] == [0] * 5 and unknown["protocols"] == {}
+    assert "protocols" not in aggregator.get_series(client_ips=["192.168.0.10"], from_ts=base)["series"][0]
+
+
+def test_range_drilldown_sums_protocols_over_bins_and_clients() -> None:
+    aggregator = make_aggregator(window=5)
+    base = int(time.time()) // 5 * 5 - 20
+    aggregator.add_packets(
+        [base, base + 5, base + 10, base + 20],
+        ["192.168.0.10", "192.168.0.11", "192.168.0.10", "192.168.0.11"],
+        ["10.50.0.10"] * 4,
+        [100, 40, 7, 3],
+        ["HTTP", "DNS", "DNS", "HTTP"],
+    )
+
+    everyone = aggregator.get_range_drilldown(from_ts=base, to_ts=base + 20)
+    assert (everyone["in_bytes"], everyone["groups"]) == (150, [])
+    assert {item["protocol"]: item["in_bytes"] for item in everyone["items"]} == {"DNS": 47, "HTTP": 103}
+    listed = aggregator.get_range_drilldown(from_ts=base, to_ts=base + 20, client_ips=["192.168.0.10", "192.168.0.11"])
+    assert listed["items"] == everyone["items"]
+
+    one = aggregator.get_range_drilldown(from_ts=base, to_ts=base + 10, client_ips=["192.168.0.10", "10.9.9.9"])
+    assert {item["protocol"]: item["in_bytes"] for item in one["items"]} == {"DNS": 7, "HTTP": 100}
+
+    by_client = aggregator.get_range_drilldown(from_ts=base, to_ts=base + 20, group_by="client")
+    assert [(group["key"], group["in_bytes"]) for group in by_client["groups"]] == [
+        ("192.168.0.10", 107),
+        ("192.168.0.11", 43),
+    ]
+    by_bin = aggregator.get_range_drilldown(from_ts=base + 5, to_ts=base + 20, group_by="bin", client_ips=["192.168.0.11"])
+    assert [(group["key"], group["in_bytes"]) for group in by_bin["groups"]] == [(base + 5, 40), (base + 20, 3)]
+    with pytest.raises(ValueError):
+        aggregator.get_range_drilldown(group_by="asn")
+
+
+def test_range_drilldown_prefix_sums_follow_late_packets() -> None:
+    aggregator = make_aggregator(window=5)
+    base = int(time.time()) // 5 * 5 - 20
+    aggregator.add_packets([base, base + 20], ["192.168.0.10"] * 2, ["10.50.0.10"] * 2, [10, 1], ["HTTP", "HTTP"])
+    assert aggregator.get_range_drilldown(from_ts=base, to_ts=base + 5)["in_bytes"] == 10
+
+    # Pacote atrasado em janela já fechada: a cópia publicada não herda os totais em cache
+    aggregator.add_packet(timestamp=base + 1, src_ip="192.168.0.12", dst_ip="10.50.0.10", length=5, protocol="DNS")
+    result = aggregator.get_range_drilldown(from_ts=base, to_ts=base + 5)
+    assert result["in_bytes"] == 15
+    assert {item["protocol"]: item["in_bytes"] for item in result["items"]} == {"DNS": 5, "HTTP": 10}
+
+
+def test_late_packets_reach_the_rollup_tiers() -> None:
+    aggregator = make_aggregator(window=5, retention=300, tiers=[(60, 3600), (900, 86400)])
+    base = int(time.time()) // 900 * 900 - 900
+    client = {"src_ip": "192.168.0.10", "dst_ip": "10.50.0.10", "protocol": "HTTP"}
+
+    aggregator.add_packet(timestamp=base, length=100, **client)
+    aggregator.add_packet(timestamp=base + 7, length=10, **client)
+    aggregator.add_packet(timestamp=base + 2, length=1000, **client)
+    aggregator.add_packets([base + 3], ["192.168.0.11"], ["10.50.0.10"], [5], ["DNS"])
+    aggregator.close_windows(now=base + 120)
+
+    for resolution in (5, 60, 900):
+        rows = aggregator.get_summary(from_ts=base, to_ts=base + 59, resolution=resolution)
+        assert sum(row["in_bytes"] for row in rows) == 1115, resolution
+    drilldown = aggregator.get_drilldown(ts=base, client_ip="192.168.0.11", resolution=900)
+    assert drilldown["items"] == [{"protocol": "DNS", "in_bytes": 5, "out_bytes": 0}]
+
+
+def test_etag_of_closed_range_ignores_packets_elsewhere() -> None:
+    aggregator = make_aggregator(window=5, retention=300, tiers=[(60, 3600)])
+    now = int(time.time()) // 5 * 5
+    client = {"src_ip": "192.168.0.70", "dst_ip": "10.50.0.10", "protocol": "TCP"}
+    aggregator.add_packet(timestamp=now - 30, length=10, **client)
+    aggregator.add_packet(timestamp=now - 5, length=10, **client)
+    closed = {"from_ts": now - 30, "to_ts": now - 10}
+    live = {"from_ts": now - 30, "to_ts": now + 5}
+    etags = aggregator.summary_etag(**closed), aggregator.summary_etag(**live)
+
+    aggregator.add_packet(timestamp=now - 5, length=10, **client)
+    aggregator.add_packet(timestamp=now, length=10, **client)
+
+    assert aggregator.summary_etag(**closed) == etags[0]
+    assert aggregator.summary_etag(**live) != etags[1]
+
+    # Escrita tardia dentro do intervalo fechado muda o ETag
+    aggregator.add_packet(timestamp=now - 25, length=10, **client)
+    assert aggregator.summary_etag(**closed) != etags[0]
+
+
+def test_far_future_packet_does_not_push_out_current_traffic() -> None:
+    aggregator = make_aggregator(window=5, retention=60)
+    now = int(time.time()) // 5 * 5
+    client = {"src_ip": "192.168.0.10", "dst_ip": "10.50.0.10", "protocol": "TCP"}
+
+    aggregator.add_packet(timestamp=now + 86400, length=999, **client)
+    aggregator.add_packets([now, now + 86400], ["192.168.0.10"] * 2, ["10.50.0.10"] * 2, [10, 999], ["TCP"] * 2)
+    aggregator.add_packet(timestamp=now, length=5, **client)
+
+    assert [row["in_bytes"] for row in aggregator.get_summary(from_ts=now - 5)] == [15]
+    assert aggregator.future_packets == 2
+
+    replay = TrafficAggregator(server_ip="10.50.0.10", window_seconds=5, retention_seconds=60, accept_future=True)
+    replay.add_packet(timestamp=now + 600, length=10, **client)
+    assert replay.future_packets == 0
+
+
+def test_rollup_windows_keep_only_their_heaviest_clients() -> None:
+    aggregator = TrafficAggregator(
+        server_ip="10.50.0.10", window_seconds=5, retention_seconds=300, rollup_tiers=[(60, 3600)], rollup_max_clients=2
+    )
+    base = int(time.time()) // 60 * 60 - 120
+    for index, length in enumerate((500, 300, 20, 10)):
+        aggregator.add_packet(timestamp=base, src_ip=f"192.168.1.{index}", dst_ip="10.50.0.10", length=length, protocol="TCP")
+    aggregator.close_windows(now=base + 60)
+    aggregator.add_packet(timestamp=base + 1, src_ip="192.168.1.9", dst_ip="10.50.0.10", length=7, protocol="TCP")
+
+    # O tier base continua exato; o rollup guarda 2 clientes e soma o resto em "other"
+    assert len(aggregator.get_summary(from_ts=base, to_ts=base, resolution=5)) == 5
+    rolled = {row["client_ip"]: row["in_bytes"] for row in aggregator.get_summary(from_ts=base, to_ts=base, resolution=60)}
+    assert rolled == {"192.168.1.0": 500, "192.168.1.1": 300, "other": 37}
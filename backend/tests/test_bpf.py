@@ -0,0 +1,168 @@
+"""Tests for the generated kernel capture filters, run on a small classic BPF interpreter."""
+
+import socket
+import struct
+from typing import List, Tuple
+
+import pytest
+
+from backend.bpf import (
+    BPF_ABS,
+    BPF_ALU,
+    BPF_AND,
+    BPF_B,
+    BPF_H,
+    BPF_IND,
+    BPF_JA,
+    BPF_JEQ,
+    BPF_JGE,
+    BPF_JGT,
+    BPF_JMP,
+    BPF_LD,
+    BPF_LDX,
+    BPF_MSH,
+    BPF_RET,
+    SKF_AD_OFF,
+    SKF_AD_PROTOCOL,
+    SKF_NET_OFF,
+    compile_filter,
+    filter_expression,
+)
+from backend.decoder import IPPROTO_ICMP, IPPROTO_TCP, IPPROTO_UDP
+
+SERVER = "10.50.0.10"
+PORTS = "tcp:80=HTTP,tcp:30000-30009=FTP,udp:53=DNS"
+_SIZES = {0x00: 4, BPF_H: 2, BPF_B: 1}
+
+
+def run(program: List[Tuple[int, int, int, int]], ethertype: int, network: bytes) -> int:
+    """Execute ``program`` on a packet whose network header starts at ``network``."""
+
+    def load(offset: int, size: int) -> int:
+        if offset == SKF_AD_OFF + SKF_AD_PROTOCOL:
+            return ethertype
+        assert offset >= SKF_NET_OFF and offset < 0
+        start = offset - SKF_NET_OFF
+        chunk = network[start : start + size]
+        if len(chunk) < size:
+            raise IndexError
+        return int.from_bytes(chunk, "big")
+
+    a = x = pc = 0
+    while True:
+        code, jt, jf, k = program[pc]
+        signed = k - (1 << 32) if k & 0x80000000 else k
+        pc += 1
+        cls = code & 0x07
+        try:
+            if cls == BPF_RET:
+                return k
+            if cls == BPF_LD and code & 0xE0 == BPF_ABS:
+                a = load(signed, _SIZES[code & 0x18])
+            elif cls == BPF_LD and code & 0xE0 == BPF_IND:
+                a = load(signed + x, _SIZES[code & 0x18])
+            elif cls == BPF_LDX and code & 0xE0 == BPF_MSH:
+                x = (load(signed, 1) & 0x0F) * 4
+            elif cls == BPF_ALU and code & 0xF0 == BPF_AND:
+                a &= k
+            elif cls == BPF_JMP:
+                op = code & 0xF0
+                if op == BPF_JA:
+                    pc += k
+                    continue
+                taken = {BPF_JEQ: a == k, BPF_JGT: a > k, BPF_JGE: a >= k}[op]
+                pc += jt if taken else jf
+            else:
+                raise AssertionError(f"unexpected opcode {code:#x}")
+        except IndexError:
+            # O kernel aborta o programa (descarta o pacote) em leituras fora do pacote
+            return 0
+
+
+def ipv4(src: str, dst: str, proto: int = IPPROTO_TCP, sport: int = 40000, dport: int = 80) -> Tuple[int, bytes]:
+    header = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 60, 0, 0, 64, proto, 0, socket.inet_aton(src), socket.inet_aton(dst))
+    return 0x0800, header + struct.pack("!HH", sport, dport) + b"\x00" * 36
+
+
+def ipv6(src: str, dst: str, proto: int = IPPROTO_TCP, sport: int = 40000, dport: int = 80) -> Tuple[int, bytes]:
+    header = struct.pack(
+        "!IHBB16s16s", 0x60000000, 40, proto, 64, socket.inet_pton(socket.AF_INET6, src), socket.inet_pton(socket.AF_INET6, dst)
+    )
+    return 0x86DD, header + struct.pack("!HH", sport, dport) + b"\x00" * 36
+
+
+def test_server_mode_keeps_only_server_traffic() -> None:
+    program = compile_filter(SERVER)
+
+    assert run(program, *ipv4("192.168.0.5", SERVER)) > 0
+    assert run(program, *ipv4(SERVER, "192.168.0.5")) > 0
+    assert run(program, *ipv4("192.168.0.5", "10.50.0.11")) == 0
+    assert run(program, 0x0806, b"\x00" * 28) == 0
+
+
+def test_server_mode_matches_prefixes_and_ipv6() -> None:
+    program = compile_filter("10.60.0.0/16,fd00::/64,2001:db8::1")
+
+    assert run(program, *ipv4("10.60.200.1", "192.168.0.5")) > 0
+    assert run(program, *ipv4("10.61.0.1", "192.168.0.5")) == 0
+    assert run(program, *ipv6("2001:db8:1::9", "fd00::abcd")) > 0
+    assert run(program, *ipv6("2001:db8::1", "2001:db8:1::9")) > 0
+    assert run(program, *ipv6("fd00:0:0:1::1", "2001:db8::2")) == 0
+
+
+def test_family_without_server_address_is_rejected() -> None:
+    program = compile_filter(SERVER)
+
+    assert run(program, *ipv6("2001:db8::1", "2001:db8::2")) == 0
+
+
+def test_ports_mode_requires_a_mapped_port() -> None:
+    program = compile_filter(SERVER, mode="ports", port_map=PORTS)
+
+    assert run(program, *ipv4("192.168.0.5", SERVER, dport=80)) > 0
+    assert run(program, *ipv4(SERVER, "192.168.0.5", sport=80, dport=51000)) > 0
+    assert run(program, *ipv4("192.168.0.5", SERVER, dport=30005)) > 0
+    assert run(program, *ipv4("192.168.0.5", SERVER, dport=30010)) == 0
+    assert run(program, *ipv4("192.168.0.5", SERVER, proto=IPPROTO_UDP, dport=53)) > 0
+    assert run(program, *ipv4("192.168.0.5", SERVER, proto=IPPROTO_UDP, dport=80)) == 0
+    assert run(program, *ipv4("192.168.0.5", SERVER, proto=IPPROTO_ICMP)) == 0
+    assert run(program, *ipv4("192.168.0.5", "10.0.0.1", dport=80)) == 0
+
+
+def test_ports_mode_reads_ports_after_ipv4_options() -> None:
+    program = compile_filter(SERVER, mode="ports", port_map=PORTS)
+    # IHL 6: 4 bytes de opções antes do cabeçalho TCP
+    options = struct.pack("!HH", 80, 80)
+    ethertype, network = ipv4("192.168.0.5", SERVER, dport=80)
+    assert run(program, ethertype, bytes([0x46]) + network[1:20] + b"\x01" * 4 + network[20:]) > 0
+
+    ethertype, network = ipv4("192.168.0.5", SERVER, sport=51000, dport=8080)
+    assert run(program, ethertype, bytes([0x46]) + network[1:20] + options + network[20:]) == 0
+
+
+def test_ports_mode_ipv6() -> None:
+    program = compile_filter("fd00::10", mode="ports", port_map=PORTS)
+
+    assert run(program, *ipv6("fd00::20", "fd00::10", dport=80)) > 0
+    assert run(program, *ipv6("fd00::20", "fd00::10", dport=8080)) == 0
+
+
+def test_snaplen_sets_the_accept_length() -> None:
+    assert run(compile_filter(SERVER, snaplen=96), *ipv4("192.168.0.5", SERVER)) == 96
+    assert run(compile_filter(SERVER, mode="off", snaplen=96), *ipv4("192.168.0.5", "10.0.0.1")) == 96
+    assert run(compile_filter(SERVER, mode="off"), *ipv4("192.168.0.5", "10.0.0.1")) > 0xFFFF
+
+
+def test_unknown_mode_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        compile_filter(SERVER, mode="everything")
+    with pytest.raises(ValueError):
+        filter_expression(SERVER, mode="everything")
+
+
+def test_filter_expression() -> None:
+    assert filter_expression(SERVER, mode="off") is None
+    assert filter_expression("10.50.0.10,10.60.0.0/16") == "(host 10.50.0.10 or net 10.60.0.0/16)"
+    assert filter_expression(SERVER, mode="ports", port_map=PORTS) == (
+        "(host 10.50.0.10) and (tcp port 80 or tcp portrange 30000-30009 or udp port 53)"
+    )
@@ -0,0 +1,75 @@
+"""Unit tests for the table-driven protocol classifier."""
+
+import itertools
+
+import pytest
+
+from backend.classifier import ProtocolClassifier, flow_key, parse_port_map
+from backend.decoder import IPPROTO_ICMP, IPPROTO_TCP, IPPROTO_UDP
+
+
+def legacy_by_ports(ip_proto: int, src_port: int, dst_port: int) -> str:
+    if ip_proto == IPPROTO_TCP:
+        if src_port in (20, 21) or dst_port in (20, 21) or 30000 <= src_port <= 30009 or 30000 <= dst_port <= 30009:
+            return "FTP"
+        for port, protocol in ((80, "HTTP"), (443, "HTTPS/TLS"), (53, "DNS")):
+            if port in (src_port, dst_port):
+                return protocol
+        return "TCP"
+    if ip_proto == IPPROTO_UDP:
+        return "DNS" if 53 in (src_port, dst_port) else "UDP"
+    if ip_proto == IPPROTO_ICMP:
+        return "ICMP"
+    return "OTHER"
+
+
+def test_default_table_matches_legacy_port_ladder() -> None:
+    classifier = ProtocolClassifier()
+    ports = (20, 21, 53, 80, 443, 8080, 29999, 30000, 30009, 30010, 51000)
+    for ip_proto in (IPPROTO_TCP, IPPROTO_UDP, IPPROTO_ICMP, 47):
+        for src_port, dst_port in itertools.product(ports, repeat=2):
+            assert classifier.classify_ports(ip_proto, src_port, dst_port) == legacy_by_ports(
+                ip_proto, src_port, dst_port
+            )
+
+
+def test_custom_port_map_and_invalid_rules() -> None:
+    classifier = ProtocolClassifier("tcp:8080=HTTP,udp:5353-5354=DNS")
+    assert classifier.classify_ports(IPPROTO_TCP, 40000, 8080) == "HTTP"
+    assert classifier.classify_ports(IPPROTO_UDP, 5354, 40000) == "DNS"
+    assert classifier.classify_ports(IPPROTO_TCP, 40000, 80) == "TCP"
+
+    for raw in ("sctp:80=HTTP", "tcp:80", "tcp:90-80=HTTP", "tcp:abc=HTTP"):
+        with pytest.raises(ValueError):
+            parse_port_map(raw)
+
+
+def test_flow_cache_skips_inspection_once_settled() -> None:
+    classifier = ProtocolClassifier(inspect_packets=2)
+    key = flow_key(IPPROTO_TCP, "192.168.0.1", 40000, "10.50.0.10", 8080)
+    assert key == flow_key(IPPROTO_TCP, "10.50.0.10", 8080, "192.168.0.1", 40000)
+    calls = []
+
+    def inspect_none():
+        calls.append(None)
+        return None
+
+    # Sem regra de porta: reinspeciona até inspect_packets pacotes, depois fixa o fallback
+    assert classifier.classify_flow(key, IPPROTO_TCP, 40000, 8080, inspect_none) == "TCP"
+    assert classifier.classify_flow(key, IPPROTO_TCP, 40000, 8080, inspect_none) == "TCP"
+    assert classifier.classify_flow(key, IPPROTO_TCP, 40000, 8080, lambda: "HTTP") == "TCP"
+    assert len(calls) == 2
+
+    other = flow_key(IPPROTO_TCP, "192.168.0.2", 40000, "10.50.0.10", 8080)
+    assert classifier.classify_flow(other, IPPROTO_TCP, 40000, 8080, inspect_none) == "TCP"
+    assert classifier.classify_flow(other, IPPROTO_TCP, 40000, 8080, lambda: "HTTP") == "HTTP"
+    assert classifier.classify_flow(other, IPPROTO_TCP, 40000, 8080, inspect_none) == "HTTP"
+    assert classifier.hits == 2
+
+
+def test_flow_cache_is_bounded_lru() -> None:
+    classifier = ProtocolClassifier(flow_cache_size=2)
+    for port in (1000, 1001, 1002):
+        classifier.classify_flow(("k", port), IPPROTO_TCP, port, 80)
+    assert len(classifier._flows) == 2
+    assert ("k", 1000) not in classifier._flows
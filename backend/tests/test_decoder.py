@@ -0,0 +1,85 @@
+"""Unit tests for the raw frame decoder."""
+
+import socket
+import struct
+
+from backend.decoder import IPPROTO_TCP, IPPROTO_UDP, decode_ethernet, decode_ip, wire_length
+
+
+def make_ipv4(src: str, dst: str, proto: int, transport: bytes) -> bytes:
+    header = struct.pack(
+        "!BBHHHBBH4s4s",
+        0x45,
+        0,
+        20 + len(transport),
+        0,
+        0,
+        64,
+        proto,
+        0,
+        socket.inet_aton(src),
+        socket.inet_aton(dst),
+    )
+    return header + transport
+
+
+def make_tcp(src_port: int, dst_port: int, flags: int = 0x18) -> bytes:
+    return struct.pack("!HHIIBBHHH", src_port, dst_port, 0, 0, 0x50, flags, 0, 0, 0)
+
+
+def make_ethernet(ethertype: int, payload: bytes) -> bytes:
+    return b"\x00" * 12 + struct.pack("!H", ethertype) + payload
+
+
+def test_decode_ethernet_ipv4_tcp() -> None:
+    frame = make_ethernet(0x0800, make_ipv4("192.168.0.10", "10.50.0.10", IPPROTO_TCP, make_tcp(40000, 80)))
+
+    decoded = decode_ethernet(frame)
+
+    assert decoded is not None
+    assert decoded.src_ip == "192.168.0.10"
+    assert decoded.dst_ip == "10.50.0.10"
+    assert decoded.ip_proto == IPPROTO_TCP
+    assert (decoded.src_port, decoded.dst_port) == (40000, 80)
+    assert decoded.tcp_flags == 0x18
+
+
+def test_decode_vlan_tagged_frame() -> None:
+    udp = struct.pack("!HHHH", 5353, 53, 8, 0)
+    inner = struct.pack("!HH", 10, 0x0800) + make_ipv4("10.0.0.1", "10.0.0.2", IPPROTO_UDP, udp)
+
+    decoded = decode_ethernet(make_ethernet(0x8100, inner))
+
+    assert decoded is not None
+    assert decoded.ip_proto == IPPROTO_UDP
+    assert decoded.dst_port == 53
+
+
+def test_decode_ipv6_with_extension_header() -> None:
+    hop_by_hop = bytes([IPPROTO_TCP, 0]) + b"\x00" * 6
+    payload = hop_by_hop + make_tcp(443, 51000)
+    header = struct.pack("!IHBB", 6 << 28, len(payload), 0, 64)
+    header += socket.inet_pton(socket.AF_INET6, "2001:db8::1")
+    header += socket.inet_pton(socket.AF_INET6, "2001:db8::2")
+
+    decoded = decode_ip(header + payload)
+
+    assert decoded is not None
+    assert decoded.src_ip == "2001:db8::1"
+    assert decoded.dst_ip == "2001:db8::2"
+    assert decoded.ip_proto == IPPROTO_TCP
+    assert decoded.src_port == 443
+
+
+def test_truncated_frames_are_rejected() -> None:
+    assert decode_ethernet(b"\x00" * 10) is None
+    assert decode_ethernet(make_ethernet(0x0800, b"\x45\x00")) is None
+    assert decode_ethernet(make_ethernet(0x0806, b"\x00" * 28)) is None
+
+
+def test_wire_length_recovers_truncated_frames() -> None:
+    packet = make_ipv4("192.168.0.10", "10.50.0.10", IPPROTO_TCP, make_tcp(40000, 80) + b"\x00" * 1000)
+
+    assert wire_length(make_ethernet(0x0800, packet)[:64], ethernet=True) == 14 + len(packet)
+    assert wire_length(packet[:40], ethernet=False) == len(packet)
+    assert wire_length(make_ethernet(0x0806, b"\x00" * 28), ethernet=True) is None
@@ -0,0 +1,140 @@
+"""Unit tests for the per-connection flow table."""
+
+import socket
+import struct
+import time
+
+from backend.aggregator import TrafficAggregator
+from backend.capture import CaptureService
+from backend.decoder import DecodedPacket
+from backend.flows import FlowTable
+
+SERVER = "10.50.0.10"
+
+
+def _classify(ip_proto: int, src_port: int, dst_port: int) -> str:
+    return "FTP" if 21 in (src_port, dst_port) else "TCP"
+
+
+def test_flow_counts_both_directions_and_classifies_once() -> None:
+    table = FlowTable(SERVER)
+    calls = []
+
+    def classify(ip_proto: int, src_port: int, dst_port: int) -> str:
+        calls.append((src_port, dst_port))
+        return _classify(ip_proto, src_port, dst_port)
+
+    assert table.observe(100.0, DecodedPacket("10.0.0.1", SERVER, 6, 40000, 21, 0x02), 60, classify) == "FTP"
+    assert table.observe(100.5, DecodedPacket(SERVER, "10.0.0.1", 6, 21, 40000, 0x12), 60, classify) == "FTP"
+    assert table.observe(101.0, DecodedPacket("10.0.0.1", SERVER, 6, 40000, 21, 0x10), 1500, classify) == "FTP"
+    assert table.observe(101.0, DecodedPacket("10.0.0.9", "10.0.0.8", 6, 1, 2, 0), 60, classify) is None
+    assert calls == [(40000, 21)]
+
+    (flow,) = table.get_flows(client_ip="10.0.0.1", from_ts=100, to_ts=105)
+    assert (flow["packets_in"], flow["packets_out"], flow["bytes_in"], flow["bytes_out"]) == (2, 1, 1560, 60)
+    assert (flow["first_seen"], flow["last_seen"], flow["tcp_flags"]) == (100.0, 101.0, 0x12)
+    assert not flow["closed"]
+    assert table.get_flows(client_ip="10.0.0.1", from_ts=105, to_ts=110) == []
+
+
+def test_flows_end_on_fin_idle_and_active_timeouts() -> None:
+    table = FlowTable(SERVER, idle_timeout=10, active_timeout=60, retention_seconds=1000)
+    table.observe(0.0, DecodedPacket("10.0.0.1", SERVER, 6, 40000, 80, 0x02), 60, _classify)
+    table.observe(1.0, DecodedPacket("10.0.0.1", SERVER, 6, 40000, 80, 0x04), 60, _classify)
+    assert len(table) == 0
+
+    table.observe(0.0, DecodedPacket("10.0.0.2", SERVER, 17, 5000, 53, 0), 80, _classify)
+    assert table.expire(20.0) == 1
+
+    for second in range(0, 100, 5):
+        table.observe(float(second), DecodedPacket("10.0.0.3", SERVER, 6, 40001, 80, 0x10), 100, _classify)
+    exported = table.get_flows(client_ip="10.0.0.3", from_ts=0, to_ts=100)
+    assert [flow["closed"] for flow in exported] == [True, False]
+    assert sum(flow["packets_in"] for flow in exported) == 20
+    assert table.exported == 3
+
+
+def test_table_evicts_least_recently_used_flow() -> None:
+    table = FlowTable(SERVER, max_flows=2)
+    for port in (1000, 1001):
+        table.observe(0.0, DecodedPacket("10.0.0.1", SERVER, 6, port, 80, 0), 60, _classify)
+    table.observe(1.0, DecodedPacket("10.0.0.1", SERVER, 6, 1000, 80, 0), 60, _classify)
+    table.observe(2.0, DecodedPacket("10.0.0.1", SERVER, 6, 1002, 80, 0), 60, _classify)
+
+    assert table.evicted == 1
+    flows = table.get_flows(client_ip="10.0.0.1", from_ts=0, to_ts=10)
+    assert {(flow["client_port"], flow["closed"]) for flow in flows} == {(1000, False), (1001, True), (1002, False)}
+
+
+
+def test_client_index_forgets_flows_dropped_from_the_table() -> None:
+    table = FlowTable(SERVER, max_flows=4, retention_seconds=50)
+    for client in range(10):
+        ip = f"10.0.1.{client}"
+        table.observe(float(client), DecodedPacket(ip, SERVER, 6, 40000, 80, 0x02), 60, _classify)
+        table.observe(float(client), DecodedPacket(ip, SERVER, 6, 40000, 80, 0x04), 60, _classify)
+
+    # Só os max_flows encerrados mais recentes continuam consultáveis
+    assert set(table._by_client) == {f"10.0.1.{client}" for client in range(6, 10)}
+    assert table.get_flows(client_ip="10.0.1.0", from_ts=0, to_ts=100) == []
+
+    table.observe(200.0, DecodedPacket("10.0.2.1", SERVER, 17, 5000, 53, 0), 80, _classify)
+    table.observe(201.0, DecodedPacket("10.0.2.1", SERVER, 17, 5000, 53, 0), 80, _classify)
+    assert table.expire(300.0) == 1
+    assert set(table._by_client) == {"10.0.2.1"}
+    (flow,) = table.get_flows(client_ip="10.0.2.1", from_ts=0, to_ts=400)
+    assert flow["closed"] and flow["packets_in"] == 2
+
+def test_capture_feeds_flow_table() -> None:
+    aggregator = TrafficAggregator(server_ip=SERVER, window_seconds=5, retention_seconds=300)
+    service = CaptureService(aggregator=aggregator, iface="any", flow_table_size=16)
+    frame = bytes(12) + b"\x08\x00" + _ipv4_tcp("10.0.0.1", SERVER, 40000, 21)
+    now = time.time()
+    service._process_frame(memoryview(frame), 200, 1, now)
+
+    (flow,) = service.flows.get_flows(client_ip="10.0.0.1", from_ts=now - 1, to_ts=now + 1)
+    assert (flow["protocol"], flow["bytes_in"], flow["server_port"]) == ("FTP", 200, 21)
+    assert service._batch.protocols == ["FTP"]
+
+
+def _ipv4_tcp(src: str, dst: str, src_port: int, dst_port: int) -> bytes:
+    header = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 40, 0, 0, 64, 6, 0, socket.inet_aton(src), socket.inet_aton(dst))
+    return header + struct.pack("!HHIIBBHHH", src_port, dst_port, 0, 0, 0x50, 0x18, 0, 0, 0)
+
+
+def test_tcp_connection_is_one_flow_through_handshake_and_teardown() -> None:
+    table = FlowTable(SERVER, retention_seconds=1000)
+    calls = []
+
+    def classify(ip_proto: int, src_port: int, dst_port: int) -> str:
+        calls.append((src_port, dst_port))
+        return _classify(ip_proto, src_port, dst_port)
+
+    client, server = ("10.0.0.1", 40000), (SERVER, 80)
+    exchange = [
+        (client, server, 0x02),  # SYN
+        (server, client, 0x12),  # SYN/ACK
+        (client, server, 0x10),  # ACK
+        (client, server, 0x18),  # dados
+        (server, client, 0x18),
+        (client, server, 0x11),  # FIN/ACK do cliente
+        (server, client, 0x11),  # FIN/ACK do servidor
+        (client, server, 0x10),  # ACK final
+    ]
+    for step, ((src_ip, src_port), (dst_ip, dst_port), flags) in enumerate(exchange):
+        table.observe(0.1 * step, DecodedPacket(src_ip, dst_ip, 6, src_port, dst_port, flags), 100, classify)
+    assert len(table) == 1
+
+    # Passado o tempo de espera do ACK final, o fluxo é encerrado
+    assert table.expire(5.0) == 1
+    (flow,) = table.get_flows(client_ip="10.0.0.1", from_ts=0, to_ts=10)
+    assert (flow["packets_in"], flow["packets_out"], flow["closed"]) == (5, 3, True)
+    assert calls == [(40000, 80)]
+
+    # Mesmas portas reutilizadas logo após o fechamento: novo fluxo
+    for second, flags in ((10.0, 0x01), (10.1, 0x01)):
+        table.observe(second, DecodedPacket("10.0.0.2", SERVER, 6, 40001, 80, flags), 60, _classify)
+        table.observe(second, DecodedPacket(SERVER, "10.0.0.2", 6, 80, 40001, flags), 60, _classify)
+    table.observe(10.2, DecodedPacket("10.0.0.2", SERVER, 6, 40001, 80, 0x02), 60, _classify)
+    flows = table.get_flows(client_ip="10.0.0.2", from_ts=0, to_ts=20)
+    assert sorted((flow["packets_in"], flow["closed"]) for flow in flows) == [(1, False), (2, True)]
@@ -0,0 +1,86 @@
+"""Unit tests for client grouping and grouped summaries."""
+
+import time
+
+import pytest
+
+from backend.aggregator import TrafficAggregator
+from backend.grouping import ClientGrouper, rollup_rows
+
+SERVER = "10.50.0.10"
+
+
+def _table(tmp_path) -> str:
+    path = tmp_path / "groups.csv"
+    path.write_text("prefix,group\n# escritório\n192.168.0.0/16,office\n192.168.7.0/24,lab\n2001:db8::/32,v6-users\n")
+    return str(path)
+
+
+def test_longest_prefix_wins_and_defaults_to_prefix(tmp_path) -> None:
+    grouper = ClientGrouper(_table(tmp_path))
+    group = grouper.key_function("group")
+    prefix = grouper.key_function("prefix")
+
+    assert group("192.168.7.20") == "lab"
+    assert group("192.168.8.20") == "office"
+    assert group("2001:db8:5::1") == "v6-users"
+    assert group("10.1.2.3") == "10.1.2.0/24"
+    assert prefix("2001:db9::1") == "2001:db9::/64"
+    assert prefix("other") == "other"
+    with pytest.raises(ValueError):
+        grouper.key_function("asn")
+
+
+def test_invalid_table_row_is_rejected(tmp_path) -> None:
+    path = tmp_path / "groups.csv"
+    path.write_text("10.0.0.0/8,ok\nnot-a-prefix,bad\n")
+    with pytest.raises(ValueError):
+        ClientGrouper(str(path))
+
+
+def test_rollup_rows_sums_per_bin_and_key() -> None:
+    rows = [
+        {"ts": 0, "client_ip": "10.0.0.1", "in_bytes": 1, "out_bytes": 2},
+        {"ts": 0, "client_ip": "10.0.0.2", "in_bytes": 3, "out_bytes": 4},
+        {"ts": 5, "client_ip": "10.0.0.1", "in_bytes": 5, "out_bytes": 6},
+    ]
+    key_of = ClientGrouper().key_function("prefix")
+    assert rollup_rows(rows, key_of) == [
+        {"ts": 0, "client_ip": "10.0.0.0/24", "in_bytes": 4, "out_bytes": 6},
+        {"ts": 5, "client_ip": "10.0.0.0/24", "in_bytes": 5, "out_bytes": 6},
+    ]
+
+
+def test_summary_group_by_matches_per_ip_totals(tmp_path) -> None:
+    aggregator = TrafficAggregator(
+        server_ip=SERVER, window_seconds=5, retention_seconds=300, client_groups=_table(tmp_path)
+    )
+    now = time.time()
+    clients = ["192.168.7.1", "192.168.7.2", "192.168.9.1", "10.0.0.1"]
+    aggregator.add_packets([now - 10] * 4, clients, [SERVER] * 4, [100, 200, 300, 400], ["TCP"] * 4)
+    aggregator.add_packets([now] * 4, clients, [SERVER] * 4, [1, 2, 3, 4], ["TCP"] * 4)
+
+    for _ in range(2):
+        by_group = aggregator.get_summary(group_by="group")
+        totals = {}
+        for row in by_group:
+            totals[row["client_ip"]] = totals.get(row["client_ip"], 0) + row["in_bytes"]
+        assert totals == {"lab": 303, "office": 303, "10.0.0.0/24": 404}
+    assert len(aggregator.get_summary(group_by="prefix")) == 6
+
+
+def test_prefix_client_key_stores_one_row_per_prefix() -> None:
+    aggregator = TrafficAggregator(server_ip=SERVER, window_seconds=5, retention_seconds=300, client_key="prefix")
+    now = time.time()
+    aggregator.add_packets(
+        [now] * 3, ["10.0.0.1", "10.0.0.2", SERVER], [SERVER, SERVER, "10.0.1.9"], [100, 200, 50], ["TCP"] * 3
+    )
+
+    rows = {row["client_ip"]: (row["in_bytes"], row["out_bytes"]) for row in aggregator.get_summary()}
+    assert rows == {"10.0.0.0/24": (300, 0), "10.0.1.0/24": (0, 50)}
+
+    ts = aggregator.get_summary()[0]["ts"]
+    for client in ("10.0.0.2", "10.0.0.0/24"):
+        drilldown = aggregator.get_drilldown(ts=ts, client_ip=client)
+        assert drilldown is not None
+        assert drilldown["items"] == [{"protocol": "TCP", "in_bytes": 300, "out_bytes": 0}]
@@ -0,0 +1,96 @@
+"""Unit tests for the on-disk columnar history."""
+
+import time
+
+from backend.aggregator import TrafficAggregator
+from backend.history import SEGMENT_SECONDS, HistoryStore
+
+
+def window(ts, *clients):
+    return {
+        "ts": ts,
+        "clients": [
+            {
+                "client_ip": client_ip,
+                "in_bytes": sum(totals[0] for totals in protocols.values()),
+                "out_bytes": sum(totals[1] for totals in protocols.values()),
+                "protocols": {name: {"in_bytes": i, "out_bytes": o} for name, (i, o) in protocols.items()},
+            }
+            for client_ip, protocols in clients
+        ],
+    }
+
+
+def test_windows_round_trip_through_segments(tmp_path) -> None:
+    base_ts = int(time.time()) // SEGMENT_SECONDS * SEGMENT_SECONDS - 2 * SEGMENT_SECONDS
+    store = HistoryStore(str(tmp_path), flush_rows=1)
+    store.open()
+    store.append_window(window(base_ts, ("192.168.0.10", {"HTTP": (100, 10), "FTP": (5, 0)})))
+    store.append_window(window(base_ts + 5, ("192.168.0.11", {"DNS": (7, 3)})))
+    store.append_window(window(base_ts + SEGMENT_SECONDS, ("192.168.0.10", {"TCP": (1, 1)})))
+    store.close()
+
+    reopened = HistoryStore(str(tmp_path))
+    reopened.open()
+
+    summary = reopened.get_summary(from_ts=base_ts, to_ts=base_ts + SEGMENT_SECONDS, resolution=60)
+    assert summary == [
+        {"ts": base_ts, "client_ip": "192.168.0.10", "in_bytes": 105, "out_bytes": 10},
+        {"ts": base_ts, "client_ip": "192.168.0.11", "in_bytes": 7, "out_bytes": 3},
+        {"ts": base_ts + SEGMENT_SECONDS, "client_ip": "192.168.0.10", "in_bytes": 1, "out_bytes": 1},
+    ]
+    drilldown = reopened.get_drilldown(ts=base_ts, client_ip="192.168.0.10", resolution=5)
+    assert drilldown["items"] == [
+        {"protocol": "FTP", "in_bytes": 5, "out_bytes": 0},
+        {"protocol": "HTTP", "in_bytes": 100, "out_bytes": 10},
+    ]
+    assert reopened.load_latest_segment() == [(base_ts + SEGMENT_SECONDS, "192.168.0.10", "TCP", 1, 1)]
+
+
+def test_restored_rows_warm_the_aggregator(tmp_path) -> None:
+    ts = int(time.time()) // 60 * 60 - 60
+    store = HistoryStore(str(tmp_path))
+    store.open()
+    store.append_window(window(ts, ("192.168.0.12", {"HTTP": (50, 20)})))
+    store.close()
+
+    aggregator = TrafficAggregator(
+        server_ip="10.50.0.10",
+        window_seconds=5,
+        retention_seconds=300,
+        rollup_tiers=[(60, 3600)],
+    )
+    closed = []
+    aggregator.add_window_listener(closed.append)
+
+    assert aggregator.restore_rows(store.load_latest_segment()) == 1
+    assert aggregator.get_summary(from_ts=ts, to_ts=ts) == [
+        {"ts": ts, "client_ip": "192.168.0.12", "in_bytes": 50, "out_bytes": 20}
+    ]
+    assert aggregator.get_summary(from_ts=ts, to_ts=ts, resolution=60)[0]["in_bytes"] == 50
+    assert aggregator.retained_since() == ts
+    aggregator.close_windows(now=ts + 60)
+    assert closed == []
+
+
+def test_windows_are_written_by_the_writer_thread(tmp_path) -> None:
+    import threading
+
+    base_ts = int(time.time()) // SEGMENT_SECONDS * SEGMENT_SECONDS - 2 * SEGMENT_SECONDS
+    store = HistoryStore(str(tmp_path), flush_rows=1)
+    writers = []
+    flush = store._flush_locked
+
+    def recording_flush() -> None:
+        writers.append(threading.current_thread().name)
+        flush()
+
+    store._flush_locked = recording_flush
+    store.open()
+    store.append_window(window(base_ts, ("192.168.0.10", {"HTTP": (100, 10)})))
+    store.append_window(window(base_ts + 5, ("192.168.0.11", {"DNS": (7, 3)})))
+    store.close()
+
+    # Só o flush final de close() roda na thread chamadora
+    assert writers == ["history-writer", "history-writer", threading.current_thread().name]
+    assert store.rows_written == 2
@@ -0,0 +1,62 @@
+"""Unit tests for the JSON payload store behind /api/json-data."""
+
+import pytest
+
+from backend.jsonstore import JsonDataStore, parse_json_records
+
+
+def _record(client: str, timestamp: int, value: int) -> dict:
+    return {"client_id": client, "timestamp": timestamp, "data_type": "sensor", "file_size": 10, "payload": {"v": value}}
+
+
+def test_parse_single_array_and_ndjson() -> None:
+    assert parse_json_records(b'{"a": 1}') == [{"a": 1}]
+    assert parse_json_records(b'[{"a": 1}, {"a": 2}]') == [{"a": 1}, {"a": 2}]
+    assert parse_json_records(b'{"a": 1}\n\n{"a": 2}\n', ndjson=True) == [{"a": 1}, {"a": 2}]
+    with pytest.raises(ValueError):
+        parse_json_records(b"[1, 2]")
+    with pytest.raises(ValueError):
+        parse_json_records(b'{"a": 1}\n{broken', ndjson=True)
+
+
+def test_batches_are_written_and_queried_newest_first(tmp_path) -> None:
+    store = JsonDataStore(str(tmp_path / "json.sqlite3"))
+    store.open()
+    try:
+        assert store.submit([_record("c1", 100 + index, index) for index in range(50)])
+        assert store.submit([_record("c2", 100, 99)])
+        assert store.wait_idle(timeout=5)
+
+        recent = store.recent(client_id="c1", limit=3)
+        assert [row["timestamp"] for row in recent] == [149, 148, 147]
+        assert recent[0]["payload"] == {"v": 49}
+        assert len(store.recent(client_id="c1", limit=100, since=140)) == 10
+        assert store.recent(client_id="c2")[0]["payload"] == {"v": 99}
+        assert store.written == store.accepted == 51
+    finally:
+        store.close()
+
+
+def test_full_queue_rejects_without_blocking(tmp_path) -> None:
+    store = JsonDataStore(str(tmp_path / "json.sqlite3"), queue_size=2)
+    # Sem open(): nenhum gravador consome a fila
+    assert store.submit([_record("c1", 1, 1)])
+    assert store.submit([_record("c1", 2, 2)])
+    assert not store.submit([_record("c1", 3, 3), _record("c1", 4, 4)])
+    assert (store.accepted, store.rejected) == (2, 2)
+
+
+def test_unencodable_record_does_not_stop_the_writer(tmp_path) -> None:
+    store = JsonDataStore(str(tmp_path / "json.sqlite3"))
+    store.open()
+    try:
+        big = {"client_id": "c1", "timestamp": 1, "data_type": "sensor", "file_size": 10, "payload": {"n": 2**70}}
+        assert store.submit([big])
+        assert store.submit([{**big, "timestamp": 2**70}])
+        assert store.submit([_record("c1", 2, 7)])
+        assert store.wait_idle(timeout=5)
+
+        assert [row["payload"] for row in store.recent(client_id="c1")] == [{"v": 7}, {"n": 2**70}]
+        assert (store.written, store.failed) == (2, 1)
+    finally:
+        store.close()
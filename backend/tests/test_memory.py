@@ -0,0 +1,12 @@
+"""Memory footprint of the aggregator's per-client window counters.
+
+``benchmarks/bench_memory.py`` prints the figures this test checks.
+"""
+
+from backend.benchmarks.bench_memory import bytes_per_client_per_bin
+
+
+def test_bytes_per_client_per_bin() -> None:
+    legacy, compact = bytes_per_client_per_bin(clients=2000, bins=12)
+
+    assert compact * 3 < legacy
@@ -0,0 +1,92 @@
+"""Unit tests for the metrics registry and pipeline instrumentation."""
+
+import threading
+import time
+
+from backend import capture
+from backend.aggregator import LOCK_WAIT_SECONDS, TrafficAggregator
+from backend.capture import CaptureService
+from backend.metrics import Registry
+
+
+def test_counter_sums_cells_written_by_each_thread() -> None:
+    registry = Registry()
+    counter = registry.counter("demo_total", "Demo counter.", ("kind",))
+
+    def work() -> None:
+        for _ in range(1000):
+            counter.labels("a").inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.labels("b").inc(2.5)
+
+    text = registry.render()
+    assert "# TYPE demo_total counter" in text
+    assert 'demo_total{kind="a"} 4000' in text
+    assert 'demo_total{kind="b"} 2.5' in text
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    registry = Registry()
+    histogram = registry.histogram("demo_seconds", "Demo histogram.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+    assert 'demo_seconds_bucket{le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{le="1"} 3' in lines
+    assert 'demo_seconds_bucket{le="+Inf"} 4' in lines
+    assert "demo_seconds_sum 6.05" in lines
+    assert "demo_seconds_count 4" in lines
+
+
+def test_pipeline_metrics_are_exposed() -> None:
+    now = time.time()
+    aggregator = TrafficAggregator(server_ip="10.0.0.1", window_seconds=5, retention_seconds=60)
+    service = CaptureService(aggregator=aggregator, iface="any", batch_size=2)
+    registry = Registry()
+    aggregator.register_metrics(registry)
+    service.register_metrics(registry)
+    before = capture.CLASSIFIED_PACKETS.labels("DNS").value()
+    ingest_before = LOCK_WAIT_SECONDS.labels("ingest").snapshot()[2]
+
+    service._enqueue(now, "10.0.0.2", "10.0.0.1", 100, "DNS")
+    service._enqueue(now, "10.0.0.1", "10.0.0.2", 80, "DNS")
+    service._process_frame(memoryview(b"\x00" * 10), 10, 1, now)
+    assert service._drain(timeout=0) == 2
+
+    text = registry.render()
+    assert "traffic_capture_packets_total 2" in text
+    assert "traffic_capture_parse_failures_total 1" in text
+    assert 'traffic_aggregator_windows{resolution="5"} 1' in text
+    assert 'traffic_aggregator_window_rows{resolution="5"} 1' in text
+    assert "traffic_aggregator_clients 2" in text
+    assert capture.CLASSIFIED_PACKETS.labels("DNS").value() - before == 2
+    assert LOCK_WAIT_SECONDS.labels("ingest").snapshot()[2] - ingest_before == 1
+
+
+def test_memory_gauges_scan_once_per_scrape_without_the_ingest_lock() -> None:
+    aggregator = TrafficAggregator(server_ip="10.0.0.1", window_seconds=5, retention_seconds=60, rollup_tiers=[(60, 600)])
+    aggregator.add_packet(timestamp=time.time(), src_ip="10.0.0.2", dst_ip="10.0.0.1", length=10, protocol="DNS")
+    registry = Registry()
+    aggregator.register_metrics(registry)
+    scans = []
+    memory_stats = aggregator.memory_stats
+    aggregator.memory_stats = lambda: scans.append(1) or memory_stats()
+
+    # Com o lock de ingestão ocupado o scrape não pode esperar por ele
+    rendered = []
+    with aggregator._lock:
+        scrape = threading.Thread(target=lambda: rendered.append(registry.render()), daemon=True)
+        scrape.start()
+        scrape.join(timeout=5)
+    assert rendered
+    text = rendered[0]
+
+    assert 'traffic_aggregator_windows{resolution="5"} 1' in text
+    assert 'traffic_aggregator_memory_bytes{resolution="60"} 0' in text
+    assert len(scans) == 1
@@ -0,0 +1,56 @@
+"""Unit tests for multi-address and prefix server matching."""
+
+import time
+
+import pytest
+
+from backend.aggregator import TrafficAggregator
+from backend.netindex import ServerIndex, parse_server_ips, resolve_server_ips
+
+
+def test_index_matches_hosts_and_prefixes_of_both_families() -> None:
+    index = ServerIndex("10.50.0.10, 10.60.0.0/16, 2001:db8:1::/48, fd00::2")
+
+    assert "10.50.0.10" in index
+    assert "10.60.255.1" in index
+    assert "2001:db8:1:ffff::9" in index
+    assert "fd00::2" in index
+    assert "10.50.0.11" not in index
+    assert "2001:db8:2::1" not in index
+    assert "not-an-ip" not in index
+    assert str(index) == "10.50.0.10,10.60.0.0/16,2001:db8:1::/48,fd00::2"
+
+
+def test_hosts_only_index_uses_set_lookup() -> None:
+    index = ServerIndex("10.50.0.10,10.50.0.11")
+    assert index.contains == index.hosts.__contains__
+
+
+def test_invalid_server_spec_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        parse_server_ips("10.50.0.300")
+    with pytest.raises(ValueError):
+        parse_server_ips(" , ")
+
+
+def test_auto_resolves_interface_addresses() -> None:
+    resolved = resolve_server_ips("auto", "eth0", lookup=lambda iface: ["10.50.0.10", "fd00::10"])
+    assert resolved == "10.50.0.10,fd00::10"
+    with pytest.raises(ValueError):
+        resolve_server_ips("auto", "eth0", lookup=lambda iface: [])
+
+
+def test_aggregator_counts_every_server_address() -> None:
+    aggregator = TrafficAggregator(server_ip="10.50.0.10,fd00::/64", window_seconds=5, retention_seconds=300)
+    now = time.time()
+    accepted = aggregator.add_packets(
+        [now] * 4,
+        ["10.0.0.1", "fd00::10", "2001:db8::1", "10.0.0.1"],
+        ["10.50.0.10", "2001:db8::1", "fd00::20", "10.0.0.2"],
+        [100, 200, 300, 400],
+        ["TCP", "TCP", "UDP", "TCP"],
+    )
+
+    assert accepted == 3
+    rows = {row["client_ip"]: (row["in_bytes"], row["out_bytes"]) for row in aggregator.get_summary()}
+    assert rows == {"10.0.0.1": (100, 0), "2001:db8::1": (300, 200)}
@@ -0,0 +1,49 @@
+"""Unit tests for the fast-path response encoding."""
+
+import json
+
+import pytest
+
+from backend import serialization
+from backend.models import ColumnarSummaryResponse, SummaryResponse
+from backend.serialization import columnar, encode_summary
+
+ROWS = [
+    {"ts": 0, "client_ip": "10.0.0.1", "in_bytes": 1, "out_bytes": 2},
+    {"ts": 5, "client_ip": "fd00::1", "in_bytes": 3, "out_bytes": 4},
+]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_encode_summary_matches_model_shape(monkeypatch, use_orjson) -> None:
+    if not use_orjson:
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson not installed")
+
+    assert json.loads(encode_summary(ROWS, 5)) == {"bins": ROWS, "resolution": 5}
+    assert json.loads(encode_summary(ROWS, 5, "columnar")) == {
+        "columns": {
+            "ts": [0, 5],
+            "client_ip": ["10.0.0.1", "fd00::1"],
+            "in_bytes": [1, 3],
+            "out_bytes": [2, 4],
+        },
+        "resolution": 5,
+    }
+
+
+def test_columnar_of_empty_rows_keeps_fields() -> None:
+    assert columnar([]) == {"ts": [], "client_ip": [], "in_bytes": [], "out_bytes": []}
+    with pytest.raises(ValueError):
+        encode_summary(ROWS, 5, "csv")
+
+
+def test_encoded_layouts_validate_against_their_models() -> None:
+    rows = SummaryResponse.model_validate_json(encode_summary(ROWS, 5))
+    columns = ColumnarSummaryResponse.model_validate_json(encode_summary(ROWS, 5, "columnar"))
+
+    assert rows.resolution == columns.resolution == 5
+    assert columns.columns.client_ip == [row.client_ip for row in rows.bins]
+    # Clientes antigos que só mandam ``bins`` continuam válidos
+    assert SummaryResponse.model_validate({"bins": []}).resolution is None
@@ -0,0 +1,116 @@
+"""Unit tests for merging answers from sharded aggregators."""
+
+import multiprocessing
+import threading
+import time
+import types
+
+import pytest
+
+from backend import sharding
+from backend.aggregator import TrafficAggregator
+from backend.sharding import ShardedAggregator, ShardUnavailable
+
+
+def make_shards(count: int = 2):
+    shards = [
+        TrafficAggregator(server_ip="10.50.0.10", window_seconds=5, retention_seconds=300, topk_capacity=8)
+        for _ in range(count)
+    ]
+    sharded = ShardedAggregator(shards=count, aggregator_kwargs={}, capture_kwargs={"iface": "any"})
+    # Substitui o transporte por pipe por chamadas diretas aos agregadores locais
+    sharded._call_all = lambda method, **kwargs: [getattr(shard, method)(**kwargs) for shard in shards]
+    return shards, sharded
+
+
+def test_sharded_summary_and_drilldown_sum_across_shards() -> None:
+    shards, sharded = make_shards()
+    base_ts = float(int(time.time()) // 5 * 5)
+    shards[0].add_packet(timestamp=base_ts, src_ip="192.168.0.1", dst_ip="10.50.0.10", length=100, protocol="HTTP")
+    shards[1].add_packet(timestamp=base_ts, src_ip="192.168.0.1", dst_ip="10.50.0.10", length=40, protocol="DNS")
+    shards[1].add_packet(timestamp=base_ts, src_ip="10.50.0.10", dst_ip="192.168.0.2", length=70, protocol="HTTP")
+
+    summary = sharded.get_summary()
+    assert {row["client_ip"]: row["in_bytes"] for row in summary} == {"192.168.0.1": 140, "192.168.0.2": 0}
+
+    drilldown = sharded.get_drilldown(ts=int(base_ts), client_ip="192.168.0.1")
+    assert drilldown is not None
+    assert {item["protocol"]: item["in_bytes"] for item in drilldown["items"]} == {"DNS": 40, "HTTP": 100}
+    assert sharded.get_drilldown(ts=int(base_ts), client_ip="192.168.9.9") is None
+
+
+def test_sharded_top_ranks_merged_totals() -> None:
+    shards, sharded = make_shards()
+    base_ts = float(int(time.time()) // 5 * 5)
+    shards[0].add_packet(timestamp=base_ts, src_ip="192.168.0.1", dst_ip="10.50.0.10", length=60, protocol="HTTP")
+    shards[1].add_packet(timestamp=base_ts, src_ip="192.168.0.1", dst_ip="10.50.0.10", length=60, protocol="HTTP")
+    shards[1].add_packet(timestamp=base_ts, src_ip="192.168.0.2", dst_ip="10.50.0.10", length=100, protocol="HTTP")
+
+    top = sharded.get_top(k=1, by="in")
+    assert [(item["client_ip"], item["bytes"]) for item in top] == [("192.168.0.1", 120)]
+
+
+def test_sharded_series_align_on_union_of_bins() -> None:
+    shards, sharded = make_shards()
+    base_ts = int(time.time()) // 5 * 5 - 5
+    shards[0].add_packet(timestamp=base_ts, src_ip="192.168.0.1", dst_ip="10.50.0.10", length=10, protocol="HTTP")
+    shards[1].add_packet(timestamp=base_ts, src_ip="192.168.0.1", dst_ip="10.50.0.10", length=5, protocol="DNS")
+    shards[1].add_packet(timestamp=base_ts + 5, src_ip="192.168.0.1", dst_ip="10.50.0.10", length=7, protocol="DNS")
+
+    result = sharded.get_series(client_ips=["192.168.0.1"], from_ts=base_ts, to_ts=base_ts + 5, protocols=True)
+
+    assert result["ts"] == [base_ts, base_ts + 5]
+    assert result["series"][0]["in_bytes"] == [15, 7]
+    assert result["series"][0]["protocols"]["DNS"]["in_bytes"] == [5, 7]
+    assert result["series"][0]["protocols"]["HTTP"]["in_bytes"] == [10, 0]
+
+
+def test_sharded_range_drilldown_merges_groups() -> None:
+    shards, sharded = make_shards()
+    base_ts = float(int(time.time()) // 5 * 5)
+    shards[0].add_packet(timestamp=base_ts, src_ip="192.168.0.1", dst_ip="10.50.0.10", length=100, protocol="HTTP")
+    shards[1].add_packet(timestamp=base_ts, src_ip="192.168.0.1", dst_ip="10.50.0.10", length=40, protocol="DNS")
+    shards[1].add_packet(timestamp=base_ts, src_ip="192.168.0.2", dst_ip="10.50.0.10", length=70, protocol="HTTP")
+
+    result = sharded.get_range_drilldown(group_by="client")
+
+    assert result["in_bytes"] == 210
+    assert {item["protocol"]: item["in_bytes"] for item in result["items"]} == {"DNS": 40, "HTTP": 170}
+    assert [(group["key"], group["in_bytes"]) for group in result["groups"]] == [("192.168.0.1", 140), ("192.168.0.2", 70)]
+
+
+def test_dead_shard_is_reported_and_live_pipes_stay_in_sync() -> None:
+    sharded = ShardedAggregator(shards=2, aggregator_kwargs={}, capture_kwargs={"iface": "any"})
+    live_parent, live_child = multiprocessing.Pipe()
+    dead_parent, dead_child = multiprocessing.Pipe()
+    dead_child.close()
+    sharded._connections = [live_parent, dead_parent]
+    sharded._locks = [threading.Lock(), threading.Lock()]
+
+    def answer() -> None:
+        for _ in range(2):
+            method, _ = live_child.recv()
+            live_child.send(("ok", method))
+
+    responder = threading.Thread(target=answer)
+    responder.start()
+    for method in ("retained_since", "select_resolution"):
+        with pytest.raises(ShardUnavailable) as raised:
+            sharded._call_all(method)
+        assert raised.value.index == 1
+    responder.join(timeout=2)
+    assert not live_parent.poll()
+
+
+def test_shard_tick_closes_windows_on_its_own_timer(monkeypatch) -> None:
+    monkeypatch.setattr(sharding, "_TICK_SECONDS", 0.01)
+    ticks = threading.Event()
+    aggregator = types.SimpleNamespace(close_windows=ticks.set)
+    stop = threading.Event()
+    ticker = threading.Thread(target=sharding._tick, args=(aggregator, stop))
+    ticker.start()
+
+    assert ticks.wait(timeout=2)
+    stop.set()
+    ticker.join(timeout=2)
+    assert not ticker.is_alive()
@@ -0,0 +1,61 @@
+"""Unit tests for the heavy-hitter sketches."""
+
+import random
+
+from backend.sketch import SpaceSaving
+
+
+def test_space_saving_keeps_heavy_hitters_within_capacity() -> None:
+    rng = random.Random(7)
+    sketch = SpaceSaving(capacity=16)
+    exact = {}
+    stream = [("heavy-a", 500), ("heavy-b", 300)] * 20 + [(f"noise-{i}", rng.randint(1, 20)) for i in range(2000)]
+    rng.shuffle(stream)
+
+    for key, weight in stream:
+        sketch.update(key, weight)
+        exact[key] = exact.get(key, 0) + weight
+
+    assert len(sketch) == 16
+    top = sketch.top(2)
+    assert [key for key, _, _ in top] == ["heavy-a", "heavy-b"]
+    for key, count, error in top:
+        assert count - error <= exact[key] <= count
+
+
+def test_merged_sketches_sum_counts() -> None:
+    first = SpaceSaving(capacity=4)
+    second = SpaceSaving(capacity=4)
+    first.update("a", 10)
+    first.update("b", 3)
+    second.update("a", 5)
+    second.update("c", 8)
+
+    merged = SpaceSaving.merged(4, [first, second])
+
+    assert merged.top(3) == [("a", 15, 0), ("c", 8, 0), ("b", 3, 0)]
+
+
+def test_merged_full_sketches_keep_upper_bounds() -> None:
+    rng = random.Random(11)
+    exact = {}
+    sketches = []
+    for _ in range(12):
+        sketch = SpaceSaving(capacity=8)
+        for _ in range(300):
+            key = f"k{min(int(rng.expovariate(0.15)), 60)}"
+            weight = rng.randint(1, 50)
+            sketch.update(key, weight)
+            exact[key] = exact.get(key, 0) + weight
+        sketches.append(sketch)
+
+    merged = SpaceSaving.merged(8, sketches)
+    # Mesclar de novo (como get_top faz com as janelas abertas) mantém a garantia
+    remerged = SpaceSaving.merged(8, [SpaceSaving.merged(8, sketches[:5]), SpaceSaving.merged(8, sketches[5:])])
+
+    for result in (merged, remerged):
+        assert len(result) == 8
+        for key, count, error in result.top(8):
+            assert count - error <= exact[key] <= count
+        # Chaves fora do sketch não passam do piso
+        assert all(weight <= result.floor() for key, weight in exact.items() if key not in result.counts)
@@ -0,0 +1,82 @@
+"""Unit tests for the capture/aggregation ring buffer."""
+
+import threading
+import time
+
+import pytest
+
+from backend.aggregator import TrafficAggregator
+from backend.capture import CaptureService
+from backend.spsc import SpscRing
+
+
+def test_drop_newest_keeps_oldest_items() -> None:
+    ring = SpscRing(3, "drop-newest")
+    results = [ring.put(item) for item in range(5)]
+
+    assert results == [True, True, True, False, False]
+    assert ring.drain(timeout=0) == [0, 1, 2]
+    assert (ring.enqueued, ring.dropped, ring.high_water) == (3, 2, 3)
+
+
+def test_drop_oldest_keeps_newest_items() -> None:
+    ring = SpscRing(3, "drop-oldest")
+    for item in range(5):
+        assert ring.put(item)
+
+    assert ring.drain(timeout=0) == [2, 3, 4]
+    assert (ring.enqueued, ring.dropped, ring.high_water) == (5, 2, 3)
+    assert ring.drain(timeout=0) == []
+
+
+def test_block_policy_waits_for_consumer() -> None:
+    ring = SpscRing(2, "block")
+    ring.put(0)
+    ring.put(1)
+    producer = threading.Thread(target=ring.put, args=(2,))
+    producer.start()
+    time.sleep(0.05)
+    assert producer.is_alive()
+
+    assert ring.drain(timeout=0) == [0, 1]
+    producer.join(timeout=1)
+    assert ring.drain(timeout=1) == [2]
+    assert ring.dropped == 0
+
+
+def test_single_producer_single_consumer_preserves_order() -> None:
+    ring = SpscRing(64, "block")
+    received = []
+
+    def consume() -> None:
+        while not (ring.closed and not len(ring)):
+            received.extend(ring.drain(timeout=0.05))
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    for item in range(20000):
+        ring.put(item)
+    ring.close()
+    consumer.join(timeout=5)
+
+    assert received == list(range(20000))
+
+
+def test_invalid_policy_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        SpscRing(4, "drop-random")
+
+
+def test_capture_is_not_blocked_by_aggregator_readers() -> None:
+    aggregator = TrafficAggregator(server_ip="10.50.0.10", window_seconds=5, retention_seconds=300)
+    service = CaptureService(aggregator=aggregator, iface="any", batch_size=8)
+    now = time.time()
+
+    # Um leitor segurando o lock do agregador não impede a captura de enfileirar
+    with aggregator._lock:
+        for _ in range(64):
+            service._enqueue(now, "192.168.0.1", "10.50.0.10", 10, "TCP")
+    assert len(service.queue) == 8
+
+    assert service._drain(timeout=0) == 64
+    assert aggregator.get_summary()[0]["in_bytes"] == 640
@@ -0,0 +1,48 @@
+"""Unit tests for streaming subscriptions."""
+
+import asyncio
+
+from backend.stream import Subscription, parse_filter
+
+WINDOW = {
+    "ts": 100,
+    "clients": [
+        {
+            "client_ip": "192.168.0.10",
+            "in_bytes": 30,
+            "out_bytes": 5,
+            "protocols": {"HTTP": {"in_bytes": 20, "out_bytes": 5}, "FTP": {"in_bytes": 10, "out_bytes": 0}},
+        },
+        {
+            "client_ip": "192.168.0.11",
+            "in_bytes": 7,
+            "out_bytes": 0,
+            "protocols": {"DNS": {"in_bytes": 7, "out_bytes": 0}},
+        },
+    ],
+}
+
+
+def test_filters_restrict_clients_and_protocol_totals() -> None:
+    async def scenario():
+        subscription = Subscription(clients=parse_filter("192.168.0.10"), protocols=parse_filter("ftp", upper=True))
+        subscription.offer(WINDOW)
+        return await subscription.next()
+
+    frame = asyncio.run(scenario())
+
+    assert [client["client_ip"] for client in frame["clients"]] == ["192.168.0.10"]
+    assert (frame["clients"][0]["in_bytes"], frame["clients"][0]["out_bytes"]) == (10, 0)
+
+
+def test_slow_consumer_drops_oldest_frames() -> None:
+    async def scenario():
+        subscription = Subscription(max_queue=2)
+        for ts in range(5):
+            subscription.offer({**WINDOW, "ts": ts})
+        return subscription.dropped, [(await subscription.next())["ts"] for _ in range(2)]
+
+    dropped, received = asyncio.run(scenario())
+
+    assert dropped == 3
+    assert received == [3, 4]
@@ -0,0 +1,59 @@
+"""Unit tests for sampled packet tracing and capture counters."""
+
+import logging
+import time
+
+from backend.aggregator import TrafficAggregator
+from backend.capture import CaptureService
+from backend.tracing import PacketTracer
+
+
+def test_tracer_is_disabled_by_default() -> None:
+    tracer = PacketTracer()
+    service = CaptureService(
+        aggregator=TrafficAggregator(server_ip="10.50.0.10", window_seconds=5, retention_seconds=300),
+        iface="any",
+        tracer=tracer,
+    )
+    assert not tracer.enabled
+    assert service._trace is None
+
+
+def test_tracer_samples_and_rate_limits(caplog) -> None:
+    tracer = PacketTracer(sample_every=10, max_lines_per_second=3)
+    with caplog.at_level(logging.INFO):
+        for _ in range(100):
+            tracer.trace(0.0, "192.168.0.1", "10.50.0.10", 60, "TCP")
+    lines = [record for record in caplog.records if record.getMessage().startswith("trace ")]
+    assert len(lines) == 3
+    assert tracer.suppressed == 7
+
+
+def test_tracer_filters_by_client_ip(caplog) -> None:
+    tracer = PacketTracer(client_ip="192.168.0.2")
+    with caplog.at_level(logging.INFO):
+        tracer.trace(0.0, "192.168.0.1", "10.50.0.10", 60, "TCP")
+        tracer.trace(0.0, "10.50.0.10", "192.168.0.2", 60, "TCP")
+    assert [record.getMessage().split()[2:5] for record in caplog.records] == [["10.50.0.10", "->", "192.168.0.2"]]
+
+
+def test_capture_counts_skipped_and_dropped(caplog) -> None:
+    tracer = PacketTracer(summary_seconds=3600)
+    service = CaptureService(
+        aggregator=TrafficAggregator(server_ip="10.50.0.10", window_seconds=5, retention_seconds=300),
+        iface="any",
+        tracer=tracer,
+    )
+    now = time.time()
+    service._enqueue(now, "192.168.0.1", "10.50.0.10", 100, "TCP")
+    service._enqueue(now, "192.168.0.1", "192.168.0.9", 50, "TCP")
+    service._process_frame(memoryview(b"\x00" * 10), 10, 1, now)
+    service._flush_batch()
+    service._drain(timeout=0)
+
+    assert (tracer.packets, tracer.accepted, tracer.skipped, tracer.dropped) == (2, 1, 1, 1)
+    with caplog.at_level(logging.INFO):
+        assert tracer.maybe_report(service.queue, now=time.monotonic() + 3600)
+    message = caplog.records[-1].getMessage()
+    assert "accepted=1 skipped=1 dropped=1" in message
+    assert "queue_high_water=1 queue_dropped=0" in message
@@ -0,0 +1,118 @@
+"""Opt-in packet tracing and periodic throughput summaries for the capture loop."""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from spsc import SpscRing
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PacketTracer:
+    """Sampled per-packet trace lines plus counters reported on an interval.
+
+    Tracing is off unless ``sample_every`` (trace 1 in N packets) or
+    ``client_ip`` (trace packets to or from that address) is set; callers
+    check ``enabled`` once and skip ``trace`` entirely otherwise. Trace
+    lines are capped at ``max_lines_per_second``; lines over the cap are
+    counted as suppressed. Packet, dropped and skipped counters are plain
+    integer increments and are logged at most once per ``summary_seconds``;
+    ``dropped`` covers undecodable or non-IP packets (also counted in ``malformed``)
+    and batches the queue rejected.
+    """
+
+    def __init__(
+        self,
+        *,
+        sample_every: int = 0,
+        client_ip: Optional[str] = None,
+        max_lines_per_second: int = 50,
+        summary_seconds: float = 60.0,
+    ) -> None:
+        self.sample_every = max(0, sample_every)
+        self.client_ip = client_ip or None
+        self.max_lines_per_second = max_lines_per_second
+        self.summary_seconds = summary_seconds
+        self.enabled = bool(self.sample_every or self.client_ip)
+
+        self.packets = 0
+        self.bytes = 0
+        self.accepted = 0
+        self.dropped = 0
+        self.malformed = 0
+        self.skipped = 0
+        self.suppressed = 0
+        self._seen = 0
+        self._line_second = 0
+        self._lines = 0
+        self._last_report = time.monotonic()
+        self._reported = (0, 0, 0, 0, 0)
+
+    def trace(self, timestamp: float, src_ip: str, dst_ip: str, length: int, protocol: str) -> None:
+        if self.client_ip is not None:
+            if src_ip != self.client_ip and dst_ip != self.client_ip:
+                return
+        elif self.sample_every > 1:
+            self._seen += 1
+            if self._seen % self.sample_every:
+                return
+
+        second = int(time.monotonic())
+        if second != self._line_second:
+            self._line_second, self._lines = second, 0
+        if self._lines >= self.max_lines_per_second:
+            self.suppressed += 1
+            return
+        self._lines += 1
+        LOGGER.info("trace ts=%.6f %s -> %s len=%d proto=%s", timestamp, src_ip, dst_ip, length, protocol)
+
+    def count_batch(self, packets: int, total_bytes: int, accepted: int) -> None:
+        """Record one batch handed to the aggregator; ``packets - accepted`` were skipped."""
+
+        self.packets += packets
+        self.bytes += total_bytes
+        self.accepted += accepted
+        self.skipped += packets - accepted
+
+    def count_dropped(self, count: int = 1) -> None:
+        self.dropped += count
+
+    def count_malformed(self) -> None:
+        """Record a packet the decoder could not parse."""
+
+        self.malformed += 1
+        self.dropped += 1
+
+    def maybe_report(self, queue: Optional[SpscRing] = None, now: Optional[float] = None) -> bool:
+        """Log a throughput summary if ``summary_seconds`` elapsed since the last one."""
+
+        now = time.monotonic() if now is None else now
+        elapsed = now - self._last_report
+        if elapsed < self.summary_seconds:
+            return False
+
+        queue_stats = ""
+        if queue is not None:
+            queue_stats = f" queue_depth={len(queue)} queue_high_water={queue.high_water} queue_dropped={queue.dropped}"
+        current = (self.packets, self.bytes, self.accepted, self.skipped, self.dropped)
+        packets, total_bytes, accepted, skipped, dropped = (
+            value - previous for value, previous in zip(current, self._reported)
+        )
+        LOGGER.info(
+            "capture: %.0f pkt/s, %.0f B/s over %.0fs (accepted=%d skipped=%d dropped=%d trace_suppressed=%d%s)",
+            packets / elapsed,
+            total_bytes / elapsed,
+            elapsed,
+            accepted,
+            skipped,
+            dropped,
+            self.suppressed,
+            queue_stats,
+        )
+        self._reported = current
+        self._last_report = now
+        return True
@@ -0,0 +1,50 @@
+import { afterEach, describe, expect, it, vi } from "vitest";
+import { MAX_SERIES_CLIENTS, fetchSeries } from "./api";
+
+function seriesResponse(url: string, ts: number[]) {
+  const clients = new URL(url).searchParams.get("clients")!.split(",");
+  return {
+    ok: true,
+    status: 200,
+    headers: { get: () => null },
+    json: async () => ({
+      resolution: 5,
+      ts,
+      series: clients.map((client_ip) => ({ client_ip, in_bytes: ts.map(() => 1), out_bytes: ts.map(() => 0) })),
+    }),
+  };
+}
+
+describe("fetchSeries", () => {
+  afterEach(() => {
+    vi.unstubAllGlobals();
+  });
+
+  it("splits large client lists into requests the API accepts", async () => {
+    const clients = Array.from({ length: MAX_SERIES_CLIENTS * 2 + 5 }, (_, index) => `10.0.${index >> 8}.${index & 255}`);
+    const fetchMock = vi.fn(async (url: string) => seriesResponse(url, [0, 5]));
+    vi.stubGlobal("fetch", fetchMock);
+
+    const payload = await fetchSeries(clients, 0, 10);
+
+    expect(fetchMock).toHaveBeenCalledTimes(3);
+    for (const [url] of fetchMock.mock.calls) {
+      expect(new URL(url).searchParams.get("clients")!.split(",").length).toBeLessThanOrEqual(MAX_SERIES_CLIENTS);
+    }
+    expect(payload.series.map((client) => client.client_ip)).toEqual(clients);
+  });
+
+  it("aligns chunks that saw a newer bin on the first response's axis", async () => {
+    const clients = Array.from({ length: MAX_SERIES_CLIENTS + 1 }, (_, index) => `10.1.0.${index}`);
+    const fetchMock = vi
+      .fn()
+      .mockImplementationOnce(async (url: string) => seriesResponse(url, [0, 5]))
+      .mockImplementationOnce(async (url: string) => seriesResponse(url, [5, 10]));
+    vi.stubGlobal("fetch", fetchMock);
+
+    const payload = await fetchSeries(clients, 0, 10);
+
+    expect(payload.ts).toEqual([0, 5]);
+    expect(payload.series[MAX_SERIES_CLIENTS].in_bytes).toEqual([0, 1]);
+  });
+});
@@ -1,4 +1,4 @@
-import type { DrilldownPayload, SummaryBin } from "./store";
+import type { DrilldownPayload, SeriesPayload, SummaryBin } from "./store";
 
 const API_BASE = ((import.meta as any).env?.VITE_API_BASE ?? "http://localhost:8000/api").replace(/\/$/, "");
 
@@ -9,20 +9,33 @@ function buildUrl(path: string): string {
   return `${API_BASE}${path}`;
 }
 
+const summaryCache = new Map<string, { etag: string; bins: SummaryBin[] }>();
+
 export async function fetchSummary(from: number, to: number): Promise<SummaryBin[]> {
   const query = new URLSearchParams({ from_ts: String(from), to_ts: String(to) }).toString();
-  const response = await fetch(buildUrl(`/summary?${query}`), {
-    headers: {
-      Accept: "application/json",
-    },
-  });
+  const cached = summaryCache.get(query);
+  const headers: Record<string, string> = { Accept: "application/json" };
+  if (cached) {
+    headers["If-None-Match"] = cached.etag;
+  }
+  const response = await fetch(buildUrl(`/summary?${query}`), { headers });
+
+  if (response.status === 304 && cached) {
+    return cached.bins;
+  }
 
   if (!response.ok) {
     throw new Error(`Failed to fetch summary: ${response.statusText}`);
   }
 
   const data = await response.json();
-  return data.bins ?? [];
+  const bins: SummaryBin[] = data.bins ?? [];
+  const etag = response.headers?.get("ETag");
+  if (etag) {
+    summaryCache.clear();
+    summaryCache.set(query, { etag, bins });
+  }
+  return bins;
 }
 
 export async function fetchDrilldown(ts: number, clientIp: string): Promise<DrilldownPayload> {
@@ -40,6 +53,81 @@ export async function fetchDrilldown(ts: number, clientIp: string): Promise<Dril
   return response.json();
 }
 
+// Clientes por chamada de /api/series (MAX_SERIES_CLIENTS no backend)
+export const MAX_SERIES_CLIENTS = 100;
+
+const seriesCache = new Map<string, { etag: string; series: SeriesPayload }>();
+
+async function fetchSeriesChunk(query: string): Promise<SeriesPayload> {
+  const cached = seriesCache.get(query);
+  const headers: Record<string, string> = { Accept: "application/json" };
+  if (cached) {
+    headers["If-None-Match"] = cached.etag;
+  }
+  const response = await fetch(buildUrl(`/series?${query}`), { headers });
+
+  if (response.status === 304 && cached) {
+    return cached.series;
+  }
+
+  if (!response.ok) {
+    throw new Error(`Failed to fetch series: ${response.statusText}`);
+  }
+
+  const series: SeriesPayload = await response.json();
+  const etag = response.headers?.get("ETag");
+  if (etag) {
+    seriesCache.set(query, { etag, series });
+  }
+  return series;
+}
+
+function mergeSeries(payloads: SeriesPayload[]): SeriesPayload {
+  const [first, ...rest] = payloads;
+  const series = [...first.series];
+  for (const payload of rest) {
+    if (payload.ts.length === first.ts.length && payload.ts.every((ts, index) => ts === first.ts[index])) {
+      series.push(...payload.series);
+      continue;
+    }
+    // Um bin pode abrir entre as chamadas: realinha no eixo da primeira resposta
+    const positions = new Map(payload.ts.map((ts, index) => [ts, index] as [number, number]));
+    const align = (values: number[]) =>
+      first.ts.map((ts) => {
+        const position = positions.get(ts);
+        return position === undefined ? 0 : values[position];
+      });
+    series.push(
+      ...payload.series.map((client) => ({
+        ...client,
+        in_bytes: align(client.in_bytes),
+        out_bytes: align(client.out_bytes),
+      })),
+    );
+  }
+  return { ...first, series };
+}
+
+export async function fetchSeries(clients: string[], from: number, to: number): Promise<SeriesPayload> {
+  const queries: string[] = [];
+  for (let start = 0; start < clients.length; start += MAX_SERIES_CLIENTS) {
+    queries.push(
+      new URLSearchParams({
+        clients: clients.slice(start, start + MAX_SERIES_CLIENTS).join(","),
+        from_ts: String(from),
+        to_ts: String(to),
+      }).toString(),
+    );
+  }
+  const payloads = await Promise.all(queries.map(fetchSeriesChunk));
+  for (const query of Array.from(seriesCache.keys())) {
+    if (!queries.includes(query)) {
+      seriesCache.delete(query);
+    }
+  }
+  return mergeSeries(payloads);
+}
+
 export interface HealthResponse {
   ok: boolean;
   now: number;
@@ -1,4 +1,4 @@
-import { useMemo } from "react";
+import { useEffect, useMemo } from "react";
 import {
   Bar,
   BarChart,
@@ -9,7 +9,7 @@ import {
   XAxis,
   YAxis,
 } from "recharts";
-import { useTrafficStore, type SummaryBin } from "../store";
+import { useTrafficStore } from "../store";
 
 interface ClientTimeData {
   ts: number;
@@ -55,44 +55,44 @@ function formatTimestamp(ts: number): string {
 }
 
 function ClientChart() {
-  const { summary } = useTrafficStore();
+  const { summary, series, loadSeries } = useTrafficStore();
 
-  const clientCharts = useMemo<ClientChartData[]>(() => {
-    // 1. Agrupar dados por cliente
-    const clientMap = new Map<string, SummaryBin[]>();
-    
-    summary.forEach((bin) => {
-      if (!clientMap.has(bin.client_ip)) {
-        clientMap.set(bin.client_ip, []);
-      }
-      clientMap.get(bin.client_ip)!.push(bin);
-    });
+  // Só a lista de clientes vem do summary; as séries chegam prontas de /api/series
+  const clientKey = useMemo(
+    () => Array.from(new Set(summary.map((bin) => bin.client_ip))).sort().join(","),
+    [summary],
+  );
 
-    // 2. Criar dados temporais para cada cliente
-    return Array.from(clientMap.entries()).map(([client_ip, bins], index) => {
-      // Ordenar por timestamp
-      const sortedBins = bins.sort((a, b) => a.ts - b.ts);
-      
-      // Converter para dados temporais
-      const data: ClientTimeData[] = sortedBins.map((bin) => ({
-        ts: bin.ts,
-        timestamp: formatTimestamp(bin.ts),
-        in_bytes: bin.in_bytes,
-        out_bytes: bin.out_bytes,
-        total_bytes: bin.in_bytes + bin.out_bytes,
-      }));
+  useEffect(() => {
+    loadSeries(clientKey ? clientKey.split(",") : []);
+  }, [clientKey, summary, loadSeries]);
 
-      // Calcular tráfego total do cliente
-      const totalTraffic = data.reduce((sum, d) => sum + d.total_bytes, 0);
+  const clientCharts = useMemo<ClientChartData[]>(() => {
+    if (!series) {
+      return [];
+    }
+    // Arrays densos alinhados em series.ts (zeros onde o cliente não teve tráfego)
+    const labels = series.ts.map(formatTimestamp);
+    return series.series
+      .map((client, index) => {
+        const data: ClientTimeData[] = series.ts.map((ts, position) => ({
+          ts,
+          timestamp: labels[position],
+          in_bytes: client.in_bytes[position],
+          out_bytes: client.out_bytes[position],
+          total_bytes: client.in_bytes[position] + client.out_bytes[position],
+        }));
+        const totalTraffic = data.reduce((sum, d) => sum + d.total_bytes, 0);
 
-      return {
-        client_ip,
-        color: CLIENT_COLORS[index % CLIENT_COLORS.length],
-        data,
-        totalTraffic,
-      };
-    }).sort((a, b) => b.totalTraffic - a.totalTraffic); // Ordenar por tráfego total
-  }, [summary]);
+        return {
+          client_ip: client.client_ip,
+          color: CLIENT_COLORS[index % CLIENT_COLORS.length],
+          data,
+          totalTraffic,
+        };
+      })
+      .sort((a, b) => b.totalTraffic - a.totalTraffic); // Ordenar por tráfego total
+  }, [series]);
 
   if (!summary.length) {
     return <p style={{ margin: 0, color: "#475569" }}>Nenhum dado coletado ainda.</p>;
@@ -5,6 +5,7 @@ import * as api from "./api";
 vi.mock("./api", () => ({
   fetchSummary: vi.fn(),
   fetchDrilldown: vi.fn(),
+  fetchSeries: vi.fn(),
 }));
 
 describe("TrafficStore", () => {
@@ -37,6 +38,17 @@ describe("TrafficStore", () => {
     expect(useTrafficStore.getState().selectedBin).toMatchObject({ client_ip: "10.0.0.2" });
     expect(useTrafficStore.getState().drilldown).toEqual(drilldown);
   });
-});
 
+  it("loads client series", async () => {
+    const series = {
+      resolution: 5,
+      ts: [0, 5],
+      series: [{ client_ip: "10.0.0.2", in_bytes: [100, 0], out_bytes: [0, 20] }],
+    };
+    (api.fetchSeries as unknown as ReturnType<typeof vi.fn>).mockResolvedValueOnce(series);
+
+    await useTrafficStore.getState().loadSeries(["10.0.0.2"]);
 
+    expect(useTrafficStore.getState().series).toEqual(series);
+  });
+});
@@ -1,5 +1,5 @@
 import { create } from "zustand";
-import { fetchDrilldown, fetchSummary } from "./api";
+import { fetchDrilldown, fetchSeries, fetchSummary } from "./api";
 
 export interface SummaryBin {
   ts: number;
@@ -20,6 +20,18 @@ export interface DrilldownPayload {
   items: DrilldownItem[];
 }
 
+export interface ClientSeries {
+  client_ip: string;
+  in_bytes: number[];
+  out_bytes: number[];
+}
+
+export interface SeriesPayload {
+  resolution: number;
+  ts: number[];
+  series: ClientSeries[];
+}
+
 export interface TimeRange {
   from: number;
   to: number;
@@ -30,8 +42,10 @@ interface TrafficState {
   timeRange: TimeRange;
   selectedBin: SummaryBin | null;
   drilldown: DrilldownPayload | null;
+  series: SeriesPayload | null;
   setTimeRange: (range: TimeRange) => void;
   loadSummary: () => Promise<void>;
+  loadSeries: (clients: string[]) => Promise<void>;
   selectBin: (bin: SummaryBin | null) => Promise<void>;
   reset: () => void;
 }
@@ -43,6 +57,7 @@ const createDataSlice = () => ({
   timeRange: { from: nowSeconds() - 120, to: nowSeconds() },
   selectedBin: null as SummaryBin | null,
   drilldown: null as DrilldownPayload | null,
+  series: null as SeriesPayload | null,
 });
 
 export const useTrafficStore = create<TrafficState>((set, get) => ({
@@ -57,6 +72,19 @@ export const useTrafficStore = create<TrafficState>((set, get) => ({
       console.error("Failed to load summary", error);
     }
   },
+  loadSeries: async (clients) => {
+    if (!clients.length) {
+      set({ series: null });
+      return;
+    }
+    const { timeRange } = get();
+    try {
+      const series = await fetchSeries(clients, timeRange.from, timeRange.to);
+      set({ series });
+    } catch (error) {
+      console.error("Failed to load series", error);
+    }
+  },
   selectBin: async (bin) => {
     set({ selectedBin: bin, drilldown: null });
     if (!bin) {